@@ -1,6 +1,17 @@
 """Admin and inspection endpoints."""
 
-from fastapi import APIRouter, Depends
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+from ...services.agent import agent_pool
+from ...services.query_engines import engine_pool
+from ...services.semantic_cache import semantic_cache
+from ...services.sql_plans import sql_plans
+from ...services.sql_results import invalidation_tags
+from ...core.cache import cache_stats, get_cache, invalidate_tag
+from ...core.embedding_scheduler import embedding_scheduler
+from ...core.memory import session_store
+from ...core.metrics import metrics
 from ..dependencies import auth_dep
 
 router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(auth_dep)])
@@ -10,4 +21,73 @@ router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(auth_d
 def sources():
     """Return a static list of configured source collections."""
     # In a real system this would introspect the vector store for collections
-    return {"collections": ["confluence", "sharepoint", "onedrive", "teams"]}
\ No newline at end of file
+    return {"collections": ["confluence", "sharepoint", "onedrive", "teams"]}
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """
+    Request and per-stage latency histograms (engine build, query embedding,
+    retrieval per source, fusion, LLM calls, SQL planning and execution,
+    Cypher) plus LLM token counters, in Prometheus text format. Values are
+    per worker process.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/engines")
+def engines():
+    """Return occupancy and hit/miss counters of the query engine pool."""
+    return engine_pool.stats()
+
+
+@router.get("/agents")
+def agents():
+    """Return occupancy and hit/miss counters of the agent pool."""
+    return agent_pool.stats()
+
+
+@router.get("/sessions")
+def sessions():
+    """Return occupancy and hit/load counters of the in-process chat session cache."""
+    return session_store.stats()
+
+
+@router.get("/embeddings")
+def embeddings():
+    """Return request/token counters, rate-limit state and tokens/sec of the embedding scheduler."""
+    return embedding_scheduler.stats()
+
+
+@router.get("/sql-plans")
+def sql_plan_cache():
+    """Return hit/miss counters and hit rate of the text-to-SQL plan cache."""
+    return sql_plans.stats()
+
+
+@router.delete("/sql-results/{db_name}")
+def invalidate_sql_results(db_name: str, table: Optional[str] = None):
+    """
+    Drop cached SQL results and the SQL and search answers built from them
+    for a database, or with `table` only those of statements reading that
+    table (e.g. after it was reloaded). Semantic cache answers are dropped
+    for the whole database.
+    """
+    invalidated = sum(invalidate_tag(tag) for tag in invalidation_tags(db_name, table))
+    semantic = semantic_cache.invalidate(db_name=db_name)
+    return {"db_name": db_name, "table": table, "invalidated": invalidated, "semantic": semantic}
+
+
+@router.get("/cache")
+def cache():
+    """Return hit/miss/eviction statistics for every cache namespace."""
+    return {**cache_stats(), "semantic": semantic_cache.stats()}
+
+
+@router.delete("/cache/{namespace}")
+def clear_cache(namespace: str):
+    """Drop all entries (in memory and on disk) of one cache namespace."""
+    if namespace not in cache_stats():
+        raise HTTPException(status_code=404, detail=f"Unknown cache: {namespace}")
+    get_cache(namespace).clear()
+    return {"cleared": namespace}
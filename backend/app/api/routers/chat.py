@@ -1,9 +1,10 @@
 """Chat endpoints implementing agentic interaction."""
 
+import asyncio
 from fastapi import APIRouter, Depends, Query
 from fastapi.responses import StreamingResponse
 from ...models.schemas import ChatRequest
-from ...services.agent import build_agent
+from ...services.agent import achat, astream_chat, get_agent, start_turn
 from ...core.memory import get_memory
 from ...utils.sse import stream_tokens
 from ..dependencies import auth_dep
@@ -12,29 +13,21 @@ router = APIRouter(prefix="/chat", tags=["chat"], dependencies=[Depends(auth_dep
 
 
 @router.post("")
-def chat(req: ChatRequest):
+async def chat(req: ChatRequest):
     """
     Run a single turn of chat with the agent. Supports arbitrary data
     sources and scopes. Maintains session memory across requests.
     """
-    agent = build_agent(req.scope, req.sources, req.use_hybrid, req.db_name)
+    # Building an agent reads the SQL catalog from the state database
+    agent = await asyncio.to_thread(get_agent, req.scope, req.sources, req.use_hybrid, req.db_name)
     memory = get_memory(req.session_id or "default")
-    result = agent.chat(req.query, memory=memory)
-    citations = []
-    for n in getattr(result, "source_nodes", []):
-        citations.append(
-            {
-                "source": n.node.metadata.get("source"),
-                "path": n.node.metadata.get("path"),
-                "doc_id": n.node.node_id,
-                "score": getattr(n, "score", None),
-            }
-        )
-    return {"answer": str(result), "citations": citations, "artifacts": {}}
+    turn = start_turn(req.session_id or "default")
+    answer, citations = await achat(agent, req.query, memory)
+    return {"answer": answer, "citations": citations, "artifacts": {"turn": turn.as_dict()}}
 
 
 @router.get("/stream")
-def chat_stream(
+async def chat_stream(
     query: str = Query(..., description="The user question"),
     session_id: str | None = Query(None, description="Session identifier"),
     scope: str = Query("all", description="Query scope: sql, vector, all, kg"),
@@ -45,10 +38,11 @@ def chat_stream(
     """
     Stream a chat response token by token using Server‑Sent Events. The
     parameters mirror those of the POST /chat endpoint. The response
-    content type is text/event‑stream.
+    content type is text/event‑stream. Turn statistics are sent as an
+    `artifacts` event before the end marker.
     """
     srcs = [s for s in sources.split(",") if s]
-    agent = build_agent(scope, srcs, use_hybrid, db_name)
+    agent = await asyncio.to_thread(get_agent, scope, srcs, use_hybrid, db_name)
     memory = get_memory(session_id or "default")
-    token_generator = agent.stream_chat(query, memory=memory)
-    return stream_tokens(token_generator)
\ No newline at end of file
+    turn = start_turn(session_id or "default")
+    return stream_tokens(astream_chat(agent, query, memory), trailer=lambda: {"turn": turn.as_dict()})
\ No newline at end of file
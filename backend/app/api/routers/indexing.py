@@ -1,54 +1,104 @@
 """API endpoints for ingesting data sources into the vector store."""
 
+import asyncio
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException
 
 from ...models.schemas import IndexRequest, SQLRegisterRequest
-from ...services.ingestion.confluence import ConfluenceIngestor
-from ...services.ingestion.sharepoint import SharePointIngestor
-from ...services.ingestion.onedrive import OneDriveIngestor
-from ...services.ingestion.teams import TeamsIngestor
 from ...services.ingestion.database import sql_registry
-from ...services.indexing import upsert_documents
+from ...services.agent import agent_pool
+from ...services.jobs import INGESTORS, index_jobs
+from ...services.query_engines import engine_pool
+from ...services.semantic_cache import semantic_cache
 from ...core.config import settings
+from ...core.cache import invalidate_tag
 from ..dependencies import auth_dep
 
 router = APIRouter(prefix="/indexing", tags=["indexing"], dependencies=[Depends(auth_dep)])
 
-# Registry mapping for source types
-_INGESTORS = {
-    "confluence": ConfluenceIngestor(),
-    "sharepoint": SharePointIngestor(),
-    "onedrive": OneDriveIngestor(),
-    "teams": TeamsIngestor(),
-}
 
-
-@router.post("/{source}")
-def index_source(payload: IndexRequest):
+@router.post("/{source}", status_code=202)
+async def index_source(payload: IndexRequest):
     """
-    Index data from the specified source. The payload must include a
-    `config` dictionary with connection details and scope parameters. For
-    example, for Confluence:
+    Queue indexing of the specified source and return the job immediately.
+    The payload must include a `config` dictionary with connection details
+    and scope parameters. For example, for Confluence:
     `{ "source": "confluence", "config": {"base_url": "...", "username": "...", "api_token": "...", "space_key": "..."} }`.
+    Only documents changed since the last sync of the same scope are
+    fetched and re-embedded, and documents deleted at the source are
+    removed. Poll `GET /indexing/jobs/{job_id}` for progress.
     """
     source = payload.source
-    if source not in _INGESTORS:
+    if source not in INGESTORS:
         raise HTTPException(status_code=400, detail=f"Unsupported source: {source}")
-    ingestor = _INGESTORS[source]
     try:
-        docs = ingestor.load(**payload.config)
-    except Exception as ex:
-        raise HTTPException(status_code=500, detail=str(ex))
-    result = upsert_documents(source, docs)
-    return {"indexed": result}
+        job = await asyncio.to_thread(index_jobs.submit, source, payload.config, payload.full)
+    except ValueError as ex:
+        raise HTTPException(status_code=400, detail=str(ex))
+    return {"job": job}
+
+
+@router.get("/jobs")
+async def list_jobs(source: Optional[str] = None, limit: int = 50):
+    """List recent indexing jobs, newest first."""
+    return {"jobs": await asyncio.to_thread(index_jobs.list, source, min(limit, 500))}
+
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """
+    Return the status of an indexing job with its progress: documents
+    fetched/unchanged/upserted/deleted, chunks embedded/written, throughput
+    and (when the connector knows the total) an ETA.
+    """
+    job = await asyncio.to_thread(index_jobs.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
 
 
 @router.post("/sql/register")
-def sql_register(req: SQLRegisterRequest):
+async def sql_register(req: SQLRegisterRequest):
     """
     Register a SQL data source. Provide a DSN (SQLAlchemy URI) and optional
     list of tables or schema. The returned name can be used in query
     requests to specify which database to query.
     """
-    name = sql_registry.register(req.name, req.dsn, req.include_tables, req.schema)
-    return {"registered": name}
\ No newline at end of file
+    # Registration reflects the schema over a blocking connection
+    name = await asyncio.to_thread(
+        sql_registry.register,
+        req.name,
+        req.dsn,
+        req.include_tables,
+        req.schema,
+        req.table_descriptions,
+        req.execution.model_dump() if req.execution else None,
+    )
+    schema = await asyncio.to_thread(sql_registry.schema, name)
+    return {"registered": name, **schema.stats()}
+
+
+@router.post("/sql/{name}/refresh")
+async def sql_refresh(name: str):
+    """
+    Re-reflect the schema of a registered database (after tables or columns
+    changed) and rebuild its table index. Schemas are otherwise cached from
+    registration on.
+    """
+    if name not in await asyncio.to_thread(sql_registry.names):
+        raise HTTPException(status_code=404, detail=f"Unknown database: {name}")
+    context = await asyncio.to_thread(sql_registry.refresh, name)
+    return {"refreshed": name, **context.stats()}
+
+
+def _invalidate_db(name: str) -> None:
+    """Drop engines, agents and answers built from this worker's old copy of a database."""
+    engine_pool.invalidate(db_name=name)
+    agent_pool.invalidate()
+    invalidate_tag(f"db:{name}")
+    invalidate_tag("db:*")
+    semantic_cache.invalidate(db_name=name)
+
+
+# Registrations and refreshes on any worker reach this one through the catalog
+sql_registry.add_listener(_invalidate_db)
\ No newline at end of file
@@ -1,28 +1,65 @@
 """Search endpoint returning answers with citations."""
 
+import asyncio
 from fastapi import APIRouter, Depends
+from llama_index.core import Settings as LlamaSettings
 from ...models.schemas import SearchRequest
-from ...services.query_engines import router_engine
+from ...services.query_engines import router_engine, aquery
+from ...services.ingestion.database import sql_registry
+from ...services.retrieval import retrieval_report
+from ...services.semantic_cache import ScopeKey, semantic_cache
+from ...services.sql_results import result_tags
+from ...core.cache import answer_cache, cache_key
+from ...core.config import settings
+from ...core.metrics import stage
 from ..dependencies import auth_dep
 
 router = APIRouter(prefix="/search", tags=["search"], dependencies=[Depends(auth_dep)])
 
 
 @router.post("")
-def search(req: SearchRequest):
+async def search(req: SearchRequest):
     """
     Perform a one‑shot query over the selected data sources. The request
     specifies the natural language `query`, a list of `sources`, and a
     retrieval `scope` (sql, vector, all, kg). It optionally enables
-    hybrid retrieval (`use_hybrid`) and limits results to `top_k`.
+    hybrid retrieval (`use_hybrid`) and limits results to `top_k`. Sources
+    that miss their retrieval deadline are left out of the answer and listed
+    under `retrieval.dropped`; per-source timings are reported alongside the
+    citations. Complete answers are cached per request configuration until
+    their TTL expires or one of their sources is re-indexed. With
+    SEMANTIC_CACHE_ENABLED, a differently worded question whose embedding is
+    close enough to a past one (same scope, sources and db_name) is answered
+    from that past answer.
     """
-    qe = router_engine(
+    scope_key = ScopeKey(req.scope, tuple(sorted(set(req.sources))), req.db_name)
+    key = cache_key("search", req.query, req.scope, scope_key.sources, req.use_hybrid, req.db_name, req.top_k)
+    cached = answer_cache.get(key)
+    if cached is not None:
+        return {**cached, "cached": True}
+    query_embedding = None
+    if settings.SEMANTIC_CACHE_ENABLED:
+        with stage("query_embedding", "semantic_cache"):
+            query_embedding = await LlamaSettings.embed_model.aget_query_embedding(req.query)
+        match = semantic_cache.lookup(query_embedding, scope_key)
+        if match is not None:
+            payload, matched_query, similarity = match
+            return {
+                **payload,
+                "cached": True,
+                "semantic_match": {"query": matched_query, "similarity": round(similarity, 4)},
+            }
+    # A pool miss polls the catalog, reflects schemas and builds indexes
+    qe = await asyncio.to_thread(
+        router_engine,
         scope=req.scope,
         sources=req.sources,
         use_hybrid=req.use_hybrid,
         db_name=req.db_name,
+        top_k=req.top_k,
     )
-    resp = qe.query(req.query)
+    with retrieval_report() as report:
+        resp = await aquery(qe, req.query)
     citations = []
     # Extract citation information from LlamaIndex response
     for n in getattr(resp, "source_nodes", []):
@@ -32,6 +69,20 @@ def search(req: SearchRequest):
                 "source": n.node.metadata.get("source"),
                 "path": n.node.metadata.get("path"),
                 "doc_id": n.node.node_id,
+                "retrieval_ms": report.source_ms(n.node.metadata.get("source")),
             }
         )
-    return {"answer": str(resp), "citations": citations}
\ No newline at end of file
+    payload = {"answer": str(resp), "citations": citations, "retrieval": report.as_dict()}
+    # Answers missing a dropped source are not worth repeating
+    if not report.dropped:
+        tags = [f"source:{s}" for s in req.sources]
+        if req.scope in ("sql", "all") and req.db_name:
+            sql = (getattr(resp, "metadata", None) or {}).get("sql_query")
+            schema = await asyncio.to_thread(sql_registry.schema, req.db_name)
+            tags += result_tags(req.db_name, sql, schema.sqldb.table_info)
+        elif req.scope in ("sql", "all"):
+            tags.append("db:*")
+        answer_cache.set(key, payload, tags=tags)
+        if query_embedding is not None:
+            semantic_cache.store(req.query, query_embedding, scope_key, payload)
+    return {**payload, "cached": False}
\ No newline at end of file
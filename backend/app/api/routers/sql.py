@@ -1,47 +1,81 @@
 """Endpoints for direct SQL queries and exporting results."""
 
+import asyncio
+import os
 from fastapi import APIRouter, Depends, HTTPException
-from ...models.schemas import SearchRequest
-from ...services.query_engines import router_engine
-from ...services.export import dataframe_to_excel
-import pandas as pd
+from fastapi.responses import FileResponse
+from ...models.schemas import SearchRequest, SQLExportRequest
+from ...services.query_engines import router_engine, aquery
+from ...services.export import export_path, write_export
+from ...services.ingestion.database import sql_registry
+from ...services.sql_results import result_tags
+from ...core.cache import sql_cache, cache_key
+from ...core.config import settings
 from ..dependencies import auth_dep
 
 router = APIRouter(prefix="/sql", tags=["sql"], dependencies=[Depends(auth_dep)])
 
 
 @router.post("/ask")
-def sql_ask(req: SearchRequest):
+async def sql_ask(req: SearchRequest):
     """
     Execute a natural language SQL query against the registered database.
     Returns the generated answer and the executed SQL query. If no database
-    has been registered, raises an error.
+    has been registered, raises an error. Answers are cached per database
+    until their TTL expires, the database is re-registered or a table the
+    SQL read is invalidated.
     """
     if not req.db_name:
         raise HTTPException(status_code=400, detail="db_name is required for SQL queries")
-    qe = router_engine(scope="sql", sources=[], use_hybrid=False, db_name=req.db_name)
-    resp = qe.query(req.query)
-    return {
+    key = cache_key("sql_ask", req.db_name, req.query.strip())
+    cached = sql_cache.get(key)
+    if cached is not None:
+        return cached
+    # A pool miss polls the catalog, reflects the schema and builds the table index
+    qe = await asyncio.to_thread(router_engine, scope="sql", sources=[], use_hybrid=False, db_name=req.db_name)
+    resp = await aquery(qe, req.query)
+    result = {
         "answer": str(resp),
-        "sql": getattr(resp, "metadata", {}).get("sql_query"),
+        "sql": (getattr(resp, "metadata", None) or {}).get("sql_query"),
     }
+    tables = (await asyncio.to_thread(sql_registry.schema, req.db_name)).sqldb.table_info
+    sql_cache.set(key, result, tags=result_tags(req.db_name, result["sql"], tables))
+    return result
 
 
 @router.post("/export")
-def sql_export(req: SearchRequest):
+async def sql_export(req: SQLExportRequest):
     """
-    Execute a SQL query and return an Excel file containing the result. The
-    response includes the path of the created file. Requires db_name.
+    Translate the question into SQL and stream the complete result (not
+    capped by SQL_MAX_ROWS; at most EXPORT_MAX_ROWS) into a CSV, Parquet or
+    Excel file, batch by batch over a server-side cursor. Returns the export
+    id and the URL to download it from. Requires db_name.
     """
     if not req.db_name:
         raise HTTPException(status_code=400, detail="db_name is required for SQL export")
-    qe = router_engine(scope="sql", sources=[], use_hybrid=False, db_name=req.db_name)
-    resp = qe.query(req.query)
-    table = getattr(resp, "metadata", {}).get("result_table")
-    if not table:
-        raise HTTPException(status_code=400, detail="No tabular result returned from query")
-    columns = table.get("columns", [])
-    rows = table.get("rows", [])
-    df = pd.DataFrame(rows, columns=columns)
-    filepath = dataframe_to_excel(df)
-    return {"file_path": filepath}
\ No newline at end of file
+    qe = await asyncio.to_thread(router_engine, scope="sql", sources=[], use_hybrid=False, db_name=req.db_name)
+    sql = await asyncio.to_thread(qe.sql_retriever.generate_sql, req.query)
+    sqldb = await asyncio.to_thread(sql_registry.get, req.db_name)
+    batches = sqldb.stream_sql(sql, settings.EXPORT_BATCH_ROWS)
+    try:
+        export = await asyncio.to_thread(write_export, batches, req.format, settings.EXPORT_MAX_ROWS or None)
+    except (ValueError, NotImplementedError) as ex:
+        raise HTTPException(status_code=400, detail=str(ex))
+    return {
+        "export_id": export.export_id,
+        "format": export.format,
+        "rows": export.rows,
+        "truncated": export.truncated,
+        "sql": sql,
+        "download_url": f"{router.prefix}/exports/{export.export_id}",
+        "file_path": export.path,
+    }
+
+
+@router.get("/exports/{export_id}")
+async def sql_download(export_id: str):
+    """Download a finished export; the file is streamed in chunks."""
+    path = export_path(export_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Unknown export: {export_id}")
+    return FileResponse(path, filename=os.path.basename(path))
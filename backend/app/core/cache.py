@@ -1,28 +1,293 @@
-"""Simple time‑to‑live cache for retrieval results."""
+"""Bounded, thread‑safe LRU + TTL caches shared across request handlers."""
 
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
 import time
-from typing import Any, Dict
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+from .config import settings
+from .logging import logger
 
 
-class TTLCache:
-    """A very small in‑memory cache with an expiration time."""
+def cache_key(*parts: Any) -> str:
+    """Build a stable cache key from arbitrary JSON‑serialisable parts."""
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
-    def __init__(self, ttl_sec: int = 60):
+
+class _Entry(NamedTuple):
+    value: Any
+    size: int
+    expires_at: Optional[float]
+    tags: tuple
+
+
+class _DiskStore:
+    """SQLite file holding pickled entries so hot keys survive restarts."""
+
+    def __init__(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB, expires_at REAL, tags TEXT)"
+        )
+        # One row per (entry, tag) so invalidation matches tags exactly
+        upgrade = not self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'entry_tags'"
+        ).fetchone()
+        self._conn.execute("CREATE TABLE IF NOT EXISTS entry_tags (key TEXT, tag TEXT, PRIMARY KEY (tag, key))")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entry_tags_key ON entry_tags (key)")
+        if upgrade:
+            rows = self._conn.execute("SELECT key, tags FROM entries").fetchall()
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO entry_tags VALUES (?, ?)",
+                [(key, tag) for key, tags in rows for tag in (tags or "").split("|") if tag],
+            )
+
+    def get(self, key: str) -> Optional[tuple]:
+        return self._conn.execute(
+            "SELECT value, expires_at, tags FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+
+    def _transaction(self, *statements: tuple) -> List[int]:
+        """Run (sql, params) statements atomically; returns their rowcounts."""
+        self._conn.execute("BEGIN")
+        try:
+            counts = [self._conn.execute(sql, params).rowcount for sql, params in statements]
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        return counts
+
+    def put(self, key: str, blob: bytes, expires_at: Optional[float], tags: tuple) -> None:
+        self._transaction(
+            ("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", (key, blob, expires_at, "|" + "|".join(tags) + "|")),
+            ("DELETE FROM entry_tags WHERE key = ?", (key,)),
+            *(("INSERT OR IGNORE INTO entry_tags VALUES (?, ?)", (key, tag)) for tag in tags),
+        )
+
+    def delete(self, key: str) -> None:
+        self._transaction(
+            ("DELETE FROM entries WHERE key = ?", (key,)),
+            ("DELETE FROM entry_tags WHERE key = ?", (key,)),
+        )
+
+    def delete_tag(self, tag: str) -> int:
+        return self._transaction(
+            ("DELETE FROM entries WHERE key IN (SELECT key FROM entry_tags WHERE tag = ?)", (tag,)),
+            ("DELETE FROM entry_tags WHERE key IN (SELECT key FROM entry_tags WHERE tag = ?)", (tag,)),
+        )[0]
+
+    def delete_expired(self, now: float) -> int:
+        expired = "SELECT key FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?"
+        return self._transaction(
+            (f"DELETE FROM entry_tags WHERE key IN ({expired})", (now,)),
+            (f"DELETE FROM entries WHERE key IN ({expired})", (now,)),
+        )[1]
+
+    def clear(self) -> None:
+        self._transaction(("DELETE FROM entries", ()), ("DELETE FROM entry_tags", ()))
+
+
+class LRUCache:
+    """
+    In‑memory cache bounded by entry count and approximate byte size, with
+    O(1) LRU eviction and per‑entry TTL. Expired entries are removed on
+    access and by a background sweeper. Entries may carry tags (e.g.
+    `source:confluence`) so that everything derived from a source or
+    database can be invalidated at once. With `persist=True` every write is
+    also stored in a local SQLite file and memory misses fall back to it,
+    so hot entries survive a restart.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        max_entries: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl_sec: Optional[float] = 300,
+        persist: bool = False,
+    ) -> None:
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
         self.ttl = ttl_sec
-        self.data: Dict[str, Dict[str, Any]] = {}
+        self._data: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk = _DiskStore(os.path.join(settings.CACHE_DIR, f"{namespace}.sqlite")) if persist else None
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _drop(self, key: str) -> None:
+        entry = self._data.pop(key)
+        self._bytes -= entry.size
+
+    def _insert(self, key: str, entry: _Entry) -> None:
+        if key in self._data:
+            self._drop(key)
+        self._data[key] = entry
+        self._bytes += entry.size
+        while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._data))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry.expires_at is not None and entry.expires_at <= now:
+                    self._drop(key)
+                    self.expirations += 1
+                else:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return entry.value
+            if self._disk is not None:
+                row = self._disk.get(key)
+                if row is not None:
+                    blob, expires_at, tags = row
+                    if expires_at is None or expires_at > now:
+                        value = pickle.loads(blob)
+                        entry_tags = tuple(t for t in tags.split("|") if t)
+                        self._insert(key, _Entry(value, len(blob), expires_at, entry_tags))
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return value
+                    self._disk.delete(key)
+            self.misses += 1
+            return default
+
+    def set(self, key: str, value: Any, ttl_sec: Optional[float] = None, tags: Iterable[str] = ()) -> None:
+        ttl = ttl_sec if ttl_sec is not None else self.ttl
+        expires_at = time.time() + ttl if ttl else None
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            # Never let a single value flush the whole cache
+            return
+        tags = tuple(tags)
+        with self._lock:
+            self._insert(key, _Entry(value, len(blob), expires_at, tags))
+            if self._disk is not None:
+                self._disk.put(key, blob, expires_at, tags)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            if self._disk is not None:
+                self._disk.delete(key)
+
+    def invalidate_tag(self, tag: str) -> int:
+        """Remove every entry carrying `tag`. Returns the number removed from memory."""
+        with self._lock:
+            stale = [k for k, e in self._data.items() if tag in e.tags]
+            for k in stale:
+                self._drop(k)
+            if self._disk is not None:
+                self._disk.delete_tag(tag)
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+            if self._disk is not None:
+                self._disk.clear()
+
+    def sweep(self) -> int:
+        """Drop expired entries. Returns the number removed from memory."""
+        now = time.time()
+        with self._lock:
+            stale = [k for k, e in self._data.items() if e.expires_at is not None and e.expires_at <= now]
+            for k in stale:
+                self._drop(k)
+            self.expirations += len(stale)
+            if self._disk is not None:
+                self._disk.delete_expired(now)
+            return len(stale)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_sec": self.ttl,
+                "persistent": self._disk is not None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+_caches: Dict[str, LRUCache] = {}
+_registry_lock = threading.Lock()
+_sweep_targets: "weakref.WeakSet[LRUCache]" = weakref.WeakSet()
+_sweeper: Optional[threading.Thread] = None
+
+
+def _sweep_loop() -> None:
+    while True:
+        time.sleep(settings.CACHE_SWEEP_INTERVAL_SEC)
+        for cache in list(_sweep_targets):
+            try:
+                cache.sweep()
+            except Exception:  # pragma: no cover - keep the sweeper alive
+                logger.exception("Cache sweep failed for %s", cache.namespace)
+
+
+def get_cache(namespace: str, **kwargs: Any) -> LRUCache:
+    """
+    Return the cache registered under `namespace`, creating it with the
+    given options on first use. All caches are swept by one background
+    thread and reported by `cache_stats`.
+    """
+    global _sweeper
+    with _registry_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            kwargs.setdefault("max_entries", settings.CACHE_MAX_ENTRIES)
+            kwargs.setdefault("max_bytes", settings.CACHE_MAX_BYTES)
+            kwargs.setdefault("persist", settings.CACHE_PERSIST)
+            cache = LRUCache(namespace, **kwargs)
+            _caches[namespace] = cache
+            _sweep_targets.add(cache)
+        if _sweeper is None:
+            _sweeper = threading.Thread(target=_sweep_loop, name="cache-sweeper", daemon=True)
+            _sweeper.start()
+        return cache
+
+
+def invalidate_tag(tag: str) -> int:
+    """Invalidate `tag` in every registered cache."""
+    return sum(cache.invalidate_tag(tag) for cache in list(_caches.values()))
 
-    def get(self, key: str) -> Any | None:
-        val = self.data.get(key)
-        if not val:
-            return None
-        if time.time() - val["ts"] > self.ttl:
-            self.data.pop(key, None)
-            return None
-        return val["value"]
 
-    def set(self, key: str, value: Any) -> None:
-        self.data[key] = {"value": value, "ts": time.time()}
+def cache_stats() -> Dict[str, dict]:
+    """Return statistics for every registered cache keyed by namespace."""
+    return {name: cache.stats() for name, cache in list(_caches.items())}
 
 
-# Global retrieval cache instance
-retrieval_cache = TTLCache(90)
\ No newline at end of file
+# Global cache namespaces
+retrieval_cache = get_cache("retrieval", ttl_sec=settings.CACHE_RETRIEVAL_TTL_SEC)
+sql_cache = get_cache("sql", ttl_sec=settings.CACHE_SQL_TTL_SEC)
+answer_cache = get_cache("answers", ttl_sec=settings.CACHE_ANSWER_TTL_SEC)
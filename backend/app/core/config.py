@@ -15,14 +15,44 @@ class Settings(BaseModel):
     OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
     OPENAI_EMBED_MODEL: str = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small")
     OPENAI_EMBED_DIM: int = int(os.getenv("OPENAI_EMBED_DIM", "1536"))
+    # Alternative embeddings endpoint (e.g. a local fake server for load tests)
+    OPENAI_EMBED_API_BASE: str = os.getenv("OPENAI_EMBED_API_BASE", "")
 
-    # Vector backend selection: pgvector or neo4j_vectors
+    # Vector backend selection: pgvector (Postgres) or mmap (embedded store
+    # in VECTOR_MMAP_DIR for single-node, edge and test deployments)
     VECTOR_BACKEND: str = os.getenv("VECTOR_BACKEND", "pgvector")
+    # mmap backend: storage directory, on-disk precision (float32 or float16),
+    # how often workers pick up writes of other processes, and the optional
+    # IVF coarse quantizer (lists per collection, 0 = exact search; lists
+    # scanned per query)
+    VECTOR_MMAP_DIR: str = os.getenv("VECTOR_MMAP_DIR", "/tmp/talk2db-vectors")
+    VECTOR_MMAP_DTYPE: str = os.getenv("VECTOR_MMAP_DTYPE", "float32")
+    VECTOR_MMAP_POLL_SEC: float = float(os.getenv("VECTOR_MMAP_POLL_SEC", "1"))
+    VECTOR_MMAP_IVF_LISTS: int = int(os.getenv("VECTOR_MMAP_IVF_LISTS", "0"))
+    VECTOR_MMAP_IVF_PROBES: int = int(os.getenv("VECTOR_MMAP_IVF_PROBES", "8"))
 
     # Postgres / pgvector configuration
     POSTGRES_URI: str = os.getenv("POSTGRES_URI", "postgresql+psycopg2://postgres:postgres@db:5432/postgres")
+    # Async driver URI used for non-blocking pgvector access; derived from
+    # POSTGRES_URI (psycopg2 -> asyncpg) when not set
+    POSTGRES_ASYNC_URI: str = os.getenv("POSTGRES_ASYNC_URI", "")
     PGVECTOR_SCHEMA: str = os.getenv("PGVECTOR_SCHEMA", "public")
     COLLECTION_PREFIX: str = os.getenv("COLLECTION_PREFIX", "ttdb_")
+    # Postgres text search configuration for the sparse (full-text) index
+    PGVECTOR_TEXT_SEARCH_CONFIG: str = os.getenv("PGVECTOR_TEXT_SEARCH_CONFIG", "english")
+
+    # Shared state database (sync watermarks, ...); defaults to POSTGRES_URI.
+    # A SQLite URI such as sqlite:////tmp/talk2db-state.db works for local runs.
+    STATE_DB_URI: str = os.getenv("STATE_DB_URI", "")
+
+    # Microsoft Graph endpoints (overridable to point at a mock server)
+    GRAPH_BASE_URL: str = os.getenv("GRAPH_BASE_URL", "https://graph.microsoft.com/v1.0")
+    GRAPH_LOGIN_URL: str = os.getenv("GRAPH_LOGIN_URL", "https://login.microsoftonline.com")
+    # Concurrent Graph requests per crawl (channels, reply threads), retries of
+    # throttled calls and page size of message listings
+    GRAPH_CONCURRENCY: int = int(os.getenv("GRAPH_CONCURRENCY", "8"))
+    GRAPH_MAX_RETRIES: int = int(os.getenv("GRAPH_MAX_RETRIES", "5"))
+    GRAPH_PAGE_SIZE: int = int(os.getenv("GRAPH_PAGE_SIZE", "50"))
 
     # Neo4j configuration
     NEO4J_URI: str = os.getenv("NEO4J_URI", "bolt://neo4j:7687")
@@ -33,6 +63,118 @@ class Settings(BaseModel):
 
     # Retrieval defaults
     MAX_TOP_K: int = int(os.getenv("MAX_TOP_K", "10"))
+    # Concurrent per-source retrieval: worker threads per source and per-source
+    # deadlines. RETRIEVAL_SOURCE_TIMEOUTS overrides the default per source,
+    # e.g. "teams=2,confluence=8"
+    RETRIEVAL_WORKERS_PER_SOURCE: int = int(os.getenv("RETRIEVAL_WORKERS_PER_SOURCE", "4"))
+    RETRIEVAL_SOURCE_TIMEOUT_SEC: float = float(os.getenv("RETRIEVAL_SOURCE_TIMEOUT_SEC", "5"))
+    RETRIEVAL_SOURCE_TIMEOUTS: str = os.getenv("RETRIEVAL_SOURCE_TIMEOUTS", "")
+    # Databases with more tables than SQL_TABLE_RETRIEVAL_MIN only send the
+    # SQL_TABLE_TOP_K tables most relevant to the question to the LLM
+    SQL_TABLE_RETRIEVAL_MIN: int = int(os.getenv("SQL_TABLE_RETRIEVAL_MIN", "20"))
+    SQL_TABLE_TOP_K: int = int(os.getenv("SQL_TABLE_TOP_K", "8"))
+    # Registered SQL databases are shared by all workers through the state
+    # database; each worker re-reads the catalog at most this often
+    SQL_CATALOG_POLL_SEC: float = float(os.getenv("SQL_CATALOG_POLL_SEC", "5"))
+    # Defaults for registered SQL databases (overridable per registration):
+    # connection pool, statement timeout (0 = none), rows fetched per query,
+    # read-only sessions and concurrently executing queries per database
+    SQL_POOL_SIZE: int = int(os.getenv("SQL_POOL_SIZE", "5"))
+    SQL_MAX_OVERFLOW: int = int(os.getenv("SQL_MAX_OVERFLOW", "5"))
+    SQL_POOL_TIMEOUT_SEC: float = float(os.getenv("SQL_POOL_TIMEOUT_SEC", "30"))
+    SQL_STATEMENT_TIMEOUT_SEC: float = float(os.getenv("SQL_STATEMENT_TIMEOUT_SEC", "30"))
+    SQL_MAX_ROWS: int = int(os.getenv("SQL_MAX_ROWS", "10000"))
+    SQL_READ_ONLY: bool = os.getenv("SQL_READ_ONLY", "true").lower() == "true"
+    SQL_MAX_CONCURRENCY: int = int(os.getenv("SQL_MAX_CONCURRENCY", "4"))
+    # Cache of executed SQL results (Parquet in a SQLite file in CACHE_DIR)
+    SQL_RESULT_CACHE_ENABLED: bool = os.getenv("SQL_RESULT_CACHE_ENABLED", "true").lower() == "true"
+    SQL_RESULT_CACHE_TTL_SEC: float = float(os.getenv("SQL_RESULT_CACHE_TTL_SEC", "300"))
+    SQL_RESULT_CACHE_MAX_BYTES: int = int(os.getenv("SQL_RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    # Streaming SQL exports: output directory, retention, rows fetched per
+    # batch and maximum rows per export (0 = unlimited)
+    EXPORT_DIR: str = os.getenv("EXPORT_DIR", "/tmp/exports")
+    EXPORT_TTL_SEC: float = float(os.getenv("EXPORT_TTL_SEC", "86400"))
+    EXPORT_BATCH_ROWS: int = int(os.getenv("EXPORT_BATCH_ROWS", "10000"))
+    EXPORT_MAX_ROWS: int = int(os.getenv("EXPORT_MAX_ROWS", "0"))
+    # Text-to-SQL plan cache (SQLite file in CACHE_DIR); optional reuse of the
+    # plan of an embedding-similar question
+    SQL_PLAN_CACHE_TTL_SEC: float = float(os.getenv("SQL_PLAN_CACHE_TTL_SEC", str(7 * 24 * 3600)))
+    SQL_PLAN_CACHE_MAX_ENTRIES: int = int(os.getenv("SQL_PLAN_CACHE_MAX_ENTRIES", "10000"))
+    SQL_PLAN_SEMANTIC: bool = os.getenv("SQL_PLAN_SEMANTIC", "false").lower() == "true"
+    SQL_PLAN_SEMANTIC_THRESHOLD: float = float(os.getenv("SQL_PLAN_SEMANTIC_THRESHOLD", "0.98"))
+
+    # Cache subsystem: per-namespace bounds, TTLs and optional on-disk spill
+    CACHE_DIR: str = os.getenv("CACHE_DIR", "/tmp/talk2db-cache")
+    CACHE_MAX_ENTRIES: int = int(os.getenv("CACHE_MAX_ENTRIES", "2048"))
+    CACHE_MAX_BYTES: int = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    CACHE_PERSIST: bool = os.getenv("CACHE_PERSIST", "false").lower() == "true"
+    CACHE_SWEEP_INTERVAL_SEC: float = float(os.getenv("CACHE_SWEEP_INTERVAL_SEC", "30"))
+    CACHE_RETRIEVAL_TTL_SEC: float = float(os.getenv("CACHE_RETRIEVAL_TTL_SEC", "90"))
+    CACHE_SQL_TTL_SEC: float = float(os.getenv("CACHE_SQL_TTL_SEC", "300"))
+    CACHE_ANSWER_TTL_SEC: float = float(os.getenv("CACHE_ANSWER_TTL_SEC", "300"))
+
+    # Content-hash embedding cache (in-memory LRU in front of a SQLite file in CACHE_DIR)
+    EMBED_CACHE_MAX_ENTRIES: int = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "50000"))
+    EMBED_CACHE_MAX_BYTES: int = int(os.getenv("EMBED_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    EMBED_CACHE_PERSIST: bool = os.getenv("EMBED_CACHE_PERSIST", "true").lower() == "true"
+
+    # Opt-in semantic answer cache for /search (cosine similarity threshold)
+    SEMANTIC_CACHE_ENABLED: bool = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+    SEMANTIC_CACHE_MAX_ENTRIES: int = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+    SEMANTIC_CACHE_TTL_SEC: float = float(os.getenv("SEMANTIC_CACHE_TTL_SEC", "3600"))
+
+    # Query engine pool
+    ENGINE_POOL_SIZE: int = int(os.getenv("ENGINE_POOL_SIZE", "32"))
+    # Chat sessions (shared state database): in-process cache bounds (sessions
+    # and message tokens), idle eviction, messages kept per session, retention of
+    # idle sessions (0 = forever) and the token window passed to the LLM
+    SESSION_CACHE_MAX_SESSIONS: int = int(os.getenv("SESSION_CACHE_MAX_SESSIONS", "1000"))
+    SESSION_CACHE_MAX_TOKENS: int = int(os.getenv("SESSION_CACHE_MAX_TOKENS", "16000000"))
+    SESSION_IDLE_SEC: float = float(os.getenv("SESSION_IDLE_SEC", "1800"))
+    SESSION_MAX_MESSAGES: int = int(os.getenv("SESSION_MAX_MESSAGES", "200"))
+    SESSION_RETENTION_SEC: float = float(os.getenv("SESSION_RETENTION_SEC", str(30 * 24 * 3600)))
+    SESSION_TOKEN_LIMIT: int = int(os.getenv("SESSION_TOKEN_LIMIT", "4000"))
+    # Chat agents cached per (scope, sources, hybrid, db_name)
+    AGENT_POOL_SIZE: int = int(os.getenv("AGENT_POOL_SIZE", "16"))
+
+    # Requests slower than this are logged with their per-stage timings (0 = off)
+    SLOW_REQUEST_MS: float = float(os.getenv("SLOW_REQUEST_MS", "0"))
+
+    # Embedding scheduler: shared request/token budgets per minute (0 = unlimited),
+    # concurrent requests, batch limits and retries on HTTP 429, 5xx, timeouts
+    # and dropped connections (fewer for query embeddings, which a user waits on)
+    EMBED_RPM: int = int(os.getenv("EMBED_RPM", "3000"))
+    EMBED_TPM: int = int(os.getenv("EMBED_TPM", "1000000"))
+    EMBED_CONCURRENCY: int = int(os.getenv("EMBED_CONCURRENCY", "4"))
+    EMBED_BATCH_MAX_TOKENS: int = int(os.getenv("EMBED_BATCH_MAX_TOKENS", "64000"))
+    EMBED_BATCH_MAX_ITEMS: int = int(os.getenv("EMBED_BATCH_MAX_ITEMS", "512"))
+    EMBED_MAX_RETRIES: int = int(os.getenv("EMBED_MAX_RETRIES", "8"))
+    EMBED_QUERY_MAX_RETRIES: int = int(os.getenv("EMBED_QUERY_MAX_RETRIES", "2"))
+
+    # Streaming ingestion: items buffered between pipeline stages and batch sizes
+    INGEST_QUEUE_SIZE: int = int(os.getenv("INGEST_QUEUE_SIZE", "4"))
+    INGEST_EMBED_BATCH_SIZE: int = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "256"))
+    INGEST_WRITE_BATCH_SIZE: int = int(os.getenv("INGEST_WRITE_BATCH_SIZE", "256"))
+    # Concurrent crawls per sync (spaces, folders, drives, page batches) and
+    # processes parsing PDF/Office attachments (0 = one per CPU)
+    INGEST_CRAWL_WORKERS: int = int(os.getenv("INGEST_CRAWL_WORKERS", "4"))
+    INGEST_PARSE_PROCESSES: int = int(os.getenv("INGEST_PARSE_PROCESSES", "0"))
+    # Fully written documents recorded in the sync state per checkpoint
+    INGEST_CHECKPOINT_DOCS: int = int(os.getenv("INGEST_CHECKPOINT_DOCS", "50"))
+    # Per-source chunking profile overrides as JSON, e.g.
+    # {"teams": {"chunk_size": 256}, "confluence": {"parser": "html"}}, and
+    # documents chunked per task in the parse process pool
+    INGEST_CHUNKING: str = os.getenv("INGEST_CHUNKING", "")
+    INGEST_CHUNK_BATCH_DOCS: int = int(os.getenv("INGEST_CHUNK_BATCH_DOCS", "16"))
+
+    # Background indexing jobs: global and per-source concurrency, progress
+    # heartbeat, and how long a running job may go without a heartbeat before
+    # it is considered orphaned (worker restarted) and queued again
+    INDEX_JOB_WORKERS: int = int(os.getenv("INDEX_JOB_WORKERS", "4"))
+    INDEX_JOB_PER_SOURCE: int = int(os.getenv("INDEX_JOB_PER_SOURCE", "2"))
+    INDEX_JOB_HEARTBEAT_SEC: float = float(os.getenv("INDEX_JOB_HEARTBEAT_SEC", "5"))
+    INDEX_JOB_STALE_SEC: float = float(os.getenv("INDEX_JOB_STALE_SEC", "120"))
 
 
 settings = Settings()
\ No newline at end of file
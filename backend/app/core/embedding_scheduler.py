@@ -0,0 +1,296 @@
+"""Shared, rate-limit-aware scheduler for embedding API calls."""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, List, Optional, Tuple, TypeVar
+import tiktoken
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from openai import APIConnectionError
+from .config import settings
+from .logging import logger
+
+T = TypeVar("T")
+
+
+def _status(exc: Exception) -> Optional[int]:
+    return getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    """Return the back-off an HTTP 429 error asks for, or None if `exc` is not a 429."""
+    if _status(exc) != 429:
+        return None
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _transient(exc: Exception) -> bool:
+    """Server errors, timeouts and dropped connections, which are worth retrying."""
+    if isinstance(exc, (APIConnectionError, ConnectionError, TimeoutError)):
+        return True
+    status = _status(exc)
+    return isinstance(status, int) and status >= 500
+
+
+def _backoff(attempt: int) -> float:
+    return min(30.0, 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+class _TokenBucket:
+    """Per-minute budget refilled continuously; a limit of 0 disables it."""
+
+    def __init__(self, per_minute: int) -> None:
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def wait_time(self, amount: float) -> float:
+        if self.capacity <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+        # Requests larger than the whole budget go through once the bucket is full
+        needed = min(amount, self.capacity)
+        return 0.0 if self.level >= needed else (needed - self.level) * 60 / self.capacity
+
+    def take(self, amount: float) -> None:
+        if self.capacity > 0:
+            self.level -= amount
+
+
+class EmbeddingScheduler:
+    """
+    Sends document embeddings for every ingestion path through one place.
+    Texts are packed into batches of at most `max_batch_tokens` tokens and
+    `max_batch_items` inputs; batches from all concurrent callers run on a
+    shared pool of `concurrency` threads and are admitted only while the
+    requests-per-minute and tokens-per-minute budgets allow. On HTTP 429
+    every worker pauses (for the server's Retry-After or an exponential,
+    jittered delay), the batch size is halved and grows back gradually on
+    success; the throttled batch itself is resent in halves. Server errors,
+    timeouts and dropped connections resend the same batch after an
+    exponential delay, without pausing the other workers.
+
+    Query embeddings (`call`/`acall`) skip the queue: they are charged to
+    the budgets but never wait on them or on a pause set by ingestion, and
+    retry at most `query_retries` times, so a throttled re-index cannot
+    stall searches. `stats()` reports the current limits and embedded
+    tokens/sec.
+    """
+
+    def __init__(
+        self,
+        rpm: int,
+        tpm: int,
+        concurrency: int,
+        max_batch_tokens: int,
+        max_batch_items: int,
+        max_retries: int,
+        query_retries: int,
+    ) -> None:
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_items = max_batch_items
+        self.max_retries = max_retries
+        self.query_retries = query_retries
+        self.batch_items = max_batch_items
+        self._requests = _TokenBucket(rpm)
+        self._tokens = _TokenBucket(tpm)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embed")
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self._throttled_in_row = 0
+        self._window: "deque[Tuple[float, int]]" = deque()
+        self._encoding = None
+        self._started = time.monotonic()
+        self.requests = 0
+        self.tokens = 0
+        self.throttled = 0
+        self.failures = 0
+
+    def count_tokens(self, text: str) -> int:
+        if self._encoding is None:
+            try:
+                self._encoding = tiktoken.encoding_for_model(settings.OPENAI_EMBED_MODEL)
+            except KeyError:
+                self._encoding = tiktoken.get_encoding("cl100k_base")
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+    def _admit(self, tokens: int) -> None:
+        """Block until the shared pause has passed and the budgets allow the call."""
+        while True:
+            with self._lock:
+                wait = max(self._paused_until - time.monotonic(), 0.0)
+                if not wait:
+                    wait = max(self._requests.wait_time(1), self._tokens.wait_time(tokens))
+                if not wait:
+                    self._requests.take(1)
+                    self._tokens.take(tokens)
+                    return
+            time.sleep(wait)
+
+    def _record(self, tokens: int, throttled: Optional[float] = None) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if throttled is None:
+                self.requests += 1
+                self.tokens += tokens
+                self._window.append((now, tokens))
+                while self._window[0][0] < now - 60:
+                    self._window.popleft()
+                self._throttled_in_row = 0
+                # Additive increase back towards the configured batch size
+                self.batch_items = min(self.max_batch_items, self.batch_items + max(self.max_batch_items // 16, 1))
+                return
+            self.throttled += 1
+            self._throttled_in_row += 1
+            delay = throttled or min(60.0, 2 ** self._throttled_in_row) * random.uniform(0.5, 1.0)
+            self._paused_until = max(self._paused_until, now + delay)
+            # Multiplicative decrease of the batch size
+            self.batch_items = max(1, self.batch_items // 2)
+        logger.warning("Embedding API rate limited; pausing %.1fs, batch size now %d", delay, self.batch_items)
+
+    def _send(self, fn: Callable[[], T], tokens: int) -> T:
+        """Run one request under the shared budget; a 429 is recorded and re-raised."""
+        self._admit(tokens)
+        try:
+            result = fn()
+        except Exception as ex:
+            retry_after = _retry_after(ex)
+            if retry_after is not None:
+                self._record(tokens, throttled=retry_after)
+            raise
+        self._record(tokens)
+        return result
+
+    def _give_up(self, ex: Exception, attempt: int, retries: int) -> bool:
+        if (_retry_after(ex) is not None or _transient(ex)) and attempt < retries:
+            return False
+        with self._lock:
+            self.failures += 1
+        return True
+
+    def _charge(self, tokens: int) -> None:
+        """Count a query against the budgets without waiting on them."""
+        with self._lock:
+            self._requests.take(1)
+            self._tokens.take(tokens)
+
+    def _settle(self, ex: Exception, tokens: int, attempt: int) -> float:
+        """Record a failed query request; return how long to wait before retrying it."""
+        retry_after = _retry_after(ex)
+        if retry_after is not None:
+            self._record(tokens, throttled=retry_after)
+        if self._give_up(ex, attempt, self.query_retries):
+            raise ex
+        return retry_after or _backoff(attempt)
+
+    def call(self, fn: Callable[[], T], tokens: int) -> T:
+        """Run one query embedding request ahead of queued batches, retrying failures."""
+        for attempt in range(self.query_retries + 1):
+            self._charge(tokens)
+            try:
+                result = fn()
+            except Exception as ex:
+                time.sleep(self._settle(ex, tokens, attempt))
+                continue
+            self._record(tokens)
+            return result
+        raise RuntimeError("unreachable")  # pragma: no cover
+
+    async def acall(self, fn: Callable[[], Awaitable[T]], tokens: int) -> T:
+        """Async `call`: the request and its retries wait on the event loop."""
+        for attempt in range(self.query_retries + 1):
+            self._charge(tokens)
+            try:
+                result = await fn()
+            except Exception as ex:
+                await asyncio.sleep(self._settle(ex, tokens, attempt))
+                continue
+            self._record(tokens)
+            return result
+        raise RuntimeError("unreachable")  # pragma: no cover
+
+    def _run_batch(self, model: BaseEmbedding, texts: List[str], counts: List[int], attempt: int = 0) -> List[Embedding]:
+        # The batch size may have shrunk since the batch was packed
+        if len(texts) > self.batch_items:
+            mid = len(texts) // 2
+            return self._run_batch(model, texts[:mid], counts[:mid], attempt) + self._run_batch(
+                model, texts[mid:], counts[mid:], attempt
+            )
+        try:
+            # One API request per batch (bypasses the model's own small batching)
+            return self._send(lambda: model._get_text_embeddings(texts), sum(counts))
+        except Exception as ex:
+            if self._give_up(ex, attempt, self.max_retries):
+                raise
+            if _retry_after(ex) is None:
+                logger.warning("Embedding request failed (%s); retrying", ex)
+                time.sleep(_backoff(attempt))
+                return self._run_batch(model, texts, counts, attempt + 1)
+        # A throttled batch is retried in halves, so the retry asks for fewer tokens
+        mid = max(len(texts) // 2, 1)
+        first = self._run_batch(model, texts[:mid], counts[:mid], attempt + 1)
+        rest = self._run_batch(model, texts[mid:], counts[mid:], attempt + 1) if texts[mid:] else []
+        return first + rest
+
+    def _pack(self, counts: List[int]) -> List[Tuple[int, int]]:
+        batches: List[Tuple[int, int]] = []
+        start, tokens = 0, 0
+        for i, n in enumerate(counts):
+            if i > start and (tokens + n > self.max_batch_tokens or i - start >= self.batch_items):
+                batches.append((start, i))
+                start, tokens = i, 0
+            tokens += n
+        if start < len(counts):
+            batches.append((start, len(counts)))
+        return batches
+
+    def embed(self, model: BaseEmbedding, texts: List[str]) -> Tuple[List[Embedding], int]:
+        """Embed `texts` with `model`; returns the embeddings in order and the tokens sent."""
+        counts = [self.count_tokens(t) for t in texts]
+        futures = [
+            self._executor.submit(self._run_batch, model, texts[a:b], counts[a:b]) for a, b in self._pack(counts)
+        ]
+        embeddings: List[Embedding] = []
+        for future in futures:
+            embeddings.extend(future.result())
+        return embeddings, sum(counts)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            while self._window and self._window[0][0] < now - 60:
+                self._window.popleft()
+            recent = sum(t for _, t in self._window)
+            span = min(60.0, max(now - self._started, 1.0))
+            return {
+                "requests": self.requests,
+                "tokens": self.tokens,
+                "tokens_per_sec": round(recent / span, 1),
+                "throttled": self.throttled,
+                "failures": self.failures,
+                "batch_items": self.batch_items,
+                "max_batch_tokens": self.max_batch_tokens,
+                "rpm_limit": int(self._requests.capacity),
+                "tpm_limit": int(self._tokens.capacity),
+                "paused_sec": round(max(self._paused_until - now, 0.0), 1),
+            }
+
+
+embedding_scheduler = EmbeddingScheduler(
+    rpm=settings.EMBED_RPM,
+    tpm=settings.EMBED_TPM,
+    concurrency=settings.EMBED_CONCURRENCY,
+    max_batch_tokens=settings.EMBED_BATCH_MAX_TOKENS,
+    max_batch_items=settings.EMBED_BATCH_MAX_ITEMS,
+    max_retries=settings.EMBED_MAX_RETRIES,
+    query_retries=settings.EMBED_QUERY_MAX_RETRIES,
+)
@@ -0,0 +1,156 @@
+"""Content‑hash embedding cache wrapped around the configured embedding model."""
+
+import asyncio
+import hashlib
+from array import array
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.bridge.pydantic import SerializeAsAny
+from .cache import get_cache
+from .config import settings
+from .embedding_scheduler import embedding_scheduler
+
+
+class EmbeddingUsage:
+    """Cache hits/misses and tokens sent for the embedding calls made inside one block."""
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.tokens = 0
+
+    def as_dict(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else None,
+            "tokens": self.tokens,
+        }
+
+
+_current_usage: ContextVar[Optional[EmbeddingUsage]] = ContextVar("embedding_usage", default=None)
+
+
+@contextmanager
+def embedding_usage() -> Iterator[EmbeddingUsage]:
+    """Collect embedding cache hits/misses for calls made inside the block."""
+    usage = EmbeddingUsage()
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+
+
+# Embeddings never go stale for a given (model, dimension, text); keep them on disk
+_embedding_cache = get_cache(
+    "embeddings",
+    max_entries=settings.EMBED_CACHE_MAX_ENTRIES,
+    max_bytes=settings.EMBED_CACHE_MAX_BYTES,
+    ttl_sec=None,
+    persist=settings.EMBED_CACHE_PERSIST,
+)
+
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    Embedding model that serves repeated texts and queries from a cache keyed
+    by (model, dimension, sha256 of text) and only sends misses to the
+    wrapped model. Vectors are stored as packed float32 in the shared
+    "embeddings" cache namespace (in‑memory LRU in front of a local SQLite
+    file), so unchanged chunks are not re‑embedded when a source is
+    re‑indexed, even after a restart. Misses go through the shared
+    `embedding_scheduler`, which batches them by tokens and keeps all
+    callers within the API's rate limits; query misses are sent ahead of
+    ingestion batches, natively async from async callers.
+    """
+
+    inner: SerializeAsAny[BaseEmbedding]
+    dimension: int
+
+    def __init__(self, inner: BaseEmbedding, dimension: int, **kwargs) -> None:
+        super().__init__(
+            inner=inner,
+            dimension=dimension,
+            model_name=inner.model_name,
+            embed_batch_size=inner.embed_batch_size,
+            **kwargs,
+        )
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    def _key(self, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.model_name}:{self.dimension}:{digest}"
+
+    def _lookup(self, texts: List[str]) -> Tuple[List[Optional[Embedding]], List[int]]:
+        found: List[Optional[Embedding]] = []
+        missing: List[int] = []
+        for i, text in enumerate(texts):
+            blob = _embedding_cache.get(self._key(text))
+            if blob is None:
+                missing.append(i)
+                found.append(None)
+            else:
+                found.append(array("f", blob).tolist())
+        usage = _current_usage.get()
+        if usage is not None:
+            usage.hits += len(texts) - len(missing)
+            usage.misses += len(missing)
+        return found, missing
+
+    def _fill(self, texts: List[str], found: List[Optional[Embedding]], missing: List[int], computed: List[Embedding]) -> List[Embedding]:
+        for i, emb in zip(missing, computed):
+            found[i] = emb
+            _embedding_cache.set(self._key(texts[i]), array("f", emb).tobytes())
+        return found  # type: ignore[return-value]
+
+    @staticmethod
+    def _count(tokens: int) -> None:
+        usage = _current_usage.get()
+        if usage is not None:
+            usage.tokens += tokens
+
+    def _embed(self, texts: List[str]) -> List[Embedding]:
+        embeddings, tokens = embedding_scheduler.embed(self.inner, texts)
+        self._count(tokens)
+        return embeddings
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        found, missing = self._lookup([query])
+        if missing:
+            tokens = embedding_scheduler.count_tokens(query)
+            computed = [embedding_scheduler.call(lambda: self.inner.get_query_embedding(query), tokens)]
+            self._count(tokens)
+        else:
+            computed = []
+        return self._fill([query], found, missing, computed)[0]
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        found, missing = self._lookup([query])
+        if missing:
+            tokens = embedding_scheduler.count_tokens(query)
+            computed = [await embedding_scheduler.acall(lambda: self.inner.aget_query_embedding(query), tokens)]
+            self._count(tokens)
+        else:
+            computed = []
+        return self._fill([query], found, missing, computed)[0]
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        found, missing = self._lookup(texts)
+        computed = self._embed([texts[i] for i in missing]) if missing else []
+        return self._fill(texts, found, missing, computed)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return await asyncio.to_thread(self._get_text_embeddings, texts)
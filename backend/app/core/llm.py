@@ -5,11 +5,21 @@ from llama_index.core import Settings as LlamaSettings
 from llama_index.llms.openai import OpenAI
 from llama_index.embeddings.openai import OpenAIEmbedding
 from .config import settings
+from .embeddings import CachedEmbedding
 
 # Set OpenAI key for LlamaIndex
 os.environ["OPENAI_API_KEY"] = settings.OPENAI_API_KEY
 
 # Configure LLM and embedding model via LlamaIndex
 LlamaSettings.llm = OpenAI(model=settings.OPENAI_MODEL, temperature=0)
-LlamaSettings.embed_model = OpenAIEmbedding(model=settings.OPENAI_EMBED_MODEL)
+# Retries (429, 5xx, timeouts, dropped connections) are handled by the embedding scheduler, not the client
+LlamaSettings.embed_model = CachedEmbedding(
+    OpenAIEmbedding(
+        model=settings.OPENAI_EMBED_MODEL,
+        api_base=settings.OPENAI_EMBED_API_BASE or None,
+        max_retries=0,
+    ),
+    dimension=settings.OPENAI_EMBED_DIM,
+)
+# Ingestion chunks per source (services/ingestion/transforms.py)
 LlamaSettings.chunk_size = 1024
\ No newline at end of file
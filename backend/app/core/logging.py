@@ -2,13 +2,25 @@
 
 import logging
 import sys
+from contextvars import ContextVar
+
+# Trace id of the request being served (set by the tracing middleware)
+trace_id_var: ContextVar[str] = ContextVar("trace_id", default="-")
+
+
+class _TraceIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = trace_id_var.get()
+        return True
 
 
 logging.basicConfig(
     stream=sys.stdout,
     level=logging.INFO,
-    format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+    format="%(asctime)s %(levelname)s [%(name)s] [%(trace_id)s] %(message)s",
 )
+for _handler in logging.getLogger().handlers:
+    _handler.addFilter(_TraceIdFilter())
 
 # Create a module level logger for reuse
-logger = logging.getLogger("talk_to_db")
\ No newline at end of file
+logger = logging.getLogger("talk_to_db")
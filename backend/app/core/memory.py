@@ -1,23 +1,381 @@
-"""Conversation memory utilities."""
+"""Conversation memory backed by a shared session store."""
 
-from typing import Dict
-from llama_index.core.storage.chat_store import SimpleChatStore
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, List, Optional, Tuple
+from pydantic import PrivateAttr
+from sqlalchemy import JSON, Column, DateTime, Integer, String, Table, delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from llama_index.core.base.llms.types import ChatMessage, MessageRole
 from llama_index.core.memory import ChatMemoryBuffer
+from llama_index.core.storage.chat_store import BaseChatStore
+from llama_index.core.utils import get_tokenizer
+from .config import settings
+from .logging import logger
+from .state import ensure_tables, state_engine, state_metadata
 
+sessions_table = Table(
+    f"{settings.COLLECTION_PREFIX}chat_sessions",
+    state_metadata,
+    Column("key", String(256), primary_key=True),
+    # Bumped on every write so workers can tell whether their cached copy is current
+    Column("version", Integer, nullable=False),
+    Column("updated_at", DateTime(timezone=True), index=True),
+)
 
-_chat_store = SimpleChatStore()
-_sessions: Dict[str, ChatMemoryBuffer] = {}
+messages_table = Table(
+    f"{settings.COLLECTION_PREFIX}chat_messages",
+    state_metadata,
+    Column("key", String(256), primary_key=True),
+    Column("seq", Integer, primary_key=True),
+    Column("message", JSON, nullable=False),
+    Column("tokens", Integer, nullable=False),
+)
 
 
-def get_memory(session_id: str) -> ChatMemoryBuffer:
+class _Session:
+    """Cached copy of one session's history with per-message token counts."""
+
+    def __init__(self, version: int, messages: List[ChatMessage], tokens: List[int], seqs: List[int]) -> None:
+        self.version = version
+        self.messages = messages
+        self.tokens = tokens
+        self.seqs = seqs
+        self.size = sum(tokens)
+        self.used_at = time.monotonic()
+
+
+class SessionStore:
     """
-    Return a ChatMemoryBuffer for the given session. Creates one if it does
-    not already exist. Keeps a small token limit to avoid exceeding LLM
-    context windows.
+    Chat histories persisted in the shared state database (Postgres, or
+    SQLite for local runs), so every API worker sees the same sessions.
+    Recently used sessions are cached in process, bounded by `max_sessions`
+    and `max_tokens` of messages and evicted after `idle_sec` without use.
+    A cached session is revalidated against its version row on every read,
+    so a turn served by another worker is picked up. Each session keeps its
+    last `max_messages` messages; sessions untouched for `retention_sec`
+    are deleted. Token counts are computed once per message when it is
+    added.
     """
-    if session_id not in _sessions:
-        _sessions[session_id] = ChatMemoryBuffer.from_defaults(
-            chat_store=_chat_store,
-            token_limit=4000,
+
+    def __init__(
+        self, max_sessions: int, max_tokens: int, idle_sec: float, max_messages: int, retention_sec: float
+    ) -> None:
+        self.max_sessions = max_sessions
+        self.max_tokens = max_tokens
+        self.idle_sec = idle_sec
+        self.max_messages = max_messages
+        self.retention_sec = retention_sec
+        self._cache: "OrderedDict[str, _Session]" = OrderedDict()
+        self._tokens = 0
+        self._lock = threading.Lock()
+        self._tokenizer = None
+        self._purged_at = 0.0
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def _count_tokens(self, message: ChatMessage) -> int:
+        if self._tokenizer is None:
+            self._tokenizer = get_tokenizer()
+        return len(self._tokenizer(message.content or ""))
+
+    # In-process cache
+
+    def _cached(self, key: str) -> Optional[_Session]:
+        with self._lock:
+            session = self._cache.get(key)
+            if session is not None:
+                self._cache.move_to_end(key)
+            return session
+
+    def _remember(self, key: str, session: _Session) -> None:
+        now = time.monotonic()
+        with self._lock:
+            old = self._cache.pop(key, None)
+            if old is not None:
+                self._tokens -= old.size
+            self._cache[key] = session
+            self._tokens += session.size
+            while self._cache:
+                oldest_key, oldest = next(iter(self._cache.items()))
+                idle = now - oldest.used_at > self.idle_sec
+                if not (idle or len(self._cache) > self.max_sessions or self._tokens > self.max_tokens):
+                    break
+                if oldest_key == key:
+                    break
+                del self._cache[oldest_key]
+                self._tokens -= oldest.size
+                self.evictions += 1
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            old = self._cache.pop(key, None)
+            if old is not None:
+                self._tokens -= old.size
+
+    # Persistent store
+
+    def _load(self, conn, key: str, version: int) -> _Session:
+        rows = conn.execute(
+            select(messages_table.c.seq, messages_table.c.message, messages_table.c.tokens)
+            .where(messages_table.c.key == key)
+            .order_by(messages_table.c.seq)
+        ).all()
+        with self._lock:
+            self.loads += 1
+        return _Session(
+            version,
+            [ChatMessage.model_validate(r.message) for r in rows],
+            [r.tokens for r in rows],
+            [r.seq for r in rows],
         )
-    return _sessions[session_id]
\ No newline at end of file
+
+    def session(self, key: str) -> _Session:
+        """The current history of `key`, from the process cache when it is up to date."""
+        ensure_tables(sessions_table, messages_table)
+        self._maybe_purge()
+        with state_engine.connect() as conn:
+            version = conn.execute(select(sessions_table.c.version).where(sessions_table.c.key == key)).scalar()
+            if version is None:
+                self._forget(key)
+                return _Session(0, [], [], [])
+            cached = self._cached(key)
+            if cached is not None and cached.version == version:
+                with self._lock:
+                    self.hits += 1
+                cached.used_at = time.monotonic()
+                return cached
+            session = self._load(conn, key, version)
+        self._remember(key, session)
+        return session
+
+    def _bump(self, conn, key: str) -> int:
+        now = datetime.now(timezone.utc)
+        updated = conn.execute(
+            update(sessions_table)
+            .where(sessions_table.c.key == key)
+            .values(version=sessions_table.c.version + 1, updated_at=now)
+        ).rowcount
+        if not updated:
+            conn.execute(insert(sessions_table).values(key=key, version=1, updated_at=now))
+        return conn.execute(select(sessions_table.c.version).where(sessions_table.c.key == key)).scalar()
+
+    def append(self, key: str, message: ChatMessage) -> None:
+        ensure_tables(sessions_table, messages_table)
+        tokens = self._count_tokens(message)
+        payload = message.model_dump(mode="json")
+        for attempt in range(3):
+            try:
+                with state_engine.begin() as conn:
+                    last = conn.execute(
+                        select(func.max(messages_table.c.seq)).where(messages_table.c.key == key)
+                    ).scalar()
+                    seq = (last or 0) + 1
+                    conn.execute(insert(messages_table).values(key=key, seq=seq, message=payload, tokens=tokens))
+                    if self.max_messages:
+                        conn.execute(
+                            delete(messages_table).where(
+                                messages_table.c.key == key, messages_table.c.seq <= seq - self.max_messages
+                            )
+                        )
+                    version = self._bump(conn, key)
+                break
+            except IntegrityError:
+                # Another worker appended to the same session concurrently
+                if attempt == 2:
+                    raise
+        cached = self._cached(key)
+        if cached is not None and cached.version == version - 1:
+            # Extend the cached copy instead of reloading the whole history
+            keep = -self.max_messages if self.max_messages else 0
+            messages = (cached.messages + [message])[keep:]
+            counts = (cached.tokens + [tokens])[keep:]
+            seqs = (cached.seqs + [seq])[keep:]
+            self._remember(key, _Session(version, messages, counts, seqs))
+        else:
+            self._forget(key)
+
+    def replace(self, key: str, messages: List[ChatMessage]) -> None:
+        ensure_tables(sessions_table, messages_table)
+        messages = messages[-self.max_messages :] if self.max_messages else messages
+        counts = [self._count_tokens(m) for m in messages]
+        with state_engine.begin() as conn:
+            conn.execute(delete(messages_table).where(messages_table.c.key == key))
+            if messages:
+                conn.execute(
+                    insert(messages_table),
+                    [
+                        {"key": key, "seq": i + 1, "message": m.model_dump(mode="json"), "tokens": n}
+                        for i, (m, n) in enumerate(zip(messages, counts))
+                    ],
+                )
+            version = self._bump(conn, key)
+        self._remember(key, _Session(version, list(messages), counts, list(range(1, len(messages) + 1))))
+
+    def delete(self, key: str) -> None:
+        ensure_tables(sessions_table, messages_table)
+        with state_engine.begin() as conn:
+            conn.execute(delete(messages_table).where(messages_table.c.key == key))
+            conn.execute(delete(sessions_table).where(sessions_table.c.key == key))
+        self._forget(key)
+
+    def keys(self) -> List[str]:
+        ensure_tables(sessions_table, messages_table)
+        with state_engine.connect() as conn:
+            return list(conn.execute(select(sessions_table.c.key)).scalars())
+
+    def _maybe_purge(self) -> None:
+        """Delete sessions idle for longer than `retention_sec` (at most every few minutes)."""
+        now = time.monotonic()
+        if not self.retention_sec or now - self._purged_at < 300:
+            return
+        self._purged_at = now
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.retention_sec)
+        try:
+            with state_engine.begin() as conn:
+                stale = select(sessions_table.c.key).where(sessions_table.c.updated_at < cutoff)
+                conn.execute(delete(messages_table).where(messages_table.c.key.in_(stale)))
+                removed = conn.execute(delete(sessions_table).where(sessions_table.c.updated_at < cutoff)).rowcount
+            if removed:
+                logger.info("Purged %d expired chat sessions", removed)
+        except Exception:  # pragma: no cover - purging is best effort
+            logger.exception("Failed to purge expired chat sessions")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "cached_sessions": len(self._cache),
+                "cached_tokens": self._tokens,
+                "max_sessions": self.max_sessions,
+                "max_tokens": self.max_tokens,
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+
+class SessionChatStore(BaseChatStore):
+    """LlamaIndex chat store interface over a SessionStore."""
+
+    _store: SessionStore = PrivateAttr()
+
+    def __init__(self, store: SessionStore, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._store = store
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "SessionChatStore"
+
+    def counted_messages(self, key: str) -> Tuple[List[ChatMessage], List[int]]:
+        session = self._store.session(key)
+        return session.messages, session.tokens
+
+    def set_messages(self, key: str, messages: List[ChatMessage]) -> None:
+        self._store.replace(key, messages)
+
+    def get_messages(self, key: str) -> List[ChatMessage]:
+        return list(self._store.session(key).messages)
+
+    def add_message(self, key: str, message: ChatMessage, idx: Optional[int] = None) -> None:
+        if idx is None:
+            self._store.append(key, message)
+            return
+        messages = self.get_messages(key)
+        messages.insert(idx, message)
+        self._store.replace(key, messages)
+
+    def delete_messages(self, key: str) -> Optional[List[ChatMessage]]:
+        messages = self.get_messages(key)
+        self._store.delete(key)
+        return messages or None
+
+    def delete_message(self, key: str, idx: int) -> Optional[ChatMessage]:
+        messages = self.get_messages(key)
+        if idx >= len(messages):
+            return None
+        removed = messages.pop(idx)
+        self._store.replace(key, messages)
+        return removed
+
+    def delete_last_message(self, key: str) -> Optional[ChatMessage]:
+        messages = self.get_messages(key)
+        if not messages:
+            return None
+        removed = messages.pop()
+        self._store.replace(key, messages)
+        return removed
+
+    def get_keys(self) -> List[str]:
+        return self._store.keys()
+
+
+class SessionMemory(ChatMemoryBuffer):
+    """
+    ChatMemoryBuffer that trims the history to the token limit from the
+    per-message token counts kept by the session store, instead of
+    re-tokenizing the whole history on every turn. The async methods, which
+    the chat agent uses, run the store's database calls on a worker thread.
+    """
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "SessionMemory"
+
+    def get(self, input: Optional[str] = None, initial_token_count: int = 0, **kwargs: Any) -> List[ChatMessage]:
+        if not isinstance(self.chat_store, SessionChatStore):
+            return super().get(input=input, initial_token_count=initial_token_count, **kwargs)
+        budget = self.token_limit - initial_token_count
+        if budget < 0:
+            raise ValueError("Initial token count exceeds token limit")
+        messages, counts = self.chat_store.counted_messages(self.chat_store_key)
+        start, total = len(messages), 0
+        while start > 0 and total + counts[start - 1] <= budget:
+            start -= 1
+            total += counts[start]
+        # Do not open the window with a reply whose question was cut off
+        while start < len(messages) and messages[start].role in (MessageRole.ASSISTANT, MessageRole.TOOL):
+            start += 1
+        return list(messages[start:])
+
+    async def aget(self, input: Optional[str] = None, initial_token_count: int = 0, **kwargs: Any) -> List[ChatMessage]:
+        return await asyncio.to_thread(self.get, input=input, initial_token_count=initial_token_count, **kwargs)
+
+    async def aget_all(self) -> List[ChatMessage]:
+        return await asyncio.to_thread(self.get_all)
+
+    async def aput(self, message: ChatMessage) -> None:
+        await asyncio.to_thread(self.put, message)
+
+    async def aset(self, messages: List[ChatMessage]) -> None:
+        await asyncio.to_thread(self.set, messages)
+
+    async def areset(self) -> None:
+        await asyncio.to_thread(self.reset)
+
+
+session_store = SessionStore(
+    max_sessions=settings.SESSION_CACHE_MAX_SESSIONS,
+    max_tokens=settings.SESSION_CACHE_MAX_TOKENS,
+    idle_sec=settings.SESSION_IDLE_SEC,
+    max_messages=settings.SESSION_MAX_MESSAGES,
+    retention_sec=settings.SESSION_RETENTION_SEC,
+)
+_chat_store = SessionChatStore(session_store)
+
+
+def get_memory(session_id: str) -> ChatMemoryBuffer:
+    """
+    Return the memory of the given session. Histories live in the shared
+    session store, so any API worker can continue a session. Keeps a small
+    token limit to avoid exceeding LLM context windows.
+    """
+    return SessionMemory.from_defaults(
+        chat_store=_chat_store,
+        chat_store_key=session_id,
+        token_limit=settings.SESSION_TOKEN_LIMIT,
+    )
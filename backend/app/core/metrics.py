@@ -0,0 +1,290 @@
+"""Per-stage latency metrics, request traces and their Prometheus exposition."""
+
+import bisect
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from llama_index.core.instrumentation import get_dispatcher
+from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+from llama_index.core.instrumentation.events import BaseEvent
+from llama_index.core.instrumentation.events.llm import (
+    LLMChatEndEvent,
+    LLMChatInProgressEvent,
+    LLMChatStartEvent,
+    LLMCompletionEndEvent,
+    LLMCompletionInProgressEvent,
+    LLMCompletionStartEvent,
+)
+from .config import settings
+from .logging import logger, trace_id_var
+
+# Seconds; covers cache hits (sub-millisecond) up to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one series per label combination."""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts incl. +Inf, sum)
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            counts, total = self._series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def snapshot(self) -> List[dict]:
+        """Count and sum of every series, e.g. for summaries outside Prometheus."""
+        with self._lock:
+            return [
+                {**dict(zip(self.labels, key)), "count": sum(counts), "sum": total[0]}
+                for key, (counts, total) in sorted(self._series.items())
+            ]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((k, list(c), t[0]) for k, (c, t) in self._series.items())
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip([f"{b:g}" for b in self.buckets] + ["+Inf"], counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter with one series per label combination."""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str]):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._series: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            series = sorted(self._series.items())
+        lines.extend(f"{self.name}{_labels(self.labels, key)} {value:g}" for key, value in series)
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Process-local metrics. Every API worker keeps its own; scrape each
+    worker (or sum across them) as with any multi-process Prometheus target.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: "OrderedDict[str, Any]" = OrderedDict()
+
+    def histogram(self, name: str, help: str, labels: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS):
+        return self._metrics.setdefault(name, Histogram(name, help, labels, buckets))
+
+    def counter(self, name: str, help: str, labels: Sequence[str]):
+        return self._metrics.setdefault(name, Counter(name, help, labels))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+request_seconds = metrics.histogram(
+    "talk2db_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status")
+)
+stage_seconds = metrics.histogram(
+    "talk2db_stage_duration_seconds",
+    "Latency of request stages (engine build, embedding, retrieval, fusion, LLM, SQL, Cypher).",
+    ("stage", "target", "status"),
+)
+llm_ttft_seconds = metrics.histogram(
+    "talk2db_llm_time_to_first_token_seconds", "Time to the first streamed LLM token.", ("model", "target")
+)
+llm_tokens = metrics.counter("talk2db_llm_tokens_total", "LLM tokens reported by the provider.", ("model", "kind"))
+
+
+class RequestTrace:
+    """Stage timings of one HTTP request, logged in full when the request is slow."""
+
+    def __init__(self, trace_id: str, method: str, path: str) -> None:
+        self.trace_id = trace_id
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.stages: List[dict] = []
+        self.llm_tokens = {"prompt": 0, "completion": 0}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, target: str, status: str, started: float, seconds: float) -> None:
+        entry = {
+            "stage": stage,
+            "target": target,
+            "status": status,
+            "at_ms": round((started - self.started) * 1000, 1),
+            "ms": round(seconds * 1000, 1),
+        }
+        with self._lock:
+            self.stages.append(entry)
+
+    def add_tokens(self, prompt: int, completion: int) -> None:
+        with self._lock:
+            self.llm_tokens["prompt"] += prompt
+            self.llm_tokens["completion"] += completion
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "trace_id": self.trace_id,
+                "method": self.method,
+                "path": self.path,
+                "ms": round((time.perf_counter() - self.started) * 1000, 1),
+                "stages": sorted(self.stages, key=lambda s: s["at_ms"]),
+                "llm_tokens": dict(self.llm_tokens),
+            }
+
+
+_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+# Innermost running stage; LLM calls are attributed to it (e.g. SQL generation inside "sql_plan")
+_stage: ContextVar[str] = ContextVar("metrics_stage", default="")
+
+
+def start_trace(method: str, path: str, trace_id: Optional[str] = None) -> RequestTrace:
+    """Begin the trace of a request in the current context."""
+    trace = RequestTrace(trace_id or uuid.uuid4().hex, method, path)
+    _trace.set(trace)
+    trace_id_var.set(trace.trace_id)
+    return trace
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _trace.get()
+
+
+def finish_trace(trace: RequestTrace, route: str, status: int) -> None:
+    """Record the request latency and log its stage breakdown if it exceeded SLOW_REQUEST_MS."""
+    seconds = time.perf_counter() - trace.started
+    request_seconds.observe(seconds, method=trace.method, route=route, status=str(status))
+    if settings.SLOW_REQUEST_MS > 0 and seconds * 1000 >= settings.SLOW_REQUEST_MS:
+        logger.warning("Slow request %s %s: %s", trace.method, trace.path, trace.as_dict())
+
+
+def observe_stage(stage: str, seconds: float, target: str = "", status: str = "ok", started: Optional[float] = None):
+    """Record a stage timed elsewhere (`started` is its perf_counter start, if known)."""
+    stage_seconds.observe(seconds, stage=stage, target=target, status=status)
+    trace = _trace.get()
+    if trace is not None:
+        trace.add(stage, target, status, started if started is not None else time.perf_counter() - seconds, seconds)
+
+
+class _Stage:
+    """Outcome of a running `stage`; callers may override the status (e.g. "cached")."""
+
+    def __init__(self) -> None:
+        self.status = "ok"
+
+
+@contextmanager
+def stage(name: str, target: str = "") -> Iterator[_Stage]:
+    """Time the enclosed block as `name`; the status becomes "error" if it raises."""
+    outcome = _Stage()
+    token = _stage.set(name)
+    started = time.perf_counter()
+    try:
+        yield outcome
+    except BaseException:
+        outcome.status = "error"
+        raise
+    finally:
+        _stage.reset(token)
+        observe_stage(name, time.perf_counter() - started, target, outcome.status, started)
+
+
+def _token_counts(response: Any) -> Tuple[int, int]:
+    usage = getattr(response, "additional_kwargs", None) or {}
+    return int(usage.get("prompt_tokens") or 0), int(usage.get("completion_tokens") or 0)
+
+
+class _LLMTimer(BaseEventHandler):
+    """
+    Times LLM calls from their start to end events (matched by span) and
+    records time to first token for streamed calls and provider-reported
+    token usage. Calls are attributed to the enclosing stage, or to
+    "response" for answer synthesis and agent reasoning.
+    """
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LLMTimer"
+
+    def handle(self, event: BaseEvent, **kwargs: Any) -> None:
+        if isinstance(event, (LLMChatStartEvent, LLMCompletionStartEvent)):
+            with _pending_lock:
+                _pending_llm[event.span_id] = [time.perf_counter(), False, _stage.get() or "response"]
+                while len(_pending_llm) > _MAX_PENDING_LLM:
+                    _pending_llm.popitem(last=False)
+        elif isinstance(event, (LLMChatInProgressEvent, LLMCompletionInProgressEvent)):
+            with _pending_lock:
+                entry = _pending_llm.get(event.span_id)
+                if entry is None or entry[1]:
+                    return
+                entry[1] = True
+            llm_ttft_seconds.observe(time.perf_counter() - entry[0], model=settings.OPENAI_MODEL, target=entry[2])
+        elif isinstance(event, (LLMChatEndEvent, LLMCompletionEndEvent)):
+            with _pending_lock:
+                entry = _pending_llm.pop(event.span_id, None)
+            if entry is None:
+                return
+            seconds = time.perf_counter() - entry[0]
+            observe_stage("llm", seconds, entry[2], started=entry[0])
+            prompt, completion = _token_counts(event.response)
+            if prompt or completion:
+                llm_tokens.inc(prompt, model=settings.OPENAI_MODEL, kind="prompt")
+                llm_tokens.inc(completion, model=settings.OPENAI_MODEL, kind="completion")
+                trace = _trace.get()
+                if trace is not None:
+                    trace.add_tokens(prompt, completion)
+
+
+# span id -> [start, first token seen, stage]; spans whose end event never
+# arrives (abandoned streams) are dropped beyond _MAX_PENDING_LLM
+_pending_llm: "OrderedDict[Optional[str], list]" = OrderedDict()
+_MAX_PENDING_LLM = 1024
+_pending_lock = threading.Lock()
+get_dispatcher().add_event_handler(_LLMTimer())
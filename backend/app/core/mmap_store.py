@@ -0,0 +1,581 @@
+"""Embedded vector store on memory-mapped arrays for single-node deployments."""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryMode,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import build_metadata_filter_fn, metadata_dict_to_node, node_to_metadata_dict
+from .logging import logger
+
+DTYPES = {"float32": np.float32, "float16": np.float16}
+# Rows scored per matrix product; bounds the float32 copy of float16 blocks
+_BLOCK_ROWS = 4096
+# Smallest vector file (in rows) and smallest tombstone count worth compacting
+_MIN_ROWS = 1024
+# IVF lists are trained once the collection has this many live rows per list
+_IVF_MIN_ROWS_PER_LIST = 39
+_IVF_SAMPLE_PER_LIST = 64
+_IVF_ITERATIONS = 10
+# Keys added by node_to_metadata_dict that are not user metadata
+_PAYLOAD_KEYS = ("_node_content", "_node_type")
+_WORD = re.compile(r"\w+")
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS meta ("
+    "id INTEGER PRIMARY KEY CHECK (id = 0), dim INTEGER, dtype TEXT, "
+    "generation INTEGER, slots INTEGER, version INTEGER)",
+    "CREATE TABLE IF NOT EXISTS nodes ("
+    "id INTEGER PRIMARY KEY, slot INTEGER, node_id TEXT, ref_doc_id TEXT, "
+    "metadata TEXT, deleted INTEGER DEFAULT 0, version INTEGER)",
+    "CREATE INDEX IF NOT EXISTS nodes_version ON nodes (version)",
+    "CREATE INDEX IF NOT EXISTS nodes_node_id ON nodes (node_id)",
+    "CREATE INDEX IF NOT EXISTS nodes_ref_doc_id ON nodes (ref_doc_id)",
+    # Node text lives only here; rowid = nodes.id
+    "CREATE VIRTUAL TABLE IF NOT EXISTS nodes_fts USING fts5 (text)",
+)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def _chunks(values: Sequence, size: int = 500) -> Iterable[Sequence]:
+    for i in range(0, len(values), size):
+        yield values[i : i + size]
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first."""
+    if k < len(scores):
+        part = np.argpartition(-scores, k - 1)[:k]
+    else:
+        part = np.arange(len(scores))
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+class _IVF:
+    """Coarse quantizer: spherical k-means centroids and the slots of every list."""
+
+    def __init__(self, centroids: np.ndarray, members: List[np.ndarray], slots: int, trained_on: int) -> None:
+        self.centroids = centroids
+        self.members = members
+        self.slots = slots
+        self.trained_on = trained_on
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray, start: int, stop: int) -> np.ndarray:
+        labels = np.empty(stop - start, dtype=np.int32)
+        for i in range(start, stop, _BLOCK_ROWS):
+            block = np.asarray(vectors[i : min(i + _BLOCK_ROWS, stop)], dtype=np.float32)
+            labels[i - start : i - start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        return labels
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, alive: np.ndarray, lists: int) -> "_IVF":
+        live = np.flatnonzero(alive)
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(live, size=min(len(live), lists * _IVF_SAMPLE_PER_LIST), replace=False))
+        data = np.asarray(vectors[sample], dtype=np.float32)
+        centroids = data[rng.choice(len(data), size=lists, replace=False)].copy()
+        for _ in range(_IVF_ITERATIONS):
+            labels = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, data)
+            filled = np.bincount(labels, minlength=lists) > 0
+            # Empty lists keep their previous centroid
+            centroids[filled] = _normalize(sums[filled])
+        ivf = cls(centroids, [np.empty(0, dtype=np.int64)] * lists, 0, len(live))
+        return ivf.extend(vectors, len(vectors))
+
+    def extend(self, vectors: np.ndarray, slots: int) -> "_IVF":
+        """A copy that also covers slots [self.slots, slots)."""
+        if slots <= self.slots:
+            return self
+        labels = self._assign(vectors, self.centroids, self.slots, slots)
+        order = np.argsort(labels, kind="stable")
+        bounds = np.searchsorted(labels[order], np.arange(len(self.centroids) + 1))
+        members = [
+            np.concatenate([m, order[bounds[i] : bounds[i + 1]] + self.slots]) if bounds[i + 1] > bounds[i] else m
+            for i, m in enumerate(self.members)
+        ]
+        return _IVF(self.centroids, members, slots, self.trained_on)
+
+    def probe(self, query: np.ndarray, probes: int) -> np.ndarray:
+        """Slots of the `probes` lists closest to the query."""
+        lists = _top_k(self.centroids @ query, probes)
+        return np.concatenate([self.members[i] for i in lists])
+
+
+class MmapCollection:
+    """
+    One vector collection stored in a directory: unit-normalized embeddings
+    in a memory-mapped `vectors-<generation>.bin` (float32 or float16, one
+    row per slot) next to `payload.db`, a SQLite file holding node payloads,
+    metadata and a full-text (FTS5) index for sparse retrieval.
+
+    Dense queries are a vectorized scan of the mapped rows (or of the IVF
+    lists closest to the query once `ivf_lists` is set and the collection is
+    large enough), so they never leave the process. Writers append rows
+    under the SQLite write lock, so the API workers and indexing jobs of one
+    node can share a collection; every write bumps a version, and readers
+    load the rows changed since their version at most every `poll_sec`
+    (immediately after their own writes). Removed rows are tombstoned and
+    the file is rewritten into a new generation once they outnumber the
+    live ones.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        dim: int,
+        dtype: str = "float32",
+        poll_sec: float = 1.0,
+        ivf_lists: int = 0,
+        ivf_probes: int = 8,
+    ) -> None:
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported vector dtype {dtype!r}; expected one of {sorted(DTYPES)}")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(
+            os.path.join(path, "payload.db"), check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        for ddl in _SCHEMA:
+            self._conn.execute(ddl)
+        self._conn.execute("INSERT OR IGNORE INTO meta VALUES (0, ?, ?, 0, 0, 0)", (dim, dtype))
+        # The layout of an existing collection wins over the settings
+        self.dim, self.dtype = self._conn.execute("SELECT dim, dtype FROM meta WHERE id = 0").fetchone()
+        if (self.dim, self.dtype) != (dim, dtype):
+            logger.warning("Vector collection %s keeps its layout %s x %s", path, self.dim, self.dtype)
+        self._np_dtype = DTYPES[self.dtype]
+        self._poll_sec = poll_sec
+        self._ivf_lists = ivf_lists
+        self._ivf_probes = max(1, min(ivf_probes, ivf_lists or 1))
+        # Serializes use of the SQLite connection
+        self._db_lock = threading.Lock()
+        # Guards the loaded state below; arrays are replaced rather than
+        # mutated, so a query works on the snapshot it took
+        self._lock = threading.RLock()
+        self._generation = -1
+        self._version = -1
+        self._checked_at = 0.0
+        self._vectors: Optional[np.ndarray] = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._node_ids: List[Optional[str]] = []
+        self._ref_doc_ids: List[Optional[str]] = []
+        self._metadata: List[Optional[dict]] = []
+        self._filter_masks: Dict[str, np.ndarray] = {}
+        self._ivf: Optional[_IVF] = None
+        self._ivf_training = False
+
+    def _file(self, generation: int) -> str:
+        return os.path.join(self.path, f"vectors-{generation}.bin")
+
+    # -- loading -----------------------------------------------------------
+
+    def _refresh(self, force: bool = False) -> None:
+        """Pick up writes made since the loaded version (throttled by poll_sec)."""
+        if not force and time.monotonic() - self._checked_at < self._poll_sec:
+            return
+        with self._lock:
+            with self._db_lock:
+                self._conn.execute("BEGIN")
+                try:
+                    generation, slots, version = self._conn.execute(
+                        "SELECT generation, slots, version FROM meta WHERE id = 0"
+                    ).fetchone()
+                    full = generation != self._generation
+                    rows = []
+                    if full or version != self._version:
+                        rows = self._conn.execute(
+                            "SELECT slot, node_id, ref_doc_id, metadata, deleted FROM nodes WHERE version > ?",
+                            (-1 if full else self._version,),
+                        ).fetchall()
+                finally:
+                    self._conn.execute("COMMIT")
+            self._checked_at = time.monotonic()
+            if not full and version == self._version:
+                return
+            try:
+                self._apply(generation, slots, version, rows, full)
+            except FileNotFoundError:
+                # Compacted into a new generation after the snapshot was read
+                self._refresh(force=True)
+
+    def _apply(self, generation: int, slots: int, version: int, rows: list, full: bool) -> None:
+        vectors = (
+            np.memmap(self._file(generation), dtype=self._np_dtype, mode="r", shape=(slots, self.dim))
+            if slots
+            else None
+        )
+        if full:
+            alive = np.zeros(slots, dtype=bool)
+            self._node_ids, self._ref_doc_ids, self._metadata = [None] * slots, [None] * slots, [None] * slots
+            self._ivf = None
+        else:
+            alive = np.zeros(slots, dtype=bool)
+            alive[: len(self._alive)] = self._alive
+            grow = slots - len(self._node_ids)
+            for column in (self._node_ids, self._ref_doc_ids, self._metadata):
+                column.extend([None] * grow)
+        for slot, node_id, ref_doc_id, metadata, deleted in rows:
+            alive[slot] = not deleted
+            if deleted:
+                self._metadata[slot] = None
+                continue
+            meta = json.loads(metadata)
+            for key in _PAYLOAD_KEYS:
+                meta.pop(key, None)
+            self._node_ids[slot], self._ref_doc_ids[slot], self._metadata[slot] = node_id, ref_doc_id, meta
+        self._vectors = vectors
+        self._alive = alive
+        self._generation, self._version = generation, version
+        self._filter_masks = {}
+        if self._ivf is not None and self._vectors is not None:
+            self._ivf = self._ivf.extend(self._vectors, slots)
+        self._maybe_train()
+
+    def _maybe_train(self) -> None:
+        live = int(self._alive.sum())
+        if (
+            not self._ivf_lists
+            or self._ivf_training
+            or live < self._ivf_lists * _IVF_MIN_ROWS_PER_LIST
+            or (self._ivf is not None and live < 2 * self._ivf.trained_on)
+        ):
+            return
+        self._ivf_training = True
+        threading.Thread(
+            target=self._train, args=(self._generation, self._vectors, self._alive), name="ivf-train", daemon=True
+        ).start()
+
+    def _train(self, generation: int, vectors: np.ndarray, alive: np.ndarray) -> None:
+        """Train the IVF lists in the background; queries scan exhaustively meanwhile."""
+        try:
+            started = time.perf_counter()
+            ivf = _IVF.train(vectors, alive, self._ivf_lists)
+            with self._lock:
+                if generation == self._generation and self._vectors is not None:
+                    self._ivf = ivf.extend(self._vectors, len(self._vectors))
+            logger.info(
+                "Trained %d IVF lists over %d vectors of %s in %.1fs",
+                self._ivf_lists, ivf.trained_on, self.path, time.perf_counter() - started,
+            )
+        except Exception:
+            logger.exception("IVF training for %s failed", self.path)
+        finally:
+            self._ivf_training = False
+
+    def _mask(self, filters: Optional[MetadataFilters], node_ids: Optional[List[str]], doc_ids: Optional[List[str]]):
+        """Live slots matching the query restrictions (filter masks are cached per loaded version)."""
+        mask = self._alive
+        if filters is not None and filters.filters:
+            key = filters.model_dump_json()
+            cached = self._filter_masks.get(key)
+            if cached is None:
+                metadata = self._metadata
+                match = build_metadata_filter_fn(lambda slot: metadata[slot], filters)
+                cached = np.fromiter(
+                    (alive and match(slot) for slot, alive in enumerate(mask)), dtype=bool, count=len(mask)
+                )
+                self._filter_masks[key] = cached
+            mask = cached
+        # Empty id lists (as passed by VectorIndexRetriever) do not restrict
+        for wanted, column in ((node_ids, self._node_ids), (doc_ids, self._ref_doc_ids)):
+            if wanted:
+                wanted = set(wanted)
+                mask = mask & np.fromiter((v in wanted for v in column), dtype=bool, count=len(mask))
+        return mask
+
+    # -- queries -----------------------------------------------------------
+
+    def _scan(self, vectors: np.ndarray, query: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        count = len(vectors) if rows is None else len(rows)
+        scores = np.empty(count, dtype=np.float32)
+        for i in range(0, count, _BLOCK_ROWS):
+            block = vectors[i : i + _BLOCK_ROWS] if rows is None else vectors[rows[i : i + _BLOCK_ROWS]]
+            scores[i : i + len(block)] = np.asarray(block, dtype=np.float32) @ query
+        return scores
+
+    def search(
+        self,
+        embedding: Sequence[float],
+        top_k: int,
+        filters: Optional[MetadataFilters] = None,
+        node_ids: Optional[List[str]] = None,
+        doc_ids: Optional[List[str]] = None,
+    ) -> List[Tuple[str, float]]:
+        """Cosine top-k as (node id, score), best first."""
+        self._refresh()
+        with self._lock:
+            vectors, ivf, ids, alive = self._vectors, self._ivf, self._node_ids, self._alive
+            mask = self._mask(filters, node_ids, doc_ids)
+        if vectors is None or top_k <= 0:
+            return []
+        query = _normalize(np.asarray(embedding, dtype=np.float32))
+        rows = None if mask is alive and mask.all() else np.flatnonzero(mask)
+        if ivf is not None:
+            probed = ivf.probe(query, self._ivf_probes)
+            probed = probed[mask[probed]]
+            # Too few candidates in the probed lists: fall back to the exact scan
+            if len(probed) >= top_k:
+                rows = probed
+        if rows is not None and not len(rows):
+            return []
+        scores = self._scan(vectors, query, rows)
+        best = _top_k(scores, top_k)
+        slots = best if rows is None else rows[best]
+        return [(ids[slot], float(scores[i])) for slot, i in zip(slots, best)]
+
+    def search_text(
+        self,
+        text: str,
+        top_k: int,
+        filters: Optional[MetadataFilters] = None,
+        node_ids: Optional[List[str]] = None,
+        doc_ids: Optional[List[str]] = None,
+    ) -> List[Tuple[str, float]]:
+        """BM25 full-text top-k as (node id, score), best first."""
+        terms = list(dict.fromkeys(_WORD.findall(text.lower())))
+        if not terms or top_k <= 0:
+            return []
+        self._refresh()
+        with self._lock:
+            alive = self._alive
+            mask = self._mask(filters, node_ids, doc_ids)
+        # Deleted rows are excluded by the query itself
+        restricted = mask is not alive
+        match = " OR ".join(f'"{t}"' for t in terms)
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT n.slot, n.node_id, -bm25(nodes_fts) FROM nodes_fts JOIN nodes n ON n.id = nodes_fts.rowid "
+                "WHERE nodes_fts MATCH ? AND n.deleted = 0 ORDER BY bm25(nodes_fts) LIMIT ?",
+                (match, top_k * 10 if restricted else top_k),
+            ).fetchall()
+        # Rows written after the loaded version are beyond the mask
+        hits = [(node_id, score) for slot, node_id, score in rows if slot < len(mask) and mask[slot]]
+        return hits[:top_k]
+
+    def nodes(self, node_ids: Sequence[str]) -> Dict[str, BaseNode]:
+        """Live nodes (with text) by id."""
+        out: Dict[str, BaseNode] = {}
+        with self._db_lock:
+            for chunk in _chunks(list(node_ids)):
+                marks = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    "SELECT n.node_id, n.metadata, f.text FROM nodes n JOIN nodes_fts f ON f.rowid = n.id "
+                    f"WHERE n.deleted = 0 AND n.node_id IN ({marks})",
+                    tuple(chunk),
+                ).fetchall()
+                for node_id, metadata, text in rows:
+                    out[node_id] = metadata_dict_to_node(json.loads(metadata), text)
+        return out
+
+    def node_ids(self, filters: Optional[MetadataFilters] = None, node_ids: Optional[List[str]] = None) -> List[str]:
+        self._refresh(force=True)
+        with self._lock:
+            mask = self._mask(filters, node_ids, None)
+            return [self._node_ids[slot] for slot in np.flatnonzero(mask)]
+
+    # -- writes ------------------------------------------------------------
+
+    def _write(self, change) -> Any:
+        """Run `change(generation, slots, version)` in a write transaction and load the result."""
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                generation, slots, version = self._conn.execute(
+                    "SELECT generation, slots, version FROM meta WHERE id = 0"
+                ).fetchone()
+                result = change(generation, slots, version + 1)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        self._refresh(force=True)
+        return result
+
+    def _tombstone(self, column: str, values: Sequence[str], version: int) -> int:
+        removed = 0
+        for chunk in _chunks(list(values)):
+            marks = ",".join("?" * len(chunk))
+            removed += self._conn.execute(
+                f"UPDATE nodes SET deleted = 1, version = ? WHERE deleted = 0 AND {column} IN ({marks})",
+                (version, *chunk),
+            ).rowcount
+        if removed:
+            self._conn.execute(
+                "DELETE FROM nodes_fts WHERE rowid IN (SELECT id FROM nodes WHERE deleted = 1 AND version = ?)",
+                (version,),
+            )
+            self._conn.execute("UPDATE meta SET version = ? WHERE id = 0", (version,))
+        return removed
+
+    def add(self, nodes: Sequence[BaseNode]) -> List[str]:
+        """Append nodes (replacing live nodes with the same ids)."""
+        if not nodes:
+            return []
+        vectors = np.asarray([n.get_embedding() for n in nodes], dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional embeddings, got shape {vectors.shape}")
+        vectors = _normalize(vectors).astype(self._np_dtype)
+        ids = [n.node_id for n in nodes]
+
+        def change(generation: int, slots: int, version: int) -> None:
+            self._tombstone("node_id", ids, version)
+            row_bytes = self.dim * vectors.itemsize
+            # Vectors are written before the rows referencing them are committed
+            fd = os.open(self._file(generation), os.O_RDWR | os.O_CREAT, 0o644)
+            with os.fdopen(fd, "r+b") as f:
+                size = os.fstat(f.fileno()).st_size
+                needed = (slots + len(vectors)) * row_bytes
+                if size < needed:
+                    f.truncate(max(needed, 2 * size, _MIN_ROWS * row_bytes))
+                f.seek(slots * row_bytes)
+                f.write(vectors.tobytes())
+            for slot, node in enumerate(nodes, start=slots):
+                metadata = node_to_metadata_dict(node, remove_text=True, flat_metadata=False)
+                row = self._conn.execute(
+                    "INSERT INTO nodes (slot, node_id, ref_doc_id, metadata, version) VALUES (?, ?, ?, ?, ?)",
+                    (slot, node.node_id, node.ref_doc_id, json.dumps(metadata), version),
+                ).lastrowid
+                self._conn.execute("INSERT INTO nodes_fts (rowid, text) VALUES (?, ?)", (row, node.get_content()))
+            self._conn.execute(
+                "UPDATE meta SET slots = ?, version = ? WHERE id = 0", (slots + len(vectors), version)
+            )
+
+        self._write(change)
+        return ids
+
+    def delete(self, column: str, values: Sequence[str]) -> int:
+        """Remove the live nodes whose `column` (node_id or ref_doc_id) is in `values`."""
+        removed = self._write(lambda generation, slots, version: self._tombstone(column, values, version))
+        if removed:
+            self._maybe_compact()
+        return removed
+
+    def _maybe_compact(self) -> None:
+        with self._db_lock:
+            live, dead = self._conn.execute(
+                "SELECT SUM(deleted = 0), SUM(deleted = 1) FROM nodes"
+            ).fetchone()
+        if (dead or 0) < _MIN_ROWS or dead <= (live or 0):
+            return
+        old: List[str] = []
+
+        def change(generation: int, slots: int, version: int) -> None:
+            rows = self._conn.execute("SELECT id, slot FROM nodes WHERE deleted = 0 ORDER BY slot").fetchall()
+            source = np.memmap(self._file(generation), dtype=self._np_dtype, mode="r", shape=(slots, self.dim))
+            keep = np.asarray([slot for _, slot in rows], dtype=np.int64)
+            with open(self._file(generation + 1), "wb") as f:
+                for chunk in _chunks(keep, _BLOCK_ROWS):
+                    f.write(np.ascontiguousarray(source[chunk]).tobytes())
+            self._conn.execute("DELETE FROM nodes WHERE deleted = 1")
+            self._conn.executemany(
+                "UPDATE nodes SET slot = ?, version = ? WHERE id = ?",
+                [(new, version, row_id) for new, (row_id, _) in enumerate(rows)],
+            )
+            self._conn.execute(
+                "UPDATE meta SET generation = ?, slots = ?, version = ? WHERE id = 0",
+                (generation + 1, len(rows), version),
+            )
+            old.append(self._file(generation))
+
+        self._write(change)
+        # Processes still mapping the old file keep it until they reload
+        for path in old:
+            os.remove(path)
+        logger.info("Compacted vector collection %s to %d rows", self.path, live)
+
+    def clear(self) -> None:
+        old: List[str] = []
+
+        def change(generation: int, slots: int, version: int) -> None:
+            self._conn.execute("DELETE FROM nodes")
+            self._conn.execute("DELETE FROM nodes_fts")
+            self._conn.execute(
+                "UPDATE meta SET generation = ?, slots = 0, version = ? WHERE id = 0", (generation + 1, version)
+            )
+            old.append(self._file(generation))
+
+        self._write(change)
+        for path in old:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class MmapVectorStore(BasePydanticVectorStore):
+    """LlamaIndex vector store over an `MmapCollection` (dense and SPARSE full-text queries)."""
+
+    stores_text: bool = True
+    _collection: MmapCollection = PrivateAttr()
+
+    def __init__(self, collection: MmapCollection, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._collection = collection
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MmapVectorStore"
+
+    @property
+    def client(self) -> MmapCollection:
+        return self._collection
+
+    def add(self, nodes: Sequence[BaseNode], **kwargs: Any) -> List[str]:
+        return self._collection.add(nodes)
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        self._collection.delete("ref_doc_id", [ref_doc_id])
+
+    def delete_nodes(
+        self, node_ids: Optional[List[str]] = None, filters: Optional[MetadataFilters] = None, **delete_kwargs: Any
+    ) -> None:
+        if filters is not None:
+            node_ids = self._collection.node_ids(filters, node_ids)
+        if node_ids:
+            self._collection.delete("node_id", node_ids)
+
+    def get_nodes(
+        self, node_ids: Optional[List[str]] = None, filters: Optional[MetadataFilters] = None
+    ) -> List[BaseNode]:
+        ids = self._collection.node_ids(filters, node_ids)
+        found = self._collection.nodes(ids)
+        return [found[i] for i in ids if i in found]
+
+    def clear(self) -> None:
+        self._collection.clear()
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        restrictions = (query.filters, query.node_ids, query.doc_ids)
+        if query.mode == VectorStoreQueryMode.SPARSE:
+            top_k = query.sparse_top_k or query.similarity_top_k
+            hits = self._collection.search_text(query.query_str or "", top_k, *restrictions)
+        elif query.mode == VectorStoreQueryMode.DEFAULT:
+            if query.query_embedding is None:
+                raise ValueError("A query embedding is required for dense queries")
+            hits = self._collection.search(query.query_embedding, query.similarity_top_k, *restrictions)
+        else:
+            raise ValueError(f"Unsupported query mode for the mmap vector store: {query.mode}")
+        found = self._collection.nodes([node_id for node_id, _ in hits])
+        hits = [(node_id, score) for node_id, score in hits if node_id in found]
+        return VectorStoreQueryResult(
+            nodes=[found[node_id] for node_id, _ in hits],
+            similarities=[score for _, score in hits],
+            ids=[node_id for node_id, _ in hits],
+        )
@@ -0,0 +1,23 @@
+"""Shared relational store for service state (sync watermarks, jobs, ...)."""
+
+import threading
+from sqlalchemy import MetaData, Table, create_engine
+from .config import settings
+
+
+# Postgres in deployments; a SQLite URI works for local runs and tests
+state_engine = create_engine(settings.STATE_DB_URI or settings.POSTGRES_URI, pool_pre_ping=True)
+state_metadata = MetaData()
+
+_created: set[str] = set()
+_create_lock = threading.Lock()
+
+
+def ensure_tables(*tables: Table) -> None:
+    """Create the given state tables on first use (once per process)."""
+    missing = [t for t in tables if t.name not in _created]
+    if not missing:
+        return
+    with _create_lock:
+        state_metadata.create_all(state_engine, tables=missing, checkfirst=True)
+        _created.update(t.name for t in missing)
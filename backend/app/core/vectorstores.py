@@ -1,12 +1,30 @@
-"""Utility functions for working with pgvector via LlamaIndex."""
+"""Utility functions for the vector collections (pgvector or the embedded mmap store) via LlamaIndex."""
 
-from sqlalchemy import create_engine
+import os
+import threading
+from typing import Dict
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
 from llama_index.vector_stores.postgres import PGVectorStore
 from llama_index.core import StorageContext, VectorStoreIndex
 from .config import settings
+from .mmap_store import MmapCollection, MmapVectorStore
 
 
 _engine = create_engine(settings.POSTGRES_URI, pool_pre_ping=True)
+# Async engine used by aquery/ainsert paths so requests never block the event loop
+_async_engine = create_async_engine(
+    settings.POSTGRES_ASYNC_URI or settings.POSTGRES_URI.replace("+psycopg2", "+asyncpg"),
+    pool_pre_ping=True,
+)
+
+# Embedded collections opened by this process, by name
+_mmap_collections: Dict[str, MmapCollection] = {}
+_mmap_lock = threading.Lock()
+
+# Tables whose full-text column and GIN index have been verified this process
+_text_search_ready: set[str] = set()
+_text_search_lock = threading.Lock()
 
 
 def collection_name(source: str) -> str:
@@ -14,22 +32,92 @@ def collection_name(source: str) -> str:
     return f"{settings.COLLECTION_PREFIX}{source}"
 
 
+def ensure_text_search_index(index_name: str) -> None:
+    """
+    Make sure an existing collection table carries the generated `tsvector`
+    column and its GIN index used for sparse retrieval. Tables created by
+    PGVectorStore with `hybrid_search=True` already have both; this upgrades
+    collections created before hybrid search was enabled. Postgres keeps the
+    column up to date on every insert, so ingestion maintains the sparse
+    index without any extra work. Runs once per table per process.
+    """
+    name = index_name.lower()
+    with _text_search_lock:
+        if name in _text_search_ready:
+            return
+        schema = settings.PGVECTOR_SCHEMA
+        table = f'"{schema}"."data_{name}"'
+        with _engine.begin() as conn:
+            exists = conn.execute(text("SELECT to_regclass(:t)"), {"t": f"{schema}.data_{name}"}).scalar()
+            if exists is None:
+                # PGVectorStore creates the table with the column on first use
+                return
+            conn.execute(
+                text(
+                    f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS text_search_tsv tsvector "
+                    f"GENERATED ALWAYS AS (to_tsvector('{settings.PGVECTOR_TEXT_SEARCH_CONFIG}', text)) STORED"
+                )
+            )
+            conn.execute(text(f'CREATE INDEX IF NOT EXISTS "{name}_idx" ON {table} USING gin (text_search_tsv)'))
+        _text_search_ready.add(name)
+
+
 def get_pgvector_index(index_name: str) -> VectorStoreIndex:
     """
     Return (and create if necessary) a VectorStoreIndex backed by pgvector.
     The table is created in the configured schema and uses the embedding
-    dimension from settings.
+    dimension from settings. Full-text search is enabled so every collection
+    also carries a sparse index next to its embeddings. The store shares the
+    process-wide sync and async engines, so both `query` and `aquery` reuse
+    pooled connections.
     """
-    vs = PGVectorStore.from_params(
+    vs = PGVectorStore(
         engine=_engine,
+        async_engine=_async_engine,
         schema_name=settings.PGVECTOR_SCHEMA,
         table_name=index_name,
         embed_dim=settings.OPENAI_EMBED_DIM,
+        hybrid_search=True,
+        text_search_config=settings.PGVECTOR_TEXT_SEARCH_CONFIG,
     )
+    ensure_text_search_index(index_name)
+    sc = StorageContext.from_defaults(vector_store=vs)
+    return VectorStoreIndex.from_vector_store(vector_store=vs, storage_context=sc)
+
+
+def get_mmap_index(index_name: str) -> VectorStoreIndex:
+    """
+    Return a VectorStoreIndex backed by the embedded memory-mapped store in
+    VECTOR_MMAP_DIR. Each collection is opened once per process and shared
+    by every index over it, so dense queries are served from the mapped
+    vectors without a database round-trip. Full-text search backs sparse
+    retrieval as with pgvector.
+    """
+    with _mmap_lock:
+        collection = _mmap_collections.get(index_name)
+        if collection is None:
+            collection = _mmap_collections[index_name] = MmapCollection(
+                os.path.join(settings.VECTOR_MMAP_DIR, index_name),
+                dim=settings.OPENAI_EMBED_DIM,
+                dtype=settings.VECTOR_MMAP_DTYPE,
+                poll_sec=settings.VECTOR_MMAP_POLL_SEC,
+                ivf_lists=settings.VECTOR_MMAP_IVF_LISTS,
+                ivf_probes=settings.VECTOR_MMAP_IVF_PROBES,
+            )
+    vs = MmapVectorStore(collection)
     sc = StorageContext.from_defaults(vector_store=vs)
     return VectorStoreIndex.from_vector_store(vector_store=vs, storage_context=sc)
 
 
+def get_vector_index(index_name: str) -> VectorStoreIndex:
+    """Return the index of a collection on the configured VECTOR_BACKEND."""
+    if settings.VECTOR_BACKEND == "mmap":
+        return get_mmap_index(index_name)
+    if settings.VECTOR_BACKEND == "pgvector":
+        return get_pgvector_index(index_name)
+    raise ValueError(f"Unsupported VECTOR_BACKEND: {settings.VECTOR_BACKEND}")
+
+
 def index_for_source(source: str) -> VectorStoreIndex:
     """Convenience function to get an index for a specific source."""
-    return get_pgvector_index(collection_name(source))
\ No newline at end of file
+    return get_vector_index(collection_name(source))
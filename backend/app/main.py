@@ -1,10 +1,14 @@
 """FastAPI entry point for Talk‑To‑DB."""
 
-from fastapi import FastAPI
+import re
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 from .core import llm  # noqa: F401 ensure LLM config is loaded
 from .api.routers import health, indexing, search, chat, sql, admin
+from .core.logging import logger
+from .core.metrics import finish_trace, start_trace
+from .services.jobs import index_jobs
 
 app = FastAPI(title="Talk‑To‑DB Backend", version="0.1.0")
 
@@ -17,9 +21,56 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Client-supplied request ids are reused as trace ids when they look sane
+_TRACE_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """
+    Give every request a trace id (the caller's X-Request-ID or a new one),
+    returned as X-Trace-ID and attached to log lines. Latency is recorded
+    per route once the last byte of the body is sent, so streamed chat
+    responses include the whole generation.
+    """
+    incoming = request.headers.get("x-request-id", "")
+    trace = start_trace(request.method, request.url.path, incoming if _TRACE_ID.match(incoming) else None)
+
+    def route() -> str:
+        # Route templates, not raw paths, keep the label set bounded
+        return getattr(request.scope.get("route"), "path", "unmatched")
+
+    try:
+        response = await call_next(request)
+    except Exception:
+        finish_trace(trace, route(), 500)
+        raise
+    response.headers["X-Trace-ID"] = trace.trace_id
+    body = response.body_iterator
+
+    async def traced_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            finish_trace(trace, route(), response.status_code)
+
+    response.body_iterator = traced_body()
+    return response
+
+
 app.include_router(health.router, prefix="/api/v1")
 app.include_router(indexing.router, prefix="/api/v1")
 app.include_router(search.router, prefix="/api/v1")
 app.include_router(chat.router, prefix="/api/v1")
 app.include_router(sql.router, prefix="/api/v1")
-app.include_router(admin.router, prefix="/api/v1")
\ No newline at end of file
+app.include_router(admin.router, prefix="/api/v1")
+
+
+@app.on_event("startup")
+def resume_index_jobs() -> None:
+    """Start queued indexing jobs and resume ones orphaned by a restart."""
+    try:
+        index_jobs.start()
+    except Exception:
+        logger.exception("Could not resume indexing jobs; the job poller will retry")
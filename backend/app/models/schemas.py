@@ -1,26 +1,49 @@
 """Pydantic models for API requests and responses."""
 
 from pydantic import BaseModel, Field
-from typing import List, Optional, Literal, Any
+from typing import Dict, List, Optional, Literal, Any
 
 # Query scopes supported by the query engine
 Scope = Literal["sql", "vector", "all", "kg"]
 
 
 class IndexRequest(BaseModel):
-    """Request payload for indexing documents."""
+    """
+    Request payload for indexing documents. Syncs are incremental; set
+    `full` to ignore the stored watermark and re-list the whole scope.
+    """
 
-    source: Literal["confluence", "sharepoint", "onedrive", "teams"]
+    # Validated against the registered ingestors (services/jobs.INGESTORS)
+    source: str
     config: dict
+    full: bool = False
+
+
+class SQLExecutionOptions(BaseModel):
+    """Per-database execution settings; unset fields use the SQL_* defaults."""
+
+    pool_size: Optional[int] = None
+    max_overflow: Optional[int] = None
+    pool_timeout_sec: Optional[float] = None
+    statement_timeout_sec: Optional[float] = None
+    max_rows: Optional[int] = None
+    read_only: Optional[bool] = None
+    max_concurrency: Optional[int] = None
 
 
 class SQLRegisterRequest(BaseModel):
-    """Request payload for registering a SQL database."""
+    """
+    Request payload for registering a SQL database. `table_descriptions`
+    optionally maps table names to a short description of their contents,
+    added to the schema context and used to pick relevant tables.
+    """
 
     name: str = "default"
     dsn: str
     include_tables: Optional[List[str]] = None
     schema: Optional[str] = None
+    table_descriptions: Optional[Dict[str, str]] = None
+    execution: Optional[SQLExecutionOptions] = None
 
 
 class SearchRequest(BaseModel):
@@ -38,6 +61,11 @@ class SearchRequest(BaseModel):
     session_id: Optional[str] = None
 
 
+class SQLExportRequest(SearchRequest):
+    """Request model for streaming a SQL result to a file."""
+    format: Literal["csv", "parquet", "xlsx"] = "xlsx"
+
+
 class ChatRequest(SearchRequest):
     """Request model for chat interactions."""
     stream: bool = False
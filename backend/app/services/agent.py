@@ -1,27 +1,112 @@
 """Construction of an agentic chat engine using LlamaIndex tools."""
 
-from typing import Any, Dict, List
+import asyncio
+import functools
+import inspect
+import json
+import threading
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 import pandas as pd
+from llama_index.core import Settings as LlamaSettings
 from llama_index.core.tools import FunctionTool
-from llama_index.core.agent import ReActAgent
-from .query_engines import router_engine
-from .export import dataframe_to_excel
+from llama_index.core.agent.workflow import AgentStream, ReActAgent, ToolCallResult
+from llama_index.core.instrumentation import get_dispatcher
+from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+from llama_index.core.instrumentation.events import BaseEvent
+from llama_index.core.instrumentation.events.llm import LLMChatStartEvent, LLMCompletionStartEvent
+from llama_index.core.memory import BaseMemory
+from llama_index.core.workflow import Context
+from .engine_pool import EngineKey, EnginePool
+from .query_engines import router_engine, aquery
+from .export import rows_to_excel
 from .ingestion.database import sql_registry
+from ..core.config import settings
+from ..core.metrics import stage
 
 
-def _search_tool(
-    query: str,
-    scope: str,
-    sources: List[str],
-    use_hybrid: bool,
-    db_name: str | None = None,
-) -> Dict[str, Any]:
+class TurnStats:
+    """Tool results and counters of one chat turn (one `/chat` request)."""
+
+    def __init__(self, session_id: str) -> None:
+        self.session_id = session_id
+        self._results: Dict[Tuple[str, str], Any] = {}
+        self._lock = threading.Lock()
+        self.tool_calls = 0
+        self.tool_cache_hits = 0
+        self.llm_steps = 0
+        self.tool_llm_calls = 0
+
+    def lookup(self, key: Tuple[str, str]) -> Tuple[bool, Any]:
+        with self._lock:
+            self.tool_calls += 1
+            if key in self._results:
+                self.tool_cache_hits += 1
+                return True, self._results[key]
+            return False, None
+
+    def store(self, key: Tuple[str, str], value: Any) -> None:
+        with self._lock:
+            self._results[key] = value
+
+    def count_llm_call(self, in_tool: bool) -> None:
+        with self._lock:
+            if in_tool:
+                self.tool_llm_calls += 1
+            else:
+                self.llm_steps += 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "tool_calls": self.tool_calls,
+                "tool_cache_hits": self.tool_cache_hits,
+                "llm_steps": self.llm_steps,
+                "tool_llm_calls": self.tool_llm_calls,
+            }
+
+
+_turn: ContextVar[Optional[TurnStats]] = ContextVar("agent_turn", default=None)
+_in_tool: ContextVar[bool] = ContextVar("agent_in_tool", default=False)
+
+
+def start_turn(session_id: str) -> TurnStats:
     """
-    Search over the selected sources using the appropriate query engine and
-    return the answer along with citation data.
+    Begin a chat turn in the current request context. Tool calls and LLM
+    calls made while the agent answers (including in tasks it spawns) are
+    recorded on the returned object.
     """
-    qe = router_engine(scope=scope, sources=sources, use_hybrid=use_hybrid, db_name=db_name)
-    resp = qe.query(query)
+    turn = TurnStats(session_id)
+    _turn.set(turn)
+    return turn
+
+
+def _call_key(name: str, signature: inspect.Signature, args: tuple, kwargs: dict) -> Tuple[str, str]:
+    # Bind so positional and keyword spellings of the same call share a key
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    return name, json.dumps(bound.arguments, sort_keys=True, default=str)
+
+
+class _LLMCallCounter(BaseEventHandler):
+    """Counts LLM calls of the current turn: agent reasoning steps vs. calls made inside tools."""
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LLMCallCounter"
+
+    def handle(self, event: BaseEvent, **kwargs: Any) -> None:
+        if isinstance(event, (LLMChatStartEvent, LLMCompletionStartEvent)):
+            turn = _turn.get()
+            if turn is not None:
+                turn.count_llm_call(_in_tool.get())
+
+
+get_dispatcher().add_event_handler(_LLMCallCounter())
+
+
+def _citations(resp) -> List[Dict[str, Any]]:
+    """Extract citation data from a query engine response."""
     citations = []
     for n in getattr(resp, "source_nodes", []):
         citations.append(
@@ -33,7 +118,36 @@ def _search_tool(
                 "doc_id": n.node.node_id,
             }
         )
-    return {"answer": str(resp), "citations": citations}
+    return citations
+
+
+def _search_tool(
+    query: str,
+    scope: str,
+    sources: List[str],
+    use_hybrid: bool,
+    db_name: str | None = None,
+) -> Dict[str, Any]:
+    """
+    Search over the selected sources using the appropriate query engine and
+    return the answer along with citation data.
+    """
+    qe = router_engine(scope=scope, sources=sources, use_hybrid=use_hybrid, db_name=db_name)
+    resp = qe.query(query)
+    return {"answer": str(resp), "citations": _citations(resp)}
+
+
+async def _asearch_tool(
+    query: str,
+    scope: str,
+    sources: List[str],
+    use_hybrid: bool,
+    db_name: str | None = None,
+) -> Dict[str, Any]:
+    """Async variant of `_search_tool` used by `achat`/`astream_chat`."""
+    qe = router_engine(scope=scope, sources=sources, use_hybrid=use_hybrid, db_name=db_name)
+    resp = await aquery(qe, query)
+    return {"answer": str(resp), "citations": _citations(resp)}
 
 
 def _ask_sql(query: str, db_name: str) -> Dict[str, Any]:
@@ -46,6 +160,16 @@ def _ask_sql(query: str, db_name: str) -> Dict[str, Any]:
     }
 
 
+async def _aask_sql(query: str, db_name: str) -> Dict[str, Any]:
+    """Async variant of `_ask_sql`; SQL execution runs off the event loop."""
+    qe = router_engine(scope="sql", sources=[], use_hybrid=False, db_name=db_name)
+    resp = await aquery(qe, query)
+    return {
+        "answer": str(resp),
+        "sql": getattr(resp, "metadata", {}).get("sql_query"),
+    }
+
+
 def _plot(columns: List[str], rows: List[List[Any]], kind: str = "line") -> str:
     """
     Create a simple plot using Plotly given a list of columns and rows.
@@ -67,46 +191,158 @@ def _plot(columns: List[str], rows: List[List[Any]], kind: str = "line") -> str:
 
 def _export_sql_excel(columns: List[str], rows: List[List[Any]]) -> str:
     """Create an Excel file from rows/columns and return its path."""
-    df = pd.DataFrame(rows, columns=columns)
-    return dataframe_to_excel(df)
+    return rows_to_excel(columns, rows)
+
+
+def _tool(name: str, description: str, fn: Callable[..., Any], async_fn: Optional[Callable[..., Any]] = None):
+    """
+    FunctionTool whose calls are counted and memoized per chat turn: a call
+    repeating the name and arguments of an earlier call in the same turn
+    returns the earlier result without running the tool again.
+    """
+    signature = inspect.signature(fn)
+
+    def call(*args, **kwargs):
+        turn = _turn.get()
+        if turn is None:
+            with stage("tool", name):
+                return fn(*args, **kwargs)
+        key = _call_key(name, signature, args, kwargs)
+        hit, value = turn.lookup(key)
+        if hit:
+            return value
+        token = _in_tool.set(True)
+        try:
+            with stage("tool", name):
+                value = fn(*args, **kwargs)
+        finally:
+            _in_tool.reset(token)
+        turn.store(key, value)
+        return value
+
+    async def acall(*args, **kwargs):
+        turn = _turn.get()
+        run = async_fn or (lambda *a, **k: asyncio.to_thread(fn, *a, **k))
+        if turn is None:
+            with stage("tool", name):
+                return await run(*args, **kwargs)
+        key = _call_key(name, signature, args, kwargs)
+        hit, value = turn.lookup(key)
+        if hit:
+            return value
+        token = _in_tool.set(True)
+        try:
+            with stage("tool", name):
+                value = await run(*args, **kwargs)
+        finally:
+            _in_tool.reset(token)
+        turn.store(key, value)
+        return value
+
+    # Keep the wrapped signature so the tool schema is inferred from `fn`
+    functools.update_wrapper(call, fn)
+    functools.update_wrapper(acall, fn)
+    return FunctionTool.from_defaults(fn=call, async_fn=acall, name=name, description=description)
 
 
 def build_agent(scope: str, sources: List[str], use_hybrid: bool, db_name: str | None):
     """
     Build a ReAct agent with tools for document search, SQL queries, Excel
     export and plotting. Tools are registered as OpenAI function tools.
+    Search and SQL tools carry async implementations so a turn never blocks
+    the event loop on retrieval or SQL.
     """
     tools = []
     # Search tool
     tools.append(
-        FunctionTool.from_defaults(
+        _tool(
+            "search_documents",
+            "Search selected data sources and return answer with citations.",
             fn=lambda q: _search_tool(q, scope, sources, use_hybrid, db_name),
-            name="search_documents",
-            description="Search selected data sources and return answer with citations.",
+            async_fn=lambda q: _asearch_tool(q, scope, sources, use_hybrid, db_name),
         )
     )
     # SQL tools if any DB registered
-    if sql_registry.engines:
+    registered = sql_registry.names()
+    if registered:
         tools.append(
-            FunctionTool.from_defaults(
-                fn=lambda q: _ask_sql(q, db_name or next(iter(sql_registry.engines))),
-                name="ask_sql",
-                description="Ask a question to the SQL database and get back the answer and SQL.",
-            )
-        )
-        tools.append(
-            FunctionTool.from_defaults(
-                fn=_export_sql_excel,
-                name="export_sql_excel",
-                description="Export tabular rows and columns to an Excel file.",
+            _tool(
+                "ask_sql",
+                "Ask a question to the SQL database and get back the answer and SQL.",
+                fn=lambda q: _ask_sql(q, db_name or registered[0]),
+                async_fn=lambda q: _aask_sql(q, db_name or registered[0]),
             )
         )
+        tools.append(_tool("export_sql_excel", "Export tabular rows and columns to an Excel file.", _export_sql_excel))
     # Plot tool
-    tools.append(
-        FunctionTool.from_defaults(
-            fn=_plot,
-            name="plot",
-            description="Create a simple line/bar/scatter plot from tabular data.",
-        )
-    )
-    return ReActAgent.from_tools(tools)
\ No newline at end of file
+    tools.append(_tool("plot", "Create a simple line/bar/scatter plot from tabular data.", _plot))
+    return ReActAgent(tools=tools, llm=LlamaSettings.llm)
+
+
+# Agents hold no per-run state (each run gets its own Context and memory); reuse them per configuration
+agent_pool = EnginePool(settings.AGENT_POOL_SIZE)
+
+
+def get_agent(scope: str, sources: List[str], use_hybrid: bool, db_name: str | None):
+    """
+    Return the pooled agent for a configuration, building it on first use.
+    The pool is cleared when a SQL database is registered on any worker,
+    since the tool set depends on the registered databases.
+    """
+    sql_registry.names()
+    key = EngineKey(scope, tuple(sorted(set(sources))), use_hybrid, db_name, None)
+
+    def build():
+        with stage("agent_build", scope):
+            return build_agent(scope, list(key.sources), use_hybrid, db_name)
+
+    return agent_pool.get_or_create(key, build)
+
+
+def _run(agent: ReActAgent, query: str, memory: BaseMemory):
+    # A fresh Context per request: concurrent turns on one pooled agent never share run state
+    return agent.run(user_msg=query, memory=memory, ctx=Context(agent))
+
+
+def _tool_citations(event: ToolCallResult) -> List[Dict[str, Any]]:
+    output = event.tool_output.raw_output
+    if not isinstance(output, dict):
+        return []
+    keys = ("source", "path", "doc_id", "score")
+    return [{k: c.get(k) for k in keys} for c in output.get("citations", [])]
+
+
+async def achat(agent: ReActAgent, query: str, memory: BaseMemory) -> Tuple[str, List[Dict[str, Any]]]:
+    """Run one chat turn; returns the answer and the citations of the tools it called."""
+    handler = _run(agent, query, memory)
+    citations: List[Dict[str, Any]] = []
+    async for event in handler.stream_events():
+        if isinstance(event, ToolCallResult):
+            citations.extend(_tool_citations(event))
+    output = await handler
+    return output.response.content or "", citations
+
+
+async def astream_chat(agent: ReActAgent, query: str, memory: BaseMemory) -> AsyncIterator[str]:
+    """
+    Run one chat turn and yield the final answer as it is generated. The
+    ReAct reasoning steps before it ("Thought:", "Action:") are not sent.
+    """
+    handler = _run(agent, query, memory)
+    try:
+        sent, seen = 0, 0
+        async for event in handler.stream_events():
+            if not isinstance(event, AgentStream):
+                continue
+            if len(event.response) < seen:
+                sent = 0  # a new reasoning step started
+            seen = len(event.response)
+            _, marker, answer = event.response.partition("Answer:")
+            answer = answer.lstrip()
+            if marker and len(answer) > sent:
+                yield answer[sent:]
+                sent = len(answer)
+        await handler
+    finally:
+        if not handler.done():
+            await handler.cancel_run()
@@ -0,0 +1,91 @@
+"""Bounded LRU pool of query engines shared across requests."""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, NamedTuple, Optional, Tuple
+
+
+class EngineKey(NamedTuple):
+    """Identity of a pooled engine."""
+
+    scope: str
+    sources: Tuple[str, ...]
+    use_hybrid: bool
+    db_name: Optional[str]
+    top_k: Optional[int]
+
+
+class EnginePool:
+    """
+    Keep fully constructed query engines keyed by their configuration so that
+    vector stores, indexes and retrievers are built once and reused. The pool
+    holds at most `max_size` engines and evicts the least recently used one
+    when full. Entries are dropped explicitly when the data behind them
+    changes (see `invalidate`).
+    """
+
+    def __init__(self, max_size: int = 32) -> None:
+        self.max_size = max_size
+        self._engines: "OrderedDict[EngineKey, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_create(self, key: EngineKey, factory: Callable[[], Any]) -> Any:
+        """Return the pooled engine for `key`, building it with `factory` on a miss."""
+        with self._lock:
+            engine = self._engines.get(key)
+            if engine is not None:
+                self._engines.move_to_end(key)
+                self.hits += 1
+                return engine
+            self.misses += 1
+        # Build outside the lock; construction may hit the network
+        engine = factory()
+        with self._lock:
+            existing = self._engines.get(key)
+            if existing is not None:
+                self._engines.move_to_end(key)
+                return existing
+            self._engines[key] = engine
+            while len(self._engines) > self.max_size:
+                self._engines.popitem(last=False)
+                self.evictions += 1
+        return engine
+
+    def invalidate(self, source: str | None = None, db_name: str | None = None) -> int:
+        """
+        Drop engines that depend on a source collection or a registered
+        database. Engines of scope "all" without an explicit db_name resolve
+        to whichever database is registered first, so they are dropped on any
+        database change. With no arguments the whole pool is cleared. Returns
+        the number of engines removed.
+        """
+        with self._lock:
+            if source is None and db_name is None:
+                stale = list(self._engines)
+            else:
+                stale = [
+                    k
+                    for k in self._engines
+                    if (source is not None and source in k.sources)
+                    or (
+                        db_name is not None
+                        and (k.db_name == db_name or (k.scope == "all" and k.db_name is None))
+                    )
+                ]
+            for k in stale:
+                del self._engines[k]
+            return len(stale)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current occupancy."""
+        with self._lock:
+            return {
+                "size": len(self._engines),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
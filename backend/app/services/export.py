@@ -1,17 +1,199 @@
-"""Helpers for exporting data frames to files."""
+"""Streaming export of tabular results to CSV, Parquet and Excel files."""
 
+import csv
 import os
+import re
+import time
 import uuid
-import pandas as pd
+from typing import Any, Iterable, List, NamedTuple, Optional, Tuple
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+from ..core.config import settings
 
+EXPORT_FORMATS = ("csv", "parquet", "xlsx")
+# Data rows per worksheet (Excel's limit is 1,048,576 rows including the header)
+_XLSX_SHEET_ROWS = 1_048_575
+_EXPORT_ID = re.compile(r"^[0-9a-f]{32}$")
 
-def dataframe_to_excel(df: pd.DataFrame) -> str:
+Batch = Tuple[List[str], List[tuple]]
+
+
+class ExportFile(NamedTuple):
+    export_id: str
+    format: str
+    path: str
+    rows: int
+    truncated: bool
+
+
+class _CSVWriter:
+    def __init__(self, path: str, columns: List[str]) -> None:
+        self._fh = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._fh)
+        self._writer.writerow(columns)
+
+    def write(self, rows: List[tuple]) -> None:
+        self._writer.writerows(rows)
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+def _widen(kind: pa.DataType) -> pa.DataType:
     """
-    Write a pandas DataFrame to an Excel file in a temporary directory and
-    return its absolute path. Uses a random UUID for the filename.
+    A type that also holds the values later batches of the same column may
+    carry: any integer or float width, decimals of any precision (their
+    scale is fixed per SQL column), strings for columns that were all NULL.
     """
-    out_dir = "/tmp/exports"
-    os.makedirs(out_dir, exist_ok=True)
-    path = os.path.join(out_dir, f"{uuid.uuid4().hex}.xlsx")
-    df.to_excel(path, index=False)
-    return path
\ No newline at end of file
+    if pa.types.is_null(kind):
+        return pa.string()
+    if pa.types.is_integer(kind):
+        return pa.int64()
+    if pa.types.is_floating(kind):
+        return pa.float64()
+    if pa.types.is_decimal(kind):
+        return pa.decimal128(38, kind.scale)
+    if pa.types.is_large_string(kind):
+        return pa.string()
+    return kind
+
+
+class _ParquetWriter:
+    """
+    One row group per batch, all written with one schema: column types are
+    taken from the first non-empty batch and widened (`_widen`), and every
+    batch is converted to them. Values that do not fit their column's type
+    fail the export.
+    """
+
+    def __init__(self, path: str, columns: List[str]) -> None:
+        self._path = path
+        # Parquet readers reject repeated column names (e.g. `id` from both sides of a join)
+        seen: dict = {}
+        self._names = []
+        for c in columns:
+            seen[c] = seen.get(c, 0) + 1
+            self._names.append(c if seen[c] == 1 else f"{c}_{seen[c]}")
+        self._writer: Optional[pq.ParquetWriter] = None
+        self._schema: Optional[pa.Schema] = None
+
+    def _open(self, rows: List[tuple]) -> None:
+        fields = [pa.field(name, _widen(pa.array([row[i] for row in rows]).type)) for i, name in enumerate(self._names)]
+        self._schema = pa.schema(fields)
+        self._writer = pq.ParquetWriter(self._path, self._schema, compression="zstd")
+
+    def write(self, rows: List[tuple]) -> None:
+        if not rows:
+            return
+        if self._writer is None:
+            self._open(rows)
+        arrays = []
+        for i, field in enumerate(self._schema):
+            values: List[Any] = [row[i] for row in rows]
+            if pa.types.is_string(field.type):
+                values = [v if v is None or isinstance(v, str) else str(v) for v in values]
+            try:
+                arrays.append(pa.array(values, type=field.type))
+            except (pa.ArrowException, TypeError) as ex:
+                raise ValueError(f"Column {field.name} does not fit its exported type {field.type}: {ex}") from ex
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self) -> None:
+        if self._writer is None:
+            # Empty result: still write a file with the column names
+            self._open([])
+        self._writer.close()
+
+
+class _XLSXWriter:
+    """openpyxl write-only workbook; rows are streamed to a temporary file, not kept in memory."""
+
+    def __init__(self, path: str, columns: List[str]) -> None:
+        self._path = path
+        self._columns = columns
+        self._book = Workbook(write_only=True)
+        self._sheet = None
+        self._sheet_rows = _XLSX_SHEET_ROWS
+
+    def write(self, rows: List[tuple]) -> None:
+        for row in rows:
+            if self._sheet_rows >= _XLSX_SHEET_ROWS:
+                self._sheet = self._book.create_sheet(f"Sheet{len(self._book.worksheets) + 1}")
+                self._sheet.append(self._columns)
+                self._sheet_rows = 0
+            self._sheet.append(row)
+            self._sheet_rows += 1
+
+    def close(self) -> None:
+        if self._sheet is None:
+            self._book.create_sheet("Sheet1").append(self._columns)
+        self._book.save(self._path)
+
+
+_WRITERS = {"csv": _CSVWriter, "parquet": _ParquetWriter, "xlsx": _XLSXWriter}
+
+
+def _sweep_exports(out_dir: str) -> None:
+    """Delete exports older than EXPORT_TTL_SEC."""
+    cutoff = time.time() - settings.EXPORT_TTL_SEC
+    for entry in os.scandir(out_dir):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+def write_export(batches: Iterable[Batch], fmt: str, max_rows: Optional[int] = None) -> ExportFile:
+    """
+    Write `(columns, rows)` batches to a new file in EXPORT_DIR one batch at
+    a time, so memory use is bounded by the batch size rather than the
+    result size. Stops after `max_rows` rows (then `truncated` is set).
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    os.makedirs(settings.EXPORT_DIR, exist_ok=True)
+    _sweep_exports(settings.EXPORT_DIR)
+    export_id = uuid.uuid4().hex
+    path = os.path.join(settings.EXPORT_DIR, f"{export_id}.{fmt}")
+    writer = None
+    rows_written, truncated = 0, False
+    try:
+        for columns, rows in batches:
+            if writer is None:
+                writer = _WRITERS[fmt](path, columns)
+            if max_rows is not None and rows_written + len(rows) > max_rows:
+                rows, truncated = rows[: max_rows - rows_written], True
+            writer.write(rows)
+            rows_written += len(rows)
+            if truncated:
+                break
+        if writer is None:
+            raise ValueError("The statement returned no result set")
+        writer.close()
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    finally:
+        close = getattr(batches, "close", None)
+        if close is not None:
+            close()
+    return ExportFile(export_id, fmt, path, rows_written, truncated)
+
+
+def export_path(export_id: str) -> Optional[str]:
+    """Path of a finished export, or None if the id is unknown or expired."""
+    if not _EXPORT_ID.match(export_id):
+        return None
+    for fmt in EXPORT_FORMATS:
+        path = os.path.join(settings.EXPORT_DIR, f"{export_id}.{fmt}")
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def rows_to_excel(columns: List[str], rows: List[List[Any]]) -> str:
+    """Write in-memory rows to an Excel file and return its path."""
+    return write_export([(columns, [tuple(r) for r in rows])], "xlsx").path
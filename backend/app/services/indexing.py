@@ -1,16 +1,309 @@
-"""Helpers for inserting documents into the vector store."""
+"""Streaming pipeline that chunks, embeds and writes documents to the vector store."""
 
-from typing import List
-from llama_index.core import Document
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from llama_index.core import Document, Settings as LlamaSettings, VectorStoreIndex
+from llama_index.core.schema import BaseNode, MetadataMode
+from ..core.config import settings
 from ..core.vectorstores import index_for_source
+from ..core.embeddings import EmbeddingUsage, embedding_usage
+from .ingestion.base import BaseIngestor
+from .ingestion.parsing import parse_pool_size, submit_in_process
+from .ingestion.state import content_hash, sync_state
+from .ingestion.transforms import chunk_documents, chunking_profile
+from .pipeline import run_pipeline
 
 
-def upsert_documents(source: str, docs: List[Document]) -> dict:
+class IndexingStats:
     """
-    Insert a list of documents into the vector collection for a specific
-    source. Uses the configured pgvector table. Returns information about
-    the operation.
+    Counters updated by the pipeline stages while a source is indexed.
+    `fetched`/`unchanged`/`upserted`/`deleted` count documents, `embedded`
+    and `written` count chunks. `total` is the number of documents the
+    connector announced, if it knows; `usage` the embedding usage collector
+    of the run, used to report embedded tokens/sec.
     """
+
+    def __init__(self) -> None:
+        self.started_at = time.time()
+        self.total: Optional[int] = None
+        self.usage: Optional[EmbeddingUsage] = None
+        self.fetched = 0
+        self.unchanged = 0
+        self.upserted = 0
+        self.embedded = 0
+        self.written = 0
+        self.deleted = 0
+
+    def as_dict(self) -> dict:
+        elapsed = max(time.time() - self.started_at, 1e-6)
+        rate = self.fetched / elapsed
+        eta = None
+        if self.total is not None and rate > 0:
+            eta = round(max(self.total - self.fetched, 0) / rate, 1)
+        tokens = self.usage.tokens if self.usage is not None else 0
+        return {
+            "total": self.total,
+            "fetched": self.fetched,
+            "unchanged": self.unchanged,
+            "upserted": self.upserted,
+            "embedded": self.embedded,
+            "written": self.written,
+            "deleted": self.deleted,
+            "elapsed_sec": round(elapsed, 1),
+            "docs_per_sec": round(rate, 2),
+            "chunks_per_sec": round(self.written / elapsed, 2),
+            "embedded_tokens": tokens,
+            "tokens_per_sec": round(tokens / elapsed, 1),
+            "eta_sec": eta,
+        }
+
+
+class _Checkpoint:
+    """
+    Tracks when every chunk of a document has been written so finished
+    documents can be recorded in the sync state before the whole sync ends.
+    A restarted sync then skips them by content hash. Documents are marked
+    pending (through `start`) before their first chunk is written, so a
+    restarted sync replaces the chunks of a partly written document instead
+    of adding them a second time.
+    """
+
+    def __init__(self, flush: Callable[[List[str]], None], every: int, start: Callable[[List[str]], None]) -> None:
+        self._flush = flush
+        self._every = every
+        self._start = start
+        self._started: Set[str] = set()
+        self._expected: Dict[str, int] = {}
+        self._written: Dict[str, int] = {}
+        self._done: List[str] = []
+
+    def chunked(self, doc_id: str, count: int) -> None:
+        self._expected[doc_id] = count
+
+    def writing(self, nodes: List[BaseNode]) -> None:
+        new = list(dict.fromkeys(n.ref_doc_id for n in nodes if n.ref_doc_id not in self._started))
+        if new:
+            self._start(new)
+            self._started.update(new)
+
+    def wrote(self, nodes: List[BaseNode]) -> None:
+        for node in nodes:
+            ref_id = node.ref_doc_id
+            self._written[ref_id] = self._written.get(ref_id, 0) + 1
+            if self._written[ref_id] == self._expected.get(ref_id):
+                del self._written[ref_id]
+                del self._expected[ref_id]
+                self._done.append(ref_id)
+        if len(self._done) >= self._every:
+            self._flush(self._done)
+            self._done = []
+
+
+def _chunk(source: str, docs: Iterator[Document], checkpoint: Optional[_Checkpoint] = None) -> Iterator[List[BaseNode]]:
+    """
+    Split documents into nodes with the source's chunking profile. Batches
+    of INGEST_CHUNK_BATCH_DOCS documents are chunked in the shared process
+    pool with one batch in flight per worker process; node lists come out
+    in document order.
+    """
+    profile = chunking_profile(source)
+    pending: "deque[Tuple[List[Document], Future]]" = deque()
+
+    def drain() -> Iterator[List[BaseNode]]:
+        batch, future = pending.popleft()
+        for doc, nodes in zip(batch, future.result()):
+            if checkpoint is not None:
+                checkpoint.chunked(doc.id_, len(nodes))
+            yield nodes
+
+    batch: List[Document] = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= settings.INGEST_CHUNK_BATCH_DOCS:
+            pending.append((batch, submit_in_process(chunk_documents, batch, profile)))
+            batch = []
+            if len(pending) >= parse_pool_size():
+                yield from drain()
+    if batch:
+        pending.append((batch, submit_in_process(chunk_documents, batch, profile)))
+    while pending:
+        yield from drain()
+
+
+def _embed(chunks: Iterator[List[BaseNode]], stats: IndexingStats) -> Iterator[List[BaseNode]]:
+    """
+    Embed nodes in batches of INGEST_EMBED_BATCH_SIZE across documents. The
+    embedding scheduler splits each batch into token-bounded API requests
+    and runs them concurrently within the shared rate limits.
+    """
+    embed_model = LlamaSettings.embed_model
+    size = settings.INGEST_EMBED_BATCH_SIZE
+
+    def flush(batch: List[BaseNode]) -> List[BaseNode]:
+        texts = [n.get_content(metadata_mode=MetadataMode.EMBED) for n in batch]
+        for node, emb in zip(batch, embed_model.get_text_embedding_batch(texts)):
+            node.embedding = emb
+        stats.embedded += len(batch)
+        return batch
+
+    batch: List[BaseNode] = []
+    for nodes in chunks:
+        for node in nodes:
+            batch.append(node)
+            if len(batch) >= size:
+                yield flush(batch)
+                batch = []
+    if batch:
+        yield flush(batch)
+
+
+def _write(
+    index: VectorStoreIndex,
+    batches: Iterable[List[BaseNode]],
+    replace: Set[str],
+    stats: IndexingStats,
+    checkpoint: Optional[_Checkpoint] = None,
+) -> None:
+    """
+    Write embedded nodes in batches of INGEST_WRITE_BATCH_SIZE. Documents in
+    `replace` already have vectors; those are deleted right before the
+    first batch carrying the document's new nodes is written (or at the end
+    if it produced none). `replace` is filled by the fetch stage as it goes.
+    """
+    size = settings.INGEST_WRITE_BATCH_SIZE
+    replaced: Set[str] = set()
+
+    def flush(nodes: List[BaseNode]) -> None:
+        for ref_id in {n.ref_doc_id for n in nodes}:
+            if ref_id in replace and ref_id not in replaced:
+                index.delete_ref_doc(ref_id)
+                replaced.add(ref_id)
+        if checkpoint is not None:
+            checkpoint.writing(nodes)
+        index.insert_nodes(nodes)
+        stats.written += len(nodes)
+        if checkpoint is not None:
+            checkpoint.wrote(nodes)
+
+    buffer: List[BaseNode] = []
+    for batch in batches:
+        buffer.extend(batch)
+        if len(buffer) >= size:
+            flush(buffer)
+            buffer = []
+    if buffer:
+        flush(buffer)
+    for ref_id in replace - replaced:
+        index.delete_ref_doc(ref_id)
+
+
+def _index_stream(
+    source: str,
+    docs: Iterable[Document],
+    replace: Set[str],
+    stats: IndexingStats,
+    checkpoint: Optional[_Checkpoint] = None,
+) -> None:
+    """
+    Run documents through fetch -> chunk -> embed -> write. Each stage runs
+    in its own thread with at most INGEST_QUEUE_SIZE items queued before
+    the next, so memory use is bounded by queue depth and batch sizes rather
+    than by the size of the corpus.
+    """
+    index = index_for_source(source)
+    batches = run_pipeline(
+        docs,
+        [lambda docs: _chunk(source, docs, checkpoint), lambda chunks: _embed(chunks, stats)],
+        maxsize=settings.INGEST_QUEUE_SIZE,
+    )
+    try:
+        _write(index, batches, replace, stats, checkpoint)
+    finally:
+        batches.close()
+
+
+def sync_source(
+    source: str,
+    ingestor: BaseIngestor,
+    config: dict,
+    full: bool = False,
+    stats: Optional[IndexingStats] = None,
+) -> dict:
+    """
+    Incrementally sync one crawl scope of a source into its collection.
+    The connector streams new/changed documents (with stable ids) and
+    reports deletions relative to the stored watermark; documents whose
+    text hash is unchanged are skipped, changed ones have their old vectors
+    replaced and deleted ones are removed. The new watermark is stored only
+    after the collection has been updated, so a failed sync is simply
+    retried from the previous watermark. `full=True` discards the watermark
+    and re-lists the whole scope (still skipping unchanged content).
+
+    Every INGEST_CHECKPOINT_DOCS fully written documents are recorded in
+    the sync state (without moving the watermark), so an interrupted sync
+    resumes where it stopped: the connector re-lists from the old watermark
+    and the documents already written are skipped. Pass `stats` to observe
+    progress while the sync runs. Blocking; run it in a worker thread from
+    async code.
+    """
+    scope = ingestor.scope(**config)
+    if full:
+        sync_state.reset(source, scope)
+    state = sync_state.load(source, scope)
+    result = ingestor.sync(state, **config)
+    stats = stats or IndexingStats()
+    stats.total = result.total
+    upserted = []
+    replace: Set[str] = set()
+    hashes: Dict[str, tuple] = {}
+
+    def save(doc_ids: List[str]) -> None:
+        sync_state.commit(source, scope, None, [hashes[d] for d in doc_ids])
+
+    def pending(doc_ids: List[str]) -> None:
+        # No version or hash: a resumed sync fetches these again and replaces their chunks
+        sync_state.commit(source, scope, None, [(d, None, None) for d in doc_ids])
+
+    checkpoint = _Checkpoint(save, settings.INGEST_CHECKPOINT_DOCS, pending)
+
+    def changed() -> Iterator[Document]:
+        for doc in result.documents:
+            stats.fetched += 1
+            h = content_hash(doc.text)
+            known = state.documents.get(doc.id_)
+            if getattr(known, "content_hash", None) == h:
+                stats.unchanged += 1
+                continue
+            if known is not None:
+                replace.add(doc.id_)
+            hashes[doc.id_] = (doc.id_, doc.metadata.get("version"), h)
+            upserted.append(hashes[doc.id_])
+            stats.upserted += 1
+            yield doc
+
+    with embedding_usage() as usage:
+        stats.usage = usage
+        _index_stream(source, changed(), replace, stats, checkpoint)
+
+    # Deletions and the watermark are final once the documents are drained
+    deleted = set(result.deleted_ids) & set(state.documents)
+    if result.seen_ids is not None:
+        deleted |= set(state.documents) - result.seen_ids
     index = index_for_source(source)
-    index.insert_documents(docs)
-    return {"source": source, "count": len(docs)}
\ No newline at end of file
+    for doc_id in deleted:
+        index.delete_ref_doc(doc_id)
+    stats.deleted = len(deleted)
+    sync_state.commit(source, scope, result.watermark, upserted, deleted)
+    return {
+        "source": source,
+        "scope": scope,
+        "fetched": stats.fetched,
+        "upserted": stats.upserted,
+        "unchanged": stats.unchanged,
+        "deleted": stats.deleted,
+        "failed": len(result.failed_ids),
+        "chunks": stats.written,
+        "embedding_cache": usage.as_dict(),
+    }
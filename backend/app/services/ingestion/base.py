@@ -1,11 +1,113 @@
 """Base class for ingestion services."""
 
-from typing import List
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set
 from llama_index.core import Document
+from .state import SyncState
+from ..pipeline import merge_concurrently
+from ...core.config import settings
+
+
+class SyncResult:
+    """
+    Outcome of one incremental sync of a crawl scope. `documents` yields new
+    or changed documents with stable ids, `deleted_ids` the ids removed at
+    the source and `watermark` the state to persist once the result has been
+    indexed. When the connector listed the whole scope it passes the ids it
+    saw as `seen_ids`; any previously indexed document not among them was
+    deleted at the source.
+
+    `documents` may be a generator that fetches lazily; connectors that
+    discover deletions or the new watermark while paging fill in the other
+    fields as they go, so those are only final once `documents` has been
+    exhausted. `total`, when the connector knows it up front, is the number
+    of documents it is going to yield and is used for progress estimates.
+    `failed_ids` lists documents that could not be fetched; connectors keep
+    the previous watermark while there are any so they are retried.
+    """
+
+    def __init__(
+        self,
+        documents: Iterable[Document] = (),
+        deleted_ids: Sequence[str] = (),
+        watermark: Optional[dict] = None,
+        seen_ids: Optional[Set[str]] = None,
+        total: Optional[int] = None,
+    ) -> None:
+        self.documents = documents
+        self.deleted_ids = list(deleted_ids)
+        self.watermark = watermark or {}
+        self.seen_ids = seen_ids
+        self.total = total
+        self.failed_ids: List[str] = []
+
+
+def combine_results(results: Dict[str, SyncResult], watermark_key: str) -> SyncResult:
+    """
+    Merge the sync results of several sub-scopes (spaces, drives, ...) into
+    one. Their documents are crawled concurrently on up to
+    INGEST_CRAWL_WORKERS threads; each part's watermark is stored under
+    `watermark_key` by part name. Whole-scope `seen_ids` are only reported
+    if every part listed its whole sub-scope.
+    """
+    combined = SyncResult()
+    parts = list(results.values())
+    if all(r.total is not None for r in parts):
+        combined.total = sum(r.total for r in parts)
+
+    def documents() -> Iterator[Document]:
+        producers = [lambda r=r: r.documents for r in parts]
+        yield from merge_concurrently(producers, max_workers=settings.INGEST_CRAWL_WORKERS)
+        combined.deleted_ids = [d for r in parts for d in r.deleted_ids]
+        if all(r.seen_ids is not None for r in parts):
+            combined.seen_ids = set().union(*(r.seen_ids for r in parts))
+        combined.watermark = {watermark_key: {name: r.watermark for name, r in results.items()}}
+
+    combined.documents = documents()
+    return combined
+
+
+def set_stable_id(doc: Document, source: str, native_id: str, version: Optional[str] = None) -> Document:
+    """
+    Give a document a deterministic id derived from the source's own id so
+    re-syncs replace its vectors instead of duplicating them. The version is
+    kept in metadata but excluded from embedding and LLM context.
+    """
+    doc.id_ = f"{source}:{native_id}"
+    if version is not None:
+        doc.metadata["version"] = version
+        for keys in (doc.excluded_embed_metadata_keys, doc.excluded_llm_metadata_keys):
+            if "version" not in keys:
+                keys.append("version")
+    return doc
 
 
 class BaseIngestor:
     """Abstract interface for ingestion classes."""
 
-    def load(self, **kwargs) -> List[Document]:  # pragma: no cover
-        raise NotImplementedError
\ No newline at end of file
+    def iter_documents(self, **kwargs) -> Iterator[Document]:  # pragma: no cover
+        """Yield the source's documents one at a time instead of materialising them."""
+        raise NotImplementedError
+
+    def load(self, **kwargs) -> List[Document]:
+        return list(self.iter_documents(**kwargs))
+
+    def scope(self, **kwargs) -> str:
+        """Identify the crawl scope (space, drive, channel) the config points at."""
+        return "default"
+
+    def sync(self, state: SyncState, **kwargs) -> SyncResult:
+        """
+        Fetch what changed since `state`. The default streams every document;
+        unchanged documents are then skipped by content hash and documents
+        that disappeared are deleted. Connectors with a native change feed
+        override this.
+        """
+        result = SyncResult(watermark=state.watermark, seen_ids=set())
+
+        def documents() -> Iterator[Document]:
+            for doc in self.iter_documents(**kwargs):
+                result.seen_ids.add(doc.id_)
+                yield doc
+
+        result.documents = documents()
+        return result
@@ -1,18 +1,376 @@
 """Registry for SQL database connections and structured query engines."""
 
-from sqlalchemy import create_engine
-from llama_index.core import SQLDatabase
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from sqlalchemy import JSON, Column, DateTime, Integer, String, Table, Text, create_engine, event, insert, select
+from sqlalchemy import text, update
+from sqlalchemy.engine import CursorResult, Engine, make_url
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from llama_index.core import SQLDatabase, VectorStoreIndex
+from llama_index.core.objects import ObjectIndex, SQLTableNodeMapping, SQLTableSchema
+from ..sql_plans import sql_plans
+from ..sql_results import sql_results
+from ...core.config import settings
+from ...core.logging import logger
+from ...core.metrics import stage
+from ...core.state import ensure_tables, state_engine, state_metadata
+
+
+class ExecutionLimits:
+    """
+    Execution settings of one registered database: connection pool size and
+    overflow, per-statement timeout, maximum rows fetched per query,
+    read-only sessions and a cap on concurrently executing queries. Unset
+    options fall back to the SQL_* settings. Queries over the concurrency
+    cap wait up to `pool_timeout_sec` for a slot and then fail.
+    """
+
+    def __init__(
+        self,
+        pool_size: int,
+        max_overflow: int,
+        pool_timeout_sec: float,
+        statement_timeout_sec: float,
+        max_rows: int,
+        read_only: bool,
+        max_concurrency: int,
+    ) -> None:
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_timeout_sec = pool_timeout_sec
+        self.statement_timeout_sec = statement_timeout_sec
+        self.max_rows = max_rows
+        self.read_only = read_only
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.queries = 0
+        self.rejected = 0
+        self.truncated = 0
+
+    @classmethod
+    def from_options(cls, options: Optional[dict] = None) -> "ExecutionLimits":
+        values = {
+            "pool_size": settings.SQL_POOL_SIZE,
+            "max_overflow": settings.SQL_MAX_OVERFLOW,
+            "pool_timeout_sec": settings.SQL_POOL_TIMEOUT_SEC,
+            "statement_timeout_sec": settings.SQL_STATEMENT_TIMEOUT_SEC,
+            "max_rows": settings.SQL_MAX_ROWS,
+            "read_only": settings.SQL_READ_ONLY,
+            "max_concurrency": settings.SQL_MAX_CONCURRENCY,
+        }
+        values.update({k: v for k, v in (options or {}).items() if v is not None})
+        return cls(**values)
+
+    @contextmanager
+    def slot(self, name: str) -> Iterator[None]:
+        """Hold one of the database's query slots while the body runs."""
+        if not self._slots.acquire(timeout=self.pool_timeout_sec):
+            with self._lock:
+                self.rejected += 1
+            raise TimeoutError(f"Too many concurrent queries on database {name}")
+        with self._lock:
+            self.active += 1
+            self.queries += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pool_size": self.pool_size,
+                "max_overflow": self.max_overflow,
+                "statement_timeout_sec": self.statement_timeout_sec,
+                "max_rows": self.max_rows,
+                "read_only": self.read_only,
+                "max_concurrency": self.max_concurrency,
+                "active": self.active,
+                "queries": self.queries,
+                "rejected": self.rejected,
+                "truncated": self.truncated,
+            }
+
+
+def _session_setup(dialect: str, limits: ExecutionLimits) -> list:
+    """Statements run on every new connection to enforce the timeout and read-only mode."""
+    timeout_ms = int(limits.statement_timeout_sec * 1000)
+    if dialect == "postgresql":
+        return ([f"SET statement_timeout = {timeout_ms}"] if timeout_ms else []) + (
+            ["SET default_transaction_read_only = on"] if limits.read_only else []
+        )
+    if dialect in ("mysql", "mariadb"):
+        return ([f"SET SESSION max_execution_time = {timeout_ms}"] if timeout_ms else []) + (
+            ["SET SESSION TRANSACTION READ ONLY"] if limits.read_only else []
+        )
+    if dialect == "sqlite":
+        # SQLite has no statement timeout
+        return ["PRAGMA query_only = ON"] if limits.read_only else []
+    logger.warning("Statement timeout and read-only mode are not enforced for %s databases", dialect)
+    return []
+
+
+def create_sql_engine(dsn: str, limits: ExecutionLimits) -> Engine:
+    """Create a pooled engine whose sessions enforce `limits`."""
+    url = make_url(dsn)
+    kwargs: Dict[str, Any] = {"pool_pre_ping": True}
+    if url.get_backend_name() != "sqlite":
+        kwargs.update(
+            pool_size=limits.pool_size, max_overflow=limits.max_overflow, pool_timeout=limits.pool_timeout_sec
+        )
+    engine = create_engine(url, **kwargs)
+    statements = _session_setup(engine.dialect.name, limits)
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, _record) -> None:
+        if not statements:
+            return
+        cursor = dbapi_connection.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.close()
+        # Commit so a rollback on pool check-in does not undo the settings
+        dbapi_connection.commit()
+
+    return engine
+
+
+def _truncate(value: Any, length: int) -> Any:
+    if isinstance(value, str) and len(value) > length:
+        return value[:length] + "..."
+    return value
+
+
+class CachedSQLDatabase(SQLDatabase):
+    """
+    SQLDatabase whose per-table schema descriptions are reflected once, at
+    construction, instead of through the inspector on every prompt. Queries
+    run under the database's ExecutionLimits: a concurrency slot, a
+    server-side cursor and at most `max_rows` rows fetched.
+    """
+
+    def __init__(self, engine: Engine, name: str, limits: ExecutionLimits, **kwargs) -> None:
+        super().__init__(engine, **kwargs)
+        self.name = name
+        self.limits = limits
+        self.table_info: Dict[str, str] = {
+            t: super(CachedSQLDatabase, self).get_single_table_info(t) for t in sorted(self.get_usable_table_names())
+        }
+
+    def get_single_table_info(self, table_name: str) -> str:
+        info = self.table_info.get(table_name)
+        return info if info is not None else super().get_single_table_info(table_name)
+
+    @contextmanager
+    def _cursor(self, command: str, buffer_rows: int) -> Iterator[CursorResult]:
+        """Execute `command` in a read transaction on a server-side cursor, holding a query slot."""
+        with self.limits.slot(self.name), self._engine.connect() as connection:
+            connection = connection.execution_options(stream_results=True, max_row_buffer=buffer_rows)
+            with connection.begin():
+                if self._schema:
+                    command = command.replace("FROM ", f"FROM {self._schema}.")
+                    command = command.replace("JOIN ", f"JOIN {self._schema}.")
+                try:
+                    cursor = connection.execute(text(command))
+                except (ProgrammingError, OperationalError) as exc:
+                    raise NotImplementedError(f"Statement {command!r} is invalid SQL.\nError: {exc.orig}") from exc
+                try:
+                    yield cursor
+                finally:
+                    cursor.close()
+
+    def stream_sql(self, command: str, batch_size: int) -> Iterator[Tuple[List[str], List[tuple]]]:
+        """
+        Yield `(columns, rows)` batches of the complete result of `command`,
+        bypassing the row cap and the result cache, for exports. At least
+        one (possibly empty) batch is yielded for statements returning rows.
+        """
+        with self._cursor(command, batch_size) as cursor:
+            if not cursor.returns_rows:
+                return
+            columns = list(cursor.keys())
+            rows = cursor.fetchmany(batch_size)
+            yield columns, [tuple(r) for r in rows]
+            while rows:
+                rows = cursor.fetchmany(batch_size)
+                if rows:
+                    yield columns, [tuple(r) for r in rows]
+
+    def run_sql(self, command: str) -> Tuple[str, Dict]:
+        """
+        Execute `command` like SQLDatabase.run_sql, streaming rows through a
+        server-side cursor and stopping after `max_rows`; the metadata flags
+        truncated results. Results are served from and stored in the SQL
+        result cache.
+        """
+        with stage("sql_execute", self.name) as timing:
+            cached = sql_results.get(self.name, command)
+            if cached is not None:
+                timing.status = "cached"
+                return str(cached.rows), {
+                    "result": cached.rows,
+                    "col_keys": cached.columns,
+                    "truncated": cached.truncated,
+                    "cached": True,
+                }
+            max_rows = self.limits.max_rows
+            with self._cursor(command, min(max_rows, 1000)) as cursor:
+                if not cursor.returns_rows:
+                    return "", {}
+                columns = list(cursor.keys())
+                rows = cursor.fetchmany(max_rows + 1)
+            truncated = len(rows) > max_rows
+            if truncated:
+                timing.status = "truncated"
+                rows = rows[:max_rows]
+                with self.limits._lock:
+                    self.limits.truncated += 1
+            result = [tuple(_truncate(v, self._max_string_length) for v in row) for row in rows]
+            sql_results.set(self.name, command, self.table_info, columns, result, truncated)
+            return str(result), {"result": result, "col_keys": columns, "truncated": truncated}
+
+
+class SchemaContext:
+    """
+    Reflected schema of one registered database: the SQLDatabase with its
+    cached table descriptions, optional per-table context supplied at
+    registration and, for databases with more than SQL_TABLE_RETRIEVAL_MIN
+    tables, a vector index over the table descriptions used to pick the
+    tables relevant to a question.
+    """
+
+    def __init__(self, sqldb: CachedSQLDatabase, descriptions: Dict[str, str]) -> None:
+        self.sqldb = sqldb
+        self.descriptions = {t: d for t, d in descriptions.items() if t in sqldb.table_info}
+        self.tables = [SQLTableSchema(table_name=t, context_str=self.descriptions.get(t)) for t in sqldb.table_info]
+        self.fingerprint = hashlib.sha256(
+            "\n".join(f"{t}\t{i}\t{self.descriptions.get(t, '')}" for t, i in sqldb.table_info.items()).encode("utf-8")
+        ).hexdigest()
+        self.refreshed_at = time.time()
+        self.object_index: Optional[ObjectIndex] = None
+        if len(self.tables) > settings.SQL_TABLE_RETRIEVAL_MIN:
+            self.object_index = ObjectIndex.from_objects(
+                self.tables, SQLTableNodeMapping(sqldb), index_cls=VectorStoreIndex
+            )
+
+    def stats(self) -> dict:
+        return {
+            "limits": self.sqldb.limits.stats(),
+            "tables": len(self.tables),
+            "table_retrieval": self.object_index is not None,
+            "fingerprint": self.fingerprint,
+            "refreshed_at": self.refreshed_at,
+        }
+
+
+sql_sources_table = Table(
+    f"{settings.COLLECTION_PREFIX}sql_sources",
+    state_metadata,
+    Column("name", String(128), primary_key=True),
+    # SQLAlchemy URI including credentials; keep the state database private
+    Column("dsn", Text, nullable=False),
+    Column("options", JSON, nullable=False),
+    # Bumped on every registration or refresh; workers rebuild stale copies
+    Column("version", Integer, nullable=False),
+    Column("created_at", DateTime(timezone=True)),
+    Column("updated_at", DateTime(timezone=True)),
+)
+
+
+class _CatalogEntry(NamedTuple):
+    dsn: str
+    options: dict
+    version: int
 
 
 class SQLRegistry:
     """
-    Maintain a mapping from names to LlamaIndex SQLDatabase objects. This
-    provides a simple way to register multiple databases and reference them
-    by name in query requests.
+    Catalog of registered SQL databases shared by all API workers through
+    the state database. Each worker materializes a database (engine, pool
+    and reflected schema) lazily on first use and keeps it until the
+    catalog version changes: the catalog is re-read at most every
+    `poll_sec`, stale copies are dropped and rebuilt on next use, and the
+    change listeners are told so pooled engines and cached results built
+    from the old copy are discarded. Schemas are reflected once per
+    registration and cached until `refresh` is called.
     """
 
-    def __init__(self) -> None:
-        self.engines: dict[str, SQLDatabase] = {}
+    def __init__(self, poll_sec: float) -> None:
+        self.poll_sec = poll_sec
+        self.schemas: dict[str, SchemaContext] = {}
+        # Catalog entry each local copy was built from
+        self._built: Dict[str, _CatalogEntry] = {}
+        # Last dropped copy per database: its engine is reused if the DSN and limits are unchanged
+        self._retired: Dict[str, Tuple[SchemaContext, _CatalogEntry]] = {}
+        self._catalog: Dict[str, _CatalogEntry] = {}
+        self._loaded_at = float("-inf")
+        self._listeners: List[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+        self._build_locks: Dict[str, threading.Lock] = {}
+
+    def add_listener(self, listener: Callable[[str], None]) -> None:
+        """Call `listener(name)` whenever this worker's copy of a database changes."""
+        self._listeners.append(listener)
+
+    def _notify(self, name: str) -> None:
+        for listener in self._listeners:
+            try:
+                listener(name)
+            except Exception:
+                logger.exception("SQL source listener failed for %s", name)
+
+    def _load_catalog(self, force: bool = False) -> None:
+        if not force and time.monotonic() - self._loaded_at < self.poll_sec:
+            return
+        ensure_tables(sql_sources_table)
+        with state_engine.connect() as conn:
+            rows = conn.execute(
+                select(
+                    sql_sources_table.c.name,
+                    sql_sources_table.c.dsn,
+                    sql_sources_table.c.options,
+                    sql_sources_table.c.version,
+                ).order_by(sql_sources_table.c.created_at, sql_sources_table.c.name)
+            ).all()
+        catalog = {r.name: _CatalogEntry(r.dsn, r.options, r.version) for r in rows}
+        with self._lock:
+            self._catalog = catalog
+            self._loaded_at = time.monotonic()
+            stale = [n for n, e in self._built.items() if n not in catalog or catalog[n].version > e.version]
+            for n in stale:
+                self._retired[n] = (self.schemas.pop(n), self._built.pop(n))
+        for n in stale:
+            logger.info("SQL database %s changed in the catalog; rebuilding on next use", n)
+            self._notify(n)
+
+    def _bump(self, name: str, **values: Any) -> int:
+        """Write a catalog row with its version incremented; returns the new version."""
+        now = datetime.now(timezone.utc)
+        ensure_tables(sql_sources_table)
+        with state_engine.begin() as conn:
+            updated = conn.execute(
+                update(sql_sources_table)
+                .where(sql_sources_table.c.name == name)
+                .values(version=sql_sources_table.c.version + 1, updated_at=now, **values)
+            ).rowcount
+            if not updated:
+                conn.execute(
+                    insert(sql_sources_table).values(name=name, version=1, created_at=now, updated_at=now, **values)
+                )
+            return conn.execute(select(sql_sources_table.c.version).where(sql_sources_table.c.name == name)).scalar()
+
+    def names(self) -> List[str]:
+        """Registered databases in registration order."""
+        self._load_catalog()
+        return list(self._catalog)
 
     def register(
         self,
@@ -20,14 +378,100 @@ class SQLRegistry:
         dsn: str,
         include: list[str] | None = None,
         schema: str | None = None,
+        descriptions: dict[str, str] | None = None,
+        execution: dict | None = None,
     ) -> str:
-        engine = create_engine(dsn)
-        sqldb = SQLDatabase(engine, include_tables=include, schema=schema)
-        self.engines[name] = sqldb
+        """
+        Reflect the database here first, so a bad DSN fails the request
+        instead of every other worker, then record it in the catalog.
+        """
+        options = {
+            "include": include,
+            "schema": schema,
+            "descriptions": descriptions or {},
+            "execution": execution or {},
+        }
+        entry = _CatalogEntry(dsn, options, 0)
+        context = self._build(name, entry, reuse=None)
+        version = self._bump(name, dsn=dsn, options=options)
+        self._install(name, context, entry._replace(version=version))
         return name
 
+    def refresh(self, name: str) -> SchemaContext:
+        """Re-reflect the schema of a registered database on every worker."""
+        current = self.schema(name)
+        with self._lock:
+            entry = self._built[name]
+        context = self._build(name, entry, reuse=(current, entry))
+        version = self._bump(name)
+        self._install(name, context, entry._replace(version=version))
+        return context
+
+    @staticmethod
+    def _build(
+        name: str, entry: _CatalogEntry, reuse: Optional[Tuple[SchemaContext, _CatalogEntry]]
+    ) -> SchemaContext:
+        started = time.perf_counter()
+        options = entry.options
+        if reuse is not None and (reuse[1].dsn, reuse[1].options.get("execution")) == (
+            entry.dsn,
+            options.get("execution"),
+        ):
+            engine, limits = reuse[0].sqldb.engine, reuse[0].sqldb.limits
+        else:
+            limits = ExecutionLimits.from_options(options.get("execution"))
+            engine = create_sql_engine(entry.dsn, limits)
+        sqldb = CachedSQLDatabase(
+            engine, name, limits, include_tables=options.get("include"), schema=options.get("schema")
+        )
+        context = SchemaContext(sqldb, options.get("descriptions") or {})
+        logger.info(
+            "Reflected %d tables of SQL database %s in %.1fs", len(context.tables), name, time.perf_counter() - started
+        )
+        return context
+
+    def _install(self, name: str, context: SchemaContext, entry: _CatalogEntry) -> None:
+        with self._lock:
+            old = self.schemas.get(name)
+            if old is None and name in self._retired:
+                old = self._retired[name][0]
+            self.schemas[name] = context
+            self._built[name] = entry
+            self._retired.pop(name, None)
+            if name not in self._catalog or self._catalog[name].version < entry.version:
+                self._catalog[name] = entry
+        if old is not None:
+            if old.sqldb.engine is not context.sqldb.engine:
+                old.sqldb.engine.dispose()
+            # Plans survive re-registration unless the schema actually changed
+            if old.fingerprint != context.fingerprint:
+                sql_plans.invalidate(old.fingerprint)
+        self._notify(name)
+
+    def schema(self, name: str) -> SchemaContext:
+        """This worker's copy of a registered database, materialized on first use."""
+        self._load_catalog()
+        with self._lock:
+            entry = self._catalog.get(name)
+            if entry is None:
+                raise KeyError(name)
+            if name in self._built and self._built[name].version >= entry.version:
+                return self.schemas[name]
+            build_lock = self._build_locks.setdefault(name, threading.Lock())
+        with build_lock:
+            with self._lock:
+                if name in self._built and self._built[name].version >= entry.version:
+                    return self.schemas[name]
+                if name in self._built:
+                    reuse = (self.schemas[name], self._built[name])
+                else:
+                    reuse = self._retired.get(name)
+            context = self._build(name, entry, reuse)
+            self._install(name, context, entry)
+            return context
+
     def get(self, name: str) -> SQLDatabase:
-        return self.engines[name]
+        return self.schema(name).sqldb
 
 
-sql_registry = SQLRegistry()
\ No newline at end of file
+sql_registry = SQLRegistry(settings.SQL_CATALOG_POLL_SEC)
@@ -1,24 +1,47 @@
 """Ingest files from Microsoft OneDrive."""
 
 from typing import List
-from llama_index.core import Document
-from llama_index.readers.microsoft_onedrive import OneDriveReader
-from .base import BaseIngestor
+from .base import BaseIngestor, SyncResult, combine_results
+from .graph import get_app_token, sync_drive
+from .state import SyncState
+
+
+def _principals(**kwargs) -> List[str]:
+    """Drives to crawl: `user_principal_names` (list) or the single `user_principal_name`."""
+    return list(kwargs.get("user_principal_names") or [kwargs["user_principal_name"]])
 
 
 class OneDriveIngestor(BaseIngestor):
-    """Loads files from a user's or group's OneDrive."""
+    """
+    Loads files from one or more users' or groups' OneDrives. Drives are
+    synced concurrently (up to INGEST_CRAWL_WORKERS); changed files are
+    downloaded concurrently and PDFs/Office documents are parsed in the
+    shared process pool (see `graph.sync_drive`).
+    """
+
+    def scope(self, **kwargs) -> str:
+        paths = ",".join(sorted(kwargs.get("paths") or []))
+        return f"{','.join(sorted(_principals(**kwargs)))}:{paths or '/'}"
 
-    def load(self, **kwargs) -> List[Document]:
-        reader = OneDriveReader(
-            client_id=kwargs["client_id"],
-            client_secret=kwargs["client_secret"],
-            tenant_id=kwargs["tenant_id"],
-        )
-        principal = kwargs["user_principal_name"]
-        paths = kwargs.get("paths")  # optional list of folder paths
-        docs = reader.load_data(userprincipalname=principal, paths=paths)
-        for doc in docs:
-            doc.metadata.setdefault("source", "onedrive")
-            doc.metadata.setdefault("path", doc.metadata.get("file_path", "onedrive"))
-        return docs
\ No newline at end of file
+    def sync(self, state: SyncState, **kwargs) -> SyncResult:
+        """
+        Delta-sync each principal's drive (see `graph.sync_drive`). Several
+        drives are synced concurrently, each with its own delta link.
+        """
+        token = get_app_token(kwargs["tenant_id"], kwargs["client_id"], kwargs["client_secret"])
+        principals = _principals(**kwargs)
+        if len(principals) == 1:
+            drive_path = f"/users/{principals[0]}/drive"
+            return sync_drive("onedrive", drive_path, token, state, folders=kwargs.get("paths"))
+        drives = state.watermark.get("drives", {})
+        results = {
+            p: sync_drive(
+                "onedrive",
+                f"/users/{p}/drive",
+                token,
+                SyncState(state.source, state.scope, drives.get(p, {}), state.documents),
+                folders=kwargs.get("paths"),
+            )
+            for p in principals
+        }
+        return combine_results(results, "drives")
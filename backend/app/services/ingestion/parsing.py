@@ -0,0 +1,67 @@
+"""Turn downloaded files into text using LlamaIndex's file readers."""
+
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Optional
+from llama_index.core import SimpleDirectoryReader
+from ...core.config import settings
+
+# Formats whose parsing is CPU-bound enough to be worth a round trip to a worker process
+_HEAVY_EXTENSIONS = {".pdf", ".docx", ".doc", ".xlsx", ".xls", ".pptx", ".ppt", ".epub"}
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def parse_pool_size() -> int:
+    return settings.INGEST_PARSE_PROCESSES or os.cpu_count() or 1
+
+
+def _parse_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned (not forked) workers: the API process runs many threads
+            _pool = ProcessPoolExecutor(
+                max_workers=parse_pool_size(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def submit_in_process(fn: Callable[..., Any], *args: Any) -> Future:
+    """Submit a CPU-heavy, picklable top-level function to the shared process pool."""
+    return _parse_pool().submit(fn, *args)
+
+
+def run_in_process(fn: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run `fn` in the shared process pool and wait for its result. Called from
+    crawl threads, so several files or page batches are parsed on
+    different cores at once.
+    """
+    return submit_in_process(fn, *args).result()
+
+
+def parse_file_bytes(name: str, data: bytes) -> str:
+    """
+    Parse a file's raw bytes (PDF, DOCX, XLSX, text, ...) and return its
+    text. Multi-part outputs such as PDF pages are joined into one string
+    so a file maps to exactly one document.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, os.path.basename(name) or "file")
+        with open(path, "wb") as fh:
+            fh.write(data)
+        docs = SimpleDirectoryReader(input_files=[path]).load_data()
+    return "\n\n".join(d.text for d in docs)
+
+
+def parse_file(name: str, data: bytes) -> str:
+    """`parse_file_bytes`, offloaded to the process pool for heavy formats."""
+    if os.path.splitext(name)[1].lower() in _HEAVY_EXTENSIONS:
+        return run_in_process(parse_file_bytes, name, data)
+    return parse_file_bytes(name, data)
@@ -1,29 +1,40 @@
 """Ingest files from Microsoft SharePoint."""
 
 from typing import List
-from llama_index.core import Document
-from llama_index.readers.microsoft_sharepoint import SharePointReader
-from .base import BaseIngestor
+from .base import BaseIngestor, SyncResult
+from .graph import get_app_token, graph_get, sync_drive
+from .state import SyncState
+
+
+def _folder_paths(**kwargs) -> List[str]:
+    """Folders to crawl: `folder_paths` (list) or the single `folder_path` (default "/")."""
+    return list(kwargs.get("folder_paths") or [kwargs.get("folder_path", "/")])
 
 
 class SharePointIngestor(BaseIngestor):
-    """Loads files from a SharePoint document library."""
+    """
+    Loads files from one or more folders of a SharePoint document library.
+    Changed files are downloaded concurrently and PDFs/Office documents are
+    parsed in the shared process pool (see `graph.sync_drive`).
+    """
+
+    def scope(self, **kwargs) -> str:
+        folders = ",".join(sorted(_folder_paths(**kwargs)))
+        return f"{kwargs['site_name']}:{kwargs.get('drive_id') or 'default'}:{folders}"
 
-    def load(self, **kwargs) -> List[Document]:
-        reader = SharePointReader(
-            client_id=kwargs["client_id"],
-            client_secret=kwargs["client_secret"],
-            tenant_id=kwargs["tenant_id"],
-            site_name=kwargs["site_name"],
-            drive_id=kwargs.get("drive_id"),
-        )
-        folder = kwargs.get("folder_path", "/")
-        docs = reader.load_data(folder_path=folder)
-        for doc in docs:
-            doc.metadata.setdefault("source", "sharepoint")
-            # Many SharePoint docs have 'file_path' metadata
-            doc.metadata.setdefault(
-                "path",
-                doc.metadata.get("file_path", "sharepoint"),
-            )
-        return docs
\ No newline at end of file
+    def sync(self, state: SyncState, **kwargs) -> SyncResult:
+        """
+        Delta-sync the site's document library (see `graph.sync_drive`).
+        One delta query covers every requested folder.
+        """
+        token = get_app_token(kwargs["tenant_id"], kwargs["client_id"], kwargs["client_secret"])
+        drive_id = kwargs.get("drive_id")
+        if drive_id:
+            drive_path = f"/drives/{drive_id}"
+        else:
+            sites = graph_get("/sites", token, search=kwargs["site_name"]).get("value", [])
+            if not sites:
+                raise ValueError(f"SharePoint site not found: {kwargs['site_name']}")
+            site = next((s for s in sites if s.get("name") == kwargs["site_name"]), sites[0])
+            drive_path = f"/sites/{site['id']}/drive"
+        return sync_drive("sharepoint", drive_path, token, state, folders=_folder_paths(**kwargs))
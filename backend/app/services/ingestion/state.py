@@ -0,0 +1,134 @@
+"""Persistent per-source sync watermarks and indexed document versions."""
+
+import hashlib
+from datetime import datetime, timezone
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+from sqlalchemy import JSON, Column, DateTime, String, Table, delete, insert, select
+from ...core.config import settings
+from ...core.state import ensure_tables, state_engine, state_metadata
+
+
+sync_state_table = Table(
+    f"{settings.COLLECTION_PREFIX}sync_state",
+    state_metadata,
+    Column("source", String(64), primary_key=True),
+    Column("scope", String(512), primary_key=True),
+    Column("watermark", JSON, nullable=False),
+    Column("updated_at", DateTime(timezone=True)),
+)
+
+sync_documents_table = Table(
+    f"{settings.COLLECTION_PREFIX}sync_documents",
+    state_metadata,
+    Column("source", String(64), primary_key=True),
+    Column("scope", String(512), primary_key=True),
+    Column("doc_id", String(512), primary_key=True),
+    Column("version", String(256)),
+    Column("content_hash", String(64)),
+    Column("updated_at", DateTime(timezone=True)),
+)
+
+
+def content_hash(text: str) -> str:
+    """Hash of a document's text used to detect unchanged content."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class DocumentState(NamedTuple):
+    """Version and content hash of an indexed document."""
+
+    version: Optional[str]
+    content_hash: Optional[str]
+
+
+class SyncState:
+    """
+    What is known about one crawl scope (a space, drive or channel) of a
+    source: the connector's watermark (delta token, last-modified time, ...)
+    and the version/hash of every document currently indexed from it.
+    """
+
+    def __init__(self, source: str, scope: str, watermark: dict, documents: Dict[str, DocumentState]) -> None:
+        self.source = source
+        self.scope = scope
+        self.watermark = watermark
+        self.documents = documents
+
+
+class SyncStateStore:
+    """Read and update sync state in the shared state database."""
+
+    def _ensure(self) -> None:
+        ensure_tables(sync_state_table, sync_documents_table)
+
+    def load(self, source: str, scope: str) -> SyncState:
+        self._ensure()
+        with state_engine.connect() as conn:
+            row = conn.execute(
+                select(sync_state_table.c.watermark).where(
+                    sync_state_table.c.source == source, sync_state_table.c.scope == scope
+                )
+            ).first()
+            docs = conn.execute(
+                select(
+                    sync_documents_table.c.doc_id,
+                    sync_documents_table.c.version,
+                    sync_documents_table.c.content_hash,
+                ).where(sync_documents_table.c.source == source, sync_documents_table.c.scope == scope)
+            ).all()
+        documents = {r.doc_id: DocumentState(r.version, r.content_hash) for r in docs}
+        return SyncState(source, scope, dict(row.watermark) if row else {}, documents)
+
+    def commit(
+        self,
+        source: str,
+        scope: str,
+        watermark: Optional[dict] = None,
+        upserted: Iterable[Tuple[str, Optional[str], str]] = (),
+        deleted: Iterable[str] = (),
+    ) -> None:
+        """
+        Record `(doc_id, version, content_hash)` for upserted documents,
+        forget deleted ones and, if given, store the new watermark. All in
+        one transaction.
+        """
+        self._ensure()
+        now = datetime.now(timezone.utc)
+        scope_filter = (sync_documents_table.c.source == source, sync_documents_table.c.scope == scope)
+        upserted = list(upserted)
+        stale_ids = list(deleted) + [doc_id for doc_id, _, _ in upserted]
+        with state_engine.begin() as conn:
+            for i in range(0, len(stale_ids), 500):
+                conn.execute(
+                    delete(sync_documents_table).where(
+                        *scope_filter, sync_documents_table.c.doc_id.in_(stale_ids[i : i + 500])
+                    )
+                )
+            if upserted:
+                conn.execute(
+                    insert(sync_documents_table),
+                    [
+                        {"source": source, "scope": scope, "doc_id": d, "version": v, "content_hash": h, "updated_at": now}
+                        for d, v, h in upserted
+                    ],
+                )
+            if watermark is not None:
+                conn.execute(
+                    delete(sync_state_table).where(
+                        sync_state_table.c.source == source, sync_state_table.c.scope == scope
+                    )
+                )
+                conn.execute(
+                    insert(sync_state_table).values(source=source, scope=scope, watermark=watermark, updated_at=now)
+                )
+
+    def reset(self, source: str, scope: str) -> None:
+        """Forget the watermark so the next sync enumerates everything again."""
+        self._ensure()
+        with state_engine.begin() as conn:
+            conn.execute(
+                delete(sync_state_table).where(sync_state_table.c.source == source, sync_state_table.c.scope == scope)
+            )
+
+
+sync_state = SyncStateStore()
@@ -0,0 +1,102 @@
+"""Per-source chunking: structure-aware splitting and packing of small sections."""
+
+import json
+from typing import Dict, List
+from llama_index.core import Document
+from llama_index.core.node_parser import HTMLNodeParser, MarkdownNodeParser, SentenceSplitter
+from llama_index.core.node_parser.node_utils import build_nodes_from_splits
+from llama_index.core.schema import TextNode
+from llama_index.core.utils import get_tokenizer
+from ...core.config import settings
+
+# parser: "sentence" (plain text), "paragraph" (blank-line separated blocks),
+# "html", "markdown" or "auto" (by content / file name).
+# Sections smaller than chunk_size are packed together; larger ones are split
+# with chunk_overlap tokens of overlap.
+DEFAULT_PROFILES: Dict[str, dict] = {
+    "default": {"parser": "auto", "chunk_size": 1024, "chunk_overlap": 200},
+    # The Confluence reader converts page HTML to markdown; split at its headers
+    "confluence": {"parser": "markdown", "chunk_size": 1024, "chunk_overlap": 100},
+    # Files: markdown by extension, spreadsheets/PDF text otherwise
+    "sharepoint": {"parser": "auto", "chunk_size": 768, "chunk_overlap": 100},
+    "onedrive": {"parser": "auto", "chunk_size": 768, "chunk_overlap": 100},
+    # Threads of short messages (one per paragraph): pack whole messages into windows
+    "teams": {"parser": "paragraph", "chunk_size": 512, "chunk_overlap": 0},
+}
+
+_HTML_TAGS = ["p", "h1", "h2", "h3", "h4", "h5", "h6", "li", "pre", "table", "blockquote"]
+
+
+def chunking_profile(source: str) -> dict:
+    """
+    The chunking profile of `source`: built-in defaults overridden by the
+    INGEST_CHUNKING JSON setting, e.g. `{"teams": {"chunk_size": 256}}`.
+    """
+    overrides = json.loads(settings.INGEST_CHUNKING) if settings.INGEST_CHUNKING else {}
+    profile = dict(DEFAULT_PROFILES["default"])
+    profile.update(overrides.get("default", {}))
+    profile.update(DEFAULT_PROFILES.get(source, {}))
+    profile.update(overrides.get(source, {}))
+    return profile
+
+
+def _parser_for(doc: Document, parser: str) -> str:
+    if parser != "auto":
+        return parser
+    name = str(doc.metadata.get("file_name") or doc.metadata.get("path") or "").lower()
+    if name.endswith((".md", ".markdown")):
+        return "markdown"
+    if name.endswith((".html", ".htm")) or doc.text.lstrip().startswith("<"):
+        return "html"
+    return "sentence"
+
+
+def _sections(doc: Document, parser: str) -> List[str]:
+    """Split a document at its structural boundaries (HTML blocks, markdown headers)."""
+    if parser == "html":
+        sections = [n.get_content() for n in HTMLNodeParser(tags=_HTML_TAGS).get_nodes_from_node(doc)]
+    elif parser == "markdown":
+        sections = [n.get_content() for n in MarkdownNodeParser().get_nodes_from_node(doc)]
+    elif parser == "paragraph":
+        sections = doc.text.split("\n\n")
+    else:
+        sections = [doc.text]
+    sections = [s for s in sections if s.strip()]
+    # Markup without any of the block tags still yields its text
+    return sections or ([doc.text] if doc.text.strip() else [])
+
+
+def chunk_document(doc: Document, profile: dict) -> List[TextNode]:
+    """
+    Chunk one document according to `profile`: split it into structural
+    sections, pack consecutive small sections into windows of up to
+    `chunk_size` tokens and split oversized sections with overlap. Nodes
+    keep the document's metadata and reference it as their source.
+    """
+    size, overlap = profile["chunk_size"], profile["chunk_overlap"]
+    splitter = SentenceSplitter(chunk_size=size, chunk_overlap=overlap)
+    tokenizer = get_tokenizer()
+    chunks: List[str] = []
+    window: List[str] = []
+    window_tokens = 0
+    for section in _sections(doc, _parser_for(doc, profile["parser"])):
+        tokens = len(tokenizer(section))
+        if window and window_tokens + tokens > size:
+            chunks.append("\n\n".join(window))
+            window, window_tokens = [], 0
+        if tokens > size:
+            chunks.extend(splitter.split_text(section))
+            continue
+        window.append(section)
+        window_tokens += tokens
+    if window:
+        chunks.append("\n\n".join(window))
+    nodes = build_nodes_from_splits(chunks, doc)
+    for node in nodes:
+        node.metadata = dict(doc.metadata)
+    return nodes
+
+
+def chunk_documents(docs: List[Document], profile: dict) -> List[List[TextNode]]:
+    """Chunk a batch of documents; runs in a worker process of the parse pool."""
+    return [chunk_document(doc, profile) for doc in docs]
@@ -0,0 +1,369 @@
+"""Background indexing jobs persisted in the shared state database."""
+
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    String,
+    Table,
+    Text,
+    exists,
+    insert,
+    select,
+    update,
+)
+from sqlalchemy.exc import IntegrityError
+from ..core.cache import invalidate_tag
+from ..core.config import settings
+from ..core.logging import logger
+from ..core.state import ensure_tables, state_engine, state_metadata
+from .indexing import IndexingStats, sync_source
+from .ingestion.base import BaseIngestor
+from .ingestion.confluence import ConfluenceIngestor
+from .ingestion.onedrive import OneDriveIngestor
+from .ingestion.sharepoint import SharePointIngestor
+from .ingestion.teams import TeamsIngestor
+from .query_engines import engine_pool
+from .semantic_cache import semantic_cache
+
+
+# Registry mapping for source types
+INGESTORS: Dict[str, BaseIngestor] = {
+    "confluence": ConfluenceIngestor(),
+    "sharepoint": SharePointIngestor(),
+    "onedrive": OneDriveIngestor(),
+    "teams": TeamsIngestor(),
+}
+
+jobs_table = Table(
+    f"{settings.COLLECTION_PREFIX}index_jobs",
+    state_metadata,
+    Column("id", String(36), primary_key=True),
+    Column("source", String(64), nullable=False),
+    # Crawl scope (ingestor.scope(**config)); one running job per source and scope
+    Column("scope", String(512), nullable=False),
+    Column("config", JSON, nullable=False),
+    Column("full", Boolean, nullable=False),
+    # queued | running | succeeded | failed
+    Column("status", String(16), nullable=False, index=True),
+    Column("progress", JSON),
+    Column("result", JSON),
+    Column("error", Text),
+    Column("attempts", Integer, nullable=False),
+    Column("worker", String(256)),
+    Column("created_at", DateTime(timezone=True)),
+    Column("started_at", DateTime(timezone=True)),
+    Column("heartbeat_at", DateTime(timezone=True)),
+    Column("finished_at", DateTime(timezone=True)),
+)
+Index(
+    f"{settings.COLLECTION_PREFIX}index_jobs_running_scope",
+    jobs_table.c.source,
+    jobs_table.c.scope,
+    unique=True,
+    sqlite_where=jobs_table.c.status == "running",
+    postgresql_where=jobs_table.c.status == "running",
+)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_dict(row) -> dict:
+    job = dict(row._mapping)
+    job.pop("config", None)  # holds connector credentials
+    for key in ("created_at", "started_at", "heartbeat_at", "finished_at"):
+        if job[key] is not None:
+            job[key] = job[key].isoformat()
+    return job
+
+
+# One row per source, bumped whenever its index changed so every worker drops
+# what it cached from the source, not only the one that ran the job.
+source_versions_table = Table(
+    f"{settings.COLLECTION_PREFIX}source_versions",
+    state_metadata,
+    Column("source", String(64), primary_key=True),
+    Column("version", Integer, nullable=False),
+    Column("updated_at", DateTime(timezone=True)),
+)
+
+
+def _drop_cached(source: str) -> None:
+    engine_pool.invalidate(source=source)
+    invalidate_tag(f"source:{source}")
+    semantic_cache.invalidate(source=source)
+
+
+class SourceInvalidations:
+    """
+    Propagates index changes between API workers through the state database.
+    `publish` bumps the version of a source and drops this worker's caches
+    right away; `poll` (run every heartbeat) drops them in the other workers.
+    """
+
+    def __init__(self) -> None:
+        self._seen: Optional[Dict[str, int]] = None
+        self._lock = threading.Lock()
+
+    def publish(self, source: str) -> None:
+        ensure_tables(source_versions_table)
+        now = _now()
+        with state_engine.begin() as conn:
+            updated = conn.execute(
+                update(source_versions_table)
+                .where(source_versions_table.c.source == source)
+                .values(version=source_versions_table.c.version + 1, updated_at=now)
+            ).rowcount
+            if not updated:
+                conn.execute(insert(source_versions_table).values(source=source, version=1, updated_at=now))
+            version = conn.execute(
+                select(source_versions_table.c.version).where(source_versions_table.c.source == source)
+            ).scalar()
+        with self._lock:
+            if self._seen is not None:
+                self._seen[source] = version
+        _drop_cached(source)
+
+    def poll(self) -> None:
+        ensure_tables(source_versions_table)
+        with state_engine.connect() as conn:
+            versions = dict(conn.execute(select(source_versions_table.c.source, source_versions_table.c.version)).all())
+        with self._lock:
+            seen, self._seen = self._seen, versions
+        if seen is None:
+            return  # nothing cached yet from before startup
+        for source, version in versions.items():
+            if seen.get(source) != version:
+                logger.info("Index of %s changed in another worker; dropping cached results", source)
+                _drop_cached(source)
+
+
+source_invalidations = SourceInvalidations()
+
+
+def invalidate_source(source: str) -> None:
+    """Drop pooled engines and cached results built from `source` in every worker."""
+    source_invalidations.publish(source)
+
+
+class IndexJobQueue:
+    """
+    Queue of indexing jobs backed by the state database. At most
+    `max_workers` jobs run at a time, at most `per_source` of the same
+    source and only one per crawl scope of a source (two syncs of the same
+    scope would both embed the documents missing from the sync state); jobs
+    over a limit stay queued until it frees up. Limits are counted over the
+    running jobs in the database and jobs are claimed with a conditional
+    update, so several API workers can share one queue. A unique index over
+    the running jobs' source and scope keeps concurrent claims of the same
+    scope from both succeeding.
+
+    While a job runs its progress is written back every heartbeat. A job
+    whose heartbeat stops (its worker died or was restarted) is queued
+    again and resumes from the sync checkpoint: documents already written
+    are skipped. The connector config, including credentials, is stored
+    with the job so it can be resumed; keep the state database private.
+    """
+
+    def __init__(self, max_workers: int, per_source: int) -> None:
+        self.max_workers = max_workers
+        self.per_source = per_source
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="index-job")
+        self._lock = threading.Lock()
+        self._poller: Optional[threading.Thread] = None
+
+    def _ensure(self) -> None:
+        ensure_tables(jobs_table)
+
+    def start(self) -> None:
+        """
+        Pick up queued and orphaned jobs now and keep polling for them, and
+        for index changes made by other workers, every heartbeat (call once
+        at startup).
+        """
+        source_invalidations.poll()
+        if self._poller is None:
+            self._poller = threading.Thread(target=self._poll, name="index-job-poller", daemon=True)
+            self._poller.start()
+        self._dispatch()
+
+    def _poll(self) -> None:
+        while True:
+            time.sleep(settings.INDEX_JOB_HEARTBEAT_SEC)
+            try:
+                source_invalidations.poll()
+            except Exception:  # pragma: no cover - keep polling
+                logger.exception("Polling source invalidations failed")
+            try:
+                self._dispatch()
+            except Exception:  # pragma: no cover - keep polling
+                logger.exception("Indexing job dispatch failed")
+
+    def submit(self, source: str, config: dict, full: bool = False) -> dict:
+        """Queue a sync of one source scope and return the new job."""
+        if source not in INGESTORS:
+            raise ValueError(f"Unsupported source: {source}")
+        try:
+            scope = INGESTORS[source].scope(**config)
+        except KeyError as ex:
+            raise ValueError(f"Missing {source} config field: {ex.args[0]}") from None
+        self._ensure()
+        job_id = str(uuid.uuid4())
+        with state_engine.begin() as conn:
+            conn.execute(
+                insert(jobs_table).values(
+                    id=job_id,
+                    source=source,
+                    scope=scope,
+                    config=config,
+                    full=full,
+                    status="queued",
+                    attempts=0,
+                    created_at=_now(),
+                )
+            )
+        self._dispatch()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        self._ensure()
+        with state_engine.connect() as conn:
+            row = conn.execute(select(jobs_table).where(jobs_table.c.id == job_id)).first()
+        return _as_dict(row) if row else None
+
+    def list(self, source: Optional[str] = None, limit: int = 50) -> List[dict]:
+        self._ensure()
+        query = select(jobs_table).order_by(jobs_table.c.created_at.desc()).limit(limit)
+        if source:
+            query = query.where(jobs_table.c.source == source)
+        with state_engine.connect() as conn:
+            return [_as_dict(r) for r in conn.execute(query)]
+
+    def _requeue_orphans(self, conn) -> None:
+        cutoff = _now() - timedelta(seconds=settings.INDEX_JOB_STALE_SEC)
+        requeued = conn.execute(
+            update(jobs_table)
+            .where(jobs_table.c.status == "running", jobs_table.c.heartbeat_at < cutoff)
+            .values(status="queued", worker=None)
+        ).rowcount
+        if requeued:
+            logger.warning("Requeued %d orphaned indexing job(s)", requeued)
+
+    def _dispatch(self) -> None:
+        """Claim queued jobs while global, per-source and per-scope slots are free."""
+        self._ensure()
+        claimed = []
+        with self._lock:
+            with state_engine.begin() as conn:
+                self._requeue_orphans(conn)
+                busy = set(
+                    conn.execute(
+                        select(jobs_table.c.source, jobs_table.c.scope).where(jobs_table.c.status == "running")
+                    ).all()
+                )
+                running: Dict[str, int] = {}
+                for source, _ in busy:
+                    running[source] = running.get(source, 0) + 1
+                free = self.max_workers - len(busy)
+                if free <= 0:
+                    return
+                queued = conn.execute(
+                    select(jobs_table)
+                    .where(jobs_table.c.status == "queued")
+                    .order_by(jobs_table.c.created_at)
+                    .limit(100)
+                ).all()
+            for job in queued:
+                if free <= 0:
+                    break
+                if running.get(job.source, 0) >= self.per_source or (job.source, job.scope) in busy:
+                    continue
+                if not self._claim(job):
+                    continue  # claimed by another worker, or its scope started elsewhere
+                busy.add((job.source, job.scope))
+                running[job.source] = running.get(job.source, 0) + 1
+                free -= 1
+                claimed.append(job)
+        for job in claimed:
+            self._executor.submit(self._run, job.id, job.source, job.config, job.full)
+
+    def _claim(self, job) -> bool:
+        """Mark a queued job running unless another job of its scope already is."""
+        other = jobs_table.alias("other")
+        now = _now()
+        try:
+            with state_engine.begin() as conn:
+                taken = conn.execute(
+                    update(jobs_table)
+                    .where(
+                        jobs_table.c.id == job.id,
+                        jobs_table.c.status == "queued",
+                        ~exists().where(
+                            other.c.source == job.source, other.c.scope == job.scope, other.c.status == "running"
+                        ),
+                    )
+                    .values(
+                        status="running",
+                        worker=self.worker_id,
+                        attempts=job.attempts + 1,
+                        started_at=now,
+                        heartbeat_at=now,
+                        error=None,
+                    )
+                ).rowcount
+        except IntegrityError:
+            return False  # another worker claimed a job of the same scope concurrently
+        return taken == 1
+
+    def _update(self, job_id: str, **values) -> None:
+        with state_engine.begin() as conn:
+            conn.execute(update(jobs_table).where(jobs_table.c.id == job_id).values(**values))
+
+    def _run(self, job_id: str, source: str, config: dict, full: bool) -> None:
+        stats = IndexingStats()
+        done = threading.Event()
+
+        def heartbeat() -> None:
+            while not done.wait(settings.INDEX_JOB_HEARTBEAT_SEC):
+                try:
+                    self._update(job_id, progress=stats.as_dict(), heartbeat_at=_now())
+                except Exception:  # pragma: no cover - keep the job running
+                    logger.exception("Failed to record progress of indexing job %s", job_id)
+
+        beat = threading.Thread(target=heartbeat, name=f"index-job-{job_id}", daemon=True)
+        beat.start()
+        result, error = None, None
+        try:
+            result = sync_source(source, INGESTORS[source], config, full=full, stats=stats)
+        except Exception as ex:
+            logger.exception("Indexing job %s (%s) failed", job_id, source)
+            error = str(ex)
+        finally:
+            done.set()
+            beat.join()
+            # A failed job may still have committed part of its writes
+            if stats.written or stats.deleted:
+                try:
+                    invalidate_source(source)
+                except Exception:  # pragma: no cover - the job result still gets recorded
+                    logger.exception("Failed to invalidate caches of %s", source)
+        status = "failed" if error else "succeeded"
+        self._update(job_id, status=status, progress=stats.as_dict(), result=result, error=error, finished_at=_now())
+        self._dispatch()
+
+
+index_jobs = IndexJobQueue(settings.INDEX_JOB_WORKERS, settings.INDEX_JOB_PER_SOURCE)
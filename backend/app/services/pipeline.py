@@ -0,0 +1,121 @@
+"""Threaded stage pipelines and fan-in helpers connected by bounded queues."""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Any, Callable, Iterable, Iterator, List
+
+Stage = Callable[[Iterator[Any]], Iterable[Any]]
+
+_DONE = object()
+
+
+class _Failed:
+    def __init__(self, exc: BaseException) -> None:
+        self.exc = exc
+
+
+def run_pipeline(source: Iterable[Any], stages: List[Stage], maxsize: int = 8) -> Iterator[Any]:
+    """
+    Run `source` and each stage in its own thread and return an iterator
+    over the output of the last stage. A stage is a generator function that
+    consumes an iterator and yields results (it may batch, split or filter).
+    Stages are connected by queues of at most `maxsize` items, so a slow
+    stage applies back-pressure upstream and the number of in-flight items
+    is bounded regardless of how much the source produces. An exception in
+    any stage stops the pipeline and is re-raised to the consumer. Threads
+    run in a copy of the caller's context so context variables (e.g.
+    usage collectors) keep working inside stages.
+    """
+    stop = threading.Event()
+    queues = [queue.Queue(maxsize=maxsize) for _ in range(len(stages) + 1)]
+
+    def put(q: queue.Queue, item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def drain(q: queue.Queue) -> Iterator[Any]:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failed):
+                raise item.exc
+            yield item
+
+    def worker(items: Iterable[Any], out: queue.Queue) -> None:
+        try:
+            for item in items:
+                if not put(out, item):
+                    return
+            put(out, _DONE)
+        except BaseException as exc:  # propagate to the consumer
+            put(out, _Failed(exc))
+
+    # Stage generators are created here but only start running in their thread
+    inputs = [source] + [stage(drain(queues[i])) for i, stage in enumerate(stages)]
+    threads = [
+        threading.Thread(target=copy_context().run, args=(worker, items, out), daemon=True)
+        for items, out in zip(inputs, queues)
+    ]
+    for t in threads:
+        t.start()
+    try:
+        yield from drain(queues[-1])
+    finally:
+        stop.set()
+
+
+def merge_concurrently(producers: List[Callable[[], Iterable[Any]]], max_workers: int, maxsize: int = 8) -> Iterator[Any]:
+    """
+    Run each producer (a callable returning an iterable) on a pool of at
+    most `max_workers` threads and yield their items as they arrive, in no
+    particular order. At most `maxsize` items are buffered, so fast
+    producers wait for the consumer. The first exception raised by a
+    producer stops the others and is re-raised to the consumer.
+    """
+    if not producers:
+        return
+    stop = threading.Event()
+    out: queue.Queue = queue.Queue(maxsize=maxsize)
+
+    def put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(producer: Callable[[], Iterable[Any]]) -> None:
+        try:
+            for item in producer():
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as exc:  # propagate to the consumer
+            put(_Failed(exc))
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="merge")
+    for producer in producers:
+        executor.submit(copy_context().run, run, producer)
+    remaining = len(producers)
+    try:
+        while remaining:
+            item = out.get()
+            if item is _DONE:
+                remaining -= 1
+            elif isinstance(item, _Failed):
+                raise item.exc
+            else:
+                yield item
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -1,31 +1,82 @@
 """Factory functions for LlamaIndex query engines."""
 
+import asyncio
 from typing import List, Literal, Optional
 from llama_index.core.query_engine import RouterQueryEngine, CitationQueryEngine, SQLJoinQueryEngine
-from llama_index.core.indices.struct_store.sql_query import NLSQLTableQueryEngine
+from llama_index.core.query_engine.citation_query_engine import CITATION_QA_TEMPLATE, CITATION_REFINE_TEMPLATE
+from llama_index.core.indices.struct_store.sql_query import (
+    BaseSQLTableQueryEngine,
+    NLSQLTableQueryEngine,
+    SQLTableRetrieverQueryEngine,
+)
 from llama_index.core.indices.property_graph import TextToCypherRetriever
-from llama_index.core.response_synthesizers import ResponseMode
+from llama_index.core.response_synthesizers import ResponseMode, get_response_synthesizer
 from .retrieval import build_hybrid_retriever
+from .engine_pool import EngineKey, EnginePool
 from .ingestion.database import sql_registry
+from .sql_plans import PlanCachingRetriever
 from ..core.vectorstores import index_for_source
 from ..core.graph import get_neo4j_graph_store
 from ..core.config import settings
+from ..core.metrics import stage
 
 
-def vector_query_engine(sources: List[str], use_hybrid: bool):
+# Engines are expensive to build; reuse them across requests
+engine_pool = EnginePool(settings.ENGINE_POOL_SIZE)
+
+
+def _citation_engine(retriever) -> CitationQueryEngine:
+    """
+    CitationQueryEngine over any retriever with compact responses;
+    `CitationQueryEngine.from_args` requires an index.
+    """
+    synthesizer = get_response_synthesizer(
+        response_mode=ResponseMode.COMPACT,
+        text_qa_template=CITATION_QA_TEMPLATE,
+        refine_template=CITATION_REFINE_TEMPLATE,
+    )
+    return CitationQueryEngine(retriever=retriever, response_synthesizer=synthesizer)
+
+
+def vector_query_engine(sources: List[str], use_hybrid: bool, top_k: Optional[int] = None):
     """
     Build a CitationQueryEngine that retrieves from the configured vector store
     using optionally hybrid retrieval (dense + sparse). Returns an engine
     configured for compact responses with citations.
     """
-    retriever = build_hybrid_retriever(sources, use_hybrid)
-    return CitationQueryEngine.from_args(retriever=retriever, response_mode=ResponseMode.COMPACT)
+    retriever = build_hybrid_retriever(sources, use_hybrid, top_k)
+    return _citation_engine(retriever)
+
+
+def sql_query_engine(db_name: str) -> BaseSQLTableQueryEngine:
+    """
+    Instantiate an NL SQL query engine for a registered database from its
+    cached schema. Small databases put every table in the prompt; larger
+    ones retrieve the SQL_TABLE_TOP_K tables most similar to the question
+    from the precomputed table index. Generated SQL goes through the plan
+    cache.
+    """
+    schema = sql_registry.schema(db_name)
+    if schema.object_index is None:
+        engine = NLSQLTableQueryEngine(schema.sqldb, context_query_kwargs=schema.descriptions)
+    else:
+        retriever = schema.object_index.as_retriever(similarity_top_k=settings.SQL_TABLE_TOP_K)
+        engine = SQLTableRetrieverQueryEngine(schema.sqldb, retriever)
+    # Reuse SQL generated earlier for the same question and schema
+    engine._sql_retriever = PlanCachingRetriever(engine._sql_retriever, db_name, schema.fingerprint)
+    return engine
+
+
+class _TimedCypherRetriever(TextToCypherRetriever):
+    """Records Cypher generation and execution as the "cypher" stage."""
 
+    def retrieve_from_graph(self, query_bundle):
+        with stage("cypher"):
+            return super().retrieve_from_graph(query_bundle)
 
-def sql_query_engine(db_name: str) -> NLSQLTableQueryEngine:
-    """Instantiate an NL SQL query engine for a registered database."""
-    sqldb = sql_registry.get(db_name)
-    return NLSQLTableQueryEngine(sqldb)
+    async def aretrieve_from_graph(self, query_bundle):
+        with stage("cypher"):
+            return await super().aretrieve_from_graph(query_bundle)
 
 
 def kg_query_engine():
@@ -33,18 +84,19 @@ def kg_query_engine():
     if not settings.ENABLE_KG:
         return None
     graph = get_neo4j_graph_store()
-    retriever = TextToCypherRetriever(graph_store=graph)
-    return CitationQueryEngine.from_args(retriever=retriever, response_mode=ResponseMode.COMPACT)
+    retriever = _TimedCypherRetriever(graph_store=graph)
+    return _citation_engine(retriever)
 
 
-def router_engine(
+def build_router_engine(
     scope: Literal["sql", "vector", "all", "kg"],
     sources: List[str],
     use_hybrid: bool,
     db_name: Optional[str] = None,
+    top_k: Optional[int] = None,
 ):
     """
-    Select and return an appropriate query engine based on the given scope.
+    Select and build an appropriate query engine based on the given scope.
     - "sql": use the NL SQL query engine for the given database
     - "vector": use the vector query engine for selected sources
     - "kg": use the knowledge graph engine if enabled, otherwise fall back to vector
@@ -56,17 +108,64 @@ def router_engine(
             raise ValueError("db_name must be provided when scope='sql'")
         return sql_query_engine(db_name)
     if scope == "vector":
-        return vector_query_engine(sources, use_hybrid)
+        return vector_query_engine(sources, use_hybrid, top_k)
     if scope == "kg":
         eng = kg_query_engine()
-        return eng or vector_query_engine(sources, use_hybrid)
+        return eng or vector_query_engine(sources, use_hybrid, top_k)
 
     # "all" – combine SQL and vector results
-    if sql_registry.engines:
+    registered = sql_registry.names()
+    if registered:
         # Use the first registered DB if none specified
-        db = db_name or next(iter(sql_registry.engines))
+        db = db_name or registered[0]
         sql_eng = sql_query_engine(db)
-        vec_eng = vector_query_engine(sources, use_hybrid)
+        vec_eng = vector_query_engine(sources, use_hybrid, top_k)
         return SQLJoinQueryEngine(sql_query_engine=sql_eng, other_query_engine=vec_eng)
     # No DB registered; fallback to vector
-    return vector_query_engine(sources, use_hybrid)
\ No newline at end of file
+    return vector_query_engine(sources, use_hybrid, top_k)
+
+
+def router_engine(
+    scope: Literal["sql", "vector", "all", "kg"],
+    sources: List[str],
+    use_hybrid: bool,
+    db_name: Optional[str] = None,
+    top_k: Optional[int] = None,
+):
+    """
+    Return a pooled query engine for the given configuration, building it
+    with `build_router_engine` on first use. Parameters that do not affect
+    the engine (sources and hybrid for SQL) are normalised out of the key so
+    equivalent requests share one engine.
+    """
+    top_k = min(top_k or settings.MAX_TOP_K, settings.MAX_TOP_K)
+    if scope in ("sql", "all"):
+        # Picks up databases registered or refreshed on other workers; stale
+        # copies are dropped together with the engines pooled from them
+        sql_registry.names()
+    if scope == "sql":
+        key = EngineKey(scope, (), False, db_name, None)
+    else:
+        key = EngineKey(scope, tuple(sorted(set(sources))), use_hybrid, db_name, top_k)
+
+    def build():
+        with stage("engine_build", scope):
+            return build_router_engine(scope, list(key.sources), use_hybrid, db_name, top_k)
+
+    return engine_pool.get_or_create(key, build)
+
+
+# Engines whose async path still runs SQL through a synchronous SQLAlchemy engine
+_SYNC_ONLY_ENGINES = (BaseSQLTableQueryEngine, SQLJoinQueryEngine)
+
+
+async def aquery(qe, query: str):
+    """
+    Run `query` on an engine without blocking the event loop. Vector and KG
+    engines use their native `aquery` (async embeddings, LLM and asyncpg).
+    SQL-backed engines execute statements synchronously even from `aquery`,
+    so they are run in a worker thread instead.
+    """
+    if isinstance(qe, _SYNC_ONLY_ENGINES):
+        return await asyncio.to_thread(qe.query, query)
+    return await qe.aquery(query)
@@ -1,33 +1,313 @@
 """Assembly of retrieval pipelines for hybrid search."""
 
-from typing import List
-from llama_index.core import VectorStoreIndex
-from llama_index.core.retrievers import BM25Retriever, QueryFusionRetriever
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+from llama_index.core import VectorStoreIndex, QueryBundle, Settings as LlamaSettings
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore
+from llama_index.core.vector_stores.types import VectorStoreQuery, VectorStoreQueryMode
 from ..core.vectorstores import index_for_source
 from ..core.config import settings
+from ..core.cache import cache_key, retrieval_cache
+from ..core.logging import logger
+from ..core.metrics import observe_stage, stage
 
 
-def get_vector_retrievers(sources: List[str]) -> List:
-    """Return a list of default vector retrievers for each source."""
-    retrievers = []
+_pools: Dict[str, ThreadPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool(source: str) -> ThreadPoolExecutor:
+    """
+    Bounded worker pool of one source. Threads cannot be interrupted, so a
+    lookup that misses its deadline keeps its worker until it returns; with
+    a pool per source a slow source only holds up its own lookups. Lookups
+    wait in the pool's queue while every worker is busy and are cancelled
+    if their deadline passes before a worker picks them up.
+    """
+    with _pools_lock:
+        if source not in _pools:
+            _pools[source] = ThreadPoolExecutor(
+                max_workers=settings.RETRIEVAL_WORKERS_PER_SOURCE, thread_name_prefix=f"retrieval-{source}"
+            )
+        return _pools[source]
+
+
+# Report of the retrieval running in the current request, if one is collected
+_current_report: ContextVar[Optional["RetrievalReport"]] = ContextVar("retrieval_report", default=None)
+
+
+def _parse_source_timeouts(raw: str) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for item in raw.split(","):
+        if "=" in item:
+            src, sec = item.split("=", 1)
+            out[src.strip()] = float(sec)
+    return out
+
+
+_source_timeouts = _parse_source_timeouts(settings.RETRIEVAL_SOURCE_TIMEOUTS)
+
+
+def source_timeout(source: str) -> float:
+    """Return the retrieval deadline in seconds for a source."""
+    return _source_timeouts.get(source, settings.RETRIEVAL_SOURCE_TIMEOUT_SEC)
+
+
+class RetrievalReport:
+    """Per-source timings and dropped sources of one retrieval."""
+
+    def __init__(self) -> None:
+        self.sources: Dict[str, dict] = {}
+
+    def record(self, source: str, kind: str, elapsed_ms: float, status: str) -> None:
+        entry = self.sources.setdefault(source, {"timed_out": False, "saturated": False, "failed": False})
+        entry[f"{kind}_ms"] = round(elapsed_ms, 1)
+        if status == "cached":
+            entry[f"{kind}_cached"] = True
+        elif status == "timeout":
+            entry["timed_out"] = True
+        elif status == "saturated":
+            # Waited out the deadline for a worker of the source; the lookup never ran
+            entry["saturated"] = True
+        elif status == "error":
+            entry["failed"] = True
+
+    def source_ms(self, source: str | None) -> float | None:
+        """Total wall time spent on a source (max over its lookups)."""
+        entry = self.sources.get(source or "")
+        if not entry:
+            return None
+        times = [v for k, v in entry.items() if k.endswith("_ms")]
+        return max(times) if times else None
+
+    @property
+    def dropped(self) -> List[str]:
+        return [s for s, e in self.sources.items() if e["timed_out"] or e["saturated"] or e["failed"]]
+
+    def as_dict(self) -> dict:
+        return {"sources": self.sources, "dropped": self.dropped, "partial": bool(self.dropped)}
+
+
+@contextmanager
+def retrieval_report() -> Iterator[RetrievalReport]:
+    """Collect per-source retrieval timings for queries run inside the block."""
+    report = RetrievalReport()
+    token = _current_report.set(report)
+    try:
+        yield report
+    finally:
+        _current_report.reset(token)
+
+
+class SparseRetriever(BaseRetriever):
+    """
+    Full-text retriever over a collection's persistent `tsvector` index. The
+    lookup is a single ranked GIN query in Postgres and, unlike the dense
+    retriever, never embeds the query.
+    """
+
+    def __init__(self, index: VectorStoreIndex, top_k: int) -> None:
+        super().__init__()
+        self._vector_store = index.vector_store
+        self._top_k = top_k
+
+    def _query(self, query_bundle: QueryBundle) -> VectorStoreQuery:
+        return VectorStoreQuery(
+            query_str=query_bundle.query_str,
+            mode=VectorStoreQueryMode.SPARSE,
+            similarity_top_k=self._top_k,
+            sparse_top_k=self._top_k,
+        )
+
+    @staticmethod
+    def _to_nodes(result) -> List[NodeWithScore]:
+        sims = result.similarities or [None] * len(result.nodes or [])
+        return [NodeWithScore(node=n, score=s) for n, s in zip(result.nodes or [], sims)]
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        return self._to_nodes(self._vector_store.query(self._query(query_bundle)))
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        return self._to_nodes(await self._vector_store.aquery(self._query(query_bundle)))
+
+
+class FanOutRetriever(BaseRetriever):
+    """
+    Run one retriever per (source, kind) concurrently and fuse the results.
+    Every source gets its own deadline measured from the start of the
+    query; lookups that miss it (or fail) are dropped from the answer and
+    flagged in the current `RetrievalReport` instead of stalling the
+    request. Synchronous lookups run on the source's worker pool and queue
+    while it is busy; one still queued at the deadline is reported as
+    "saturated" rather than timed out. Results are fused with reciprocal rank fusion when `mode` is
+    "reciprocal_rerank", otherwise by best score per node. Per-source results
+    are kept in the shared retrieval cache, tagged by source so that
+    re-indexing a source invalidates them. The query is embedded at most
+    once per call and the vector is shared by every dense lookup.
+    """
+
+    def __init__(
+        self,
+        retrievers: List[Tuple[str, str, BaseRetriever]],
+        top_k: int,
+        mode: str = "simple",
+    ) -> None:
+        super().__init__()
+        self._retrievers = retrievers
+        self._top_k = top_k
+        self._mode = mode
+
+    def _fuse(self, results: List[List[NodeWithScore]]) -> List[NodeWithScore]:
+        scores: Dict[str, float] = {}
+        nodes: Dict[str, NodeWithScore] = {}
+        for result in results:
+            ranked = sorted(result, key=lambda n: n.score or 0.0, reverse=True)
+            for rank, n in enumerate(ranked):
+                key = n.node.node_id
+                nodes.setdefault(key, n)
+                if self._mode == "reciprocal_rerank":
+                    # k=60 as in the original RRF paper
+                    scores[key] = scores.get(key, 0.0) + 1.0 / (rank + 60.0)
+                else:
+                    scores[key] = max(scores.get(key, float("-inf")), n.score or 0.0)
+        fused = []
+        for key, score in sorted(scores.items(), key=lambda x: x[1], reverse=True)[: self._top_k]:
+            fused.append(NodeWithScore(node=nodes[key].node, score=score))
+        return fused
+
+    def _record(self, source: str, kind: str, elapsed_ms: float, status: str) -> None:
+        report = _current_report.get()
+        if report is not None:
+            report.record(source, kind, elapsed_ms, status)
+        observe_stage("retrieval", elapsed_ms / 1000, f"{source}/{kind}", status)
+        if status in ("timeout", "saturated", "error"):
+            logger.warning("Retrieval %s/%s %s after %.0f ms", source, kind, status, elapsed_ms)
+
+    def _cache_key(self, src: str, kind: str, query_bundle: QueryBundle) -> str:
+        return cache_key(src, kind, self._top_k, query_bundle.query_str)
+
+    def _store(self, key: str, src: str, nodes: List[NodeWithScore]) -> None:
+        retrieval_cache.set(key, nodes, tags=(f"source:{src}",))
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        start = time.perf_counter()
+
+        def timed(retriever: BaseRetriever, bundle: QueryBundle):
+            t0 = time.perf_counter()
+            nodes = retriever.retrieve(bundle)
+            return nodes, (time.perf_counter() - t0) * 1000
+
+        results = []
+        pending = []
+        for src, kind, r in self._retrievers:
+            key = self._cache_key(src, kind, query_bundle)
+            cached = retrieval_cache.get(key)
+            if cached is not None:
+                self._record(src, kind, 0.0, "cached")
+                results.append(cached)
+            else:
+                pending.append((src, kind, key, r))
+        if query_bundle.embedding is None and any(kind == "dense" for _, kind, _, _ in pending):
+            with stage("query_embedding"):
+                query_bundle = QueryBundle(
+                    query_str=query_bundle.query_str,
+                    embedding=LlamaSettings.embed_model.get_agg_embedding_from_queries(query_bundle.embedding_strs),
+                )
+        futures = [(src, kind, key, _pool(src).submit(timed, r, query_bundle)) for src, kind, key, r in pending]
+        for src, kind, key, fut in futures:
+            remaining = source_timeout(src) - (time.perf_counter() - start)
+            try:
+                nodes, elapsed_ms = fut.result(timeout=max(remaining, 0))
+            except FutureTimeout:
+                # Cancelling only succeeds while the lookup still waits for a worker
+                status = "saturated" if fut.cancel() else "timeout"
+                self._record(src, kind, (time.perf_counter() - start) * 1000, status)
+                continue
+            except Exception:
+                logger.exception("Retrieval from %s/%s failed", src, kind)
+                self._record(src, kind, (time.perf_counter() - start) * 1000, "error")
+                continue
+            self._record(src, kind, elapsed_ms, "ok")
+            self._store(key, src, nodes)
+            results.append(nodes)
+        with stage("fusion"):
+            return self._fuse(results)
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        cached_results = {}
+        for src, kind, _ in self._retrievers:
+            cached = retrieval_cache.get(self._cache_key(src, kind, query_bundle))
+            if cached is not None:
+                cached_results[(src, kind)] = cached
+        needs_embedding = any(
+            kind == "dense" and (src, kind) not in cached_results for src, kind, _ in self._retrievers
+        )
+        if query_bundle.embedding is None and needs_embedding:
+            with stage("query_embedding"):
+                query_bundle = QueryBundle(
+                    query_str=query_bundle.query_str,
+                    embedding=await LlamaSettings.embed_model.aget_agg_embedding_from_queries(
+                        query_bundle.embedding_strs
+                    ),
+                )
+
+        async def timed(src: str, kind: str, retriever: BaseRetriever):
+            key = self._cache_key(src, kind, query_bundle)
+            if (src, kind) in cached_results:
+                self._record(src, kind, 0.0, "cached")
+                return cached_results[(src, kind)]
+            t0 = time.perf_counter()
+            try:
+                nodes = await asyncio.wait_for(retriever.aretrieve(query_bundle), source_timeout(src))
+            except asyncio.TimeoutError:
+                self._record(src, kind, (time.perf_counter() - t0) * 1000, "timeout")
+                return []
+            except Exception:
+                logger.exception("Retrieval from %s/%s failed", src, kind)
+                self._record(src, kind, (time.perf_counter() - t0) * 1000, "error")
+                return []
+            self._record(src, kind, (time.perf_counter() - t0) * 1000, "ok")
+            self._store(key, src, nodes)
+            return nodes
+
+        results = await asyncio.gather(*(timed(src, kind, r) for src, kind, r in self._retrievers))
+        with stage("fusion"):
+            return self._fuse(list(results))
+
+
+def get_vector_retrievers(
+    sources: List[str], top_k: Optional[int] = None, use_hybrid: bool = False
+) -> List[Tuple[str, str, BaseRetriever]]:
+    """
+    Return `(source, kind, retriever)` entries: a dense vector retriever for
+    each source, plus a sparse retriever per source when `use_hybrid` is set.
+    """
+    top_k = top_k or settings.MAX_TOP_K
+    entries: List[Tuple[str, str, BaseRetriever]] = []
     for src in sources:
         idx: VectorStoreIndex = index_for_source(src)
-        retrievers.append(idx.as_retriever(similarity_top_k=settings.MAX_TOP_K))
-    return retrievers
+        entries.append((src, "dense", idx.as_retriever(similarity_top_k=top_k)))
+        if use_hybrid:
+            # Add a sparse retriever per index to capture lexical matches
+            entries.append((src, "sparse", SparseRetriever(idx, top_k)))
+    return entries
 
 
-def build_hybrid_retriever(sources: List[str], use_hybrid: bool):
+def build_hybrid_retriever(sources: List[str], use_hybrid: bool, top_k: Optional[int] = None):
     """
-    Create a fusion retriever which optionally fuses dense and sparse search.
-    If `use_hybrid` is True, a BM25 retriever is added for each index and
-    results are fused using reciprocal rank fusion. Otherwise only the
-    vector retrievers are used.
+    Create a fan-out retriever which optionally fuses dense and sparse search.
+    All per-source lookups run concurrently under per-source deadlines. If
+    `use_hybrid` is True, a full-text retriever backed by the collection's
+    persistent sparse index is added for each source and results are fused
+    using reciprocal rank fusion. Otherwise only the vector retrievers are
+    used.
     """
-    retrievers = get_vector_retrievers(sources)
-    if use_hybrid:
-        # Add a BM25 retriever per index to capture lexical matches
-        for src in sources:
-            idx = index_for_source(src)
-            retrievers.append(BM25Retriever.from_defaults(index=idx))
-        return QueryFusionRetriever(retrievers=retrievers, num_queries=1, mode="reciprocal_rerank")
-    return QueryFusionRetriever(retrievers=retrievers, num_queries=1, mode="simple")
\ No newline at end of file
+    retrievers = get_vector_retrievers(sources, top_k, use_hybrid)
+    mode = "reciprocal_rerank" if use_hybrid else "simple"
+    return FanOutRetriever(retrievers, top_k or settings.MAX_TOP_K, mode=mode)
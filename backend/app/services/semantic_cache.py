@@ -0,0 +1,154 @@
+"""Semantic answer cache matching new questions against past ones by embedding."""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+from ..core.config import settings
+
+
+class ScopeKey(NamedTuple):
+    """Answers are only reused between requests with the same scope key."""
+
+    scope: str
+    sources: Tuple[str, ...]
+    db_name: Optional[str]
+
+
+class _Entry(NamedTuple):
+    query: str
+    embedding: np.ndarray
+    scope_key: ScopeKey
+    payload: Dict[str, Any]
+    expires_at: float
+
+
+class _Bucket:
+    """Entries sharing a scope key plus a lazily rebuilt embedding matrix."""
+
+    def __init__(self) -> None:
+        self.ids: List[int] = []
+        self.matrix: Optional[np.ndarray] = None
+
+    def add(self, entry_id: int) -> None:
+        self.ids.append(entry_id)
+        self.matrix = None
+
+    def remove(self, entry_id: int) -> None:
+        self.ids.remove(entry_id)
+        self.matrix = None
+
+
+def _normalise(embedding: List[float]) -> np.ndarray:
+    vec = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+class SemanticCache:
+    """
+    Bounded LRU of past answers keyed by query embedding. A lookup returns
+    the cached answer of the most similar past query with the same scope,
+    sources and database if its cosine similarity reaches `threshold`.
+    Entries expire after `ttl_sec` and are dropped when a source they were
+    answered from is re-indexed.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 1000, ttl_sec: float = 3600) -> None:
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl_sec
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._buckets: Dict[ScopeKey, _Bucket] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _drop(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        bucket = self._buckets[entry.scope_key]
+        bucket.remove(entry_id)
+        if not bucket.ids:
+            del self._buckets[entry.scope_key]
+
+    def lookup(self, embedding: List[float], scope_key: ScopeKey) -> Optional[Tuple[Dict[str, Any], str, float]]:
+        """Return `(payload, matched_query, similarity)` for the best match, or None."""
+        vec = _normalise(embedding)
+        now = time.time()
+        with self._lock:
+            bucket = self._buckets.get(scope_key)
+            if bucket is not None:
+                for entry_id in [i for i in bucket.ids if self._entries[i].expires_at <= now]:
+                    self._drop(entry_id)
+                bucket = self._buckets.get(scope_key)
+            if bucket is None:
+                self.misses += 1
+                return None
+            if bucket.matrix is None:
+                bucket.matrix = np.stack([self._entries[i].embedding for i in bucket.ids])
+            sims = bucket.matrix @ vec
+            best = int(np.argmax(sims))
+            similarity = float(sims[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None
+            entry_id = bucket.ids[best]
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            entry = self._entries[entry_id]
+            return entry.payload, entry.query, similarity
+
+    def store(self, query: str, embedding: List[float], scope_key: ScopeKey, payload: Dict[str, Any]) -> None:
+        entry = _Entry(query, _normalise(embedding), scope_key, payload, time.time() + self.ttl)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            self._buckets.setdefault(scope_key, _Bucket()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, source: str | None = None, db_name: str | None = None) -> int:
+        """
+        Drop answers derived from a source or a registered database. Answers
+        of scope "sql"/"all" without an explicit database are dropped on any
+        database change. Returns the number of entries removed.
+        """
+        with self._lock:
+            stale = [
+                i
+                for i, e in self._entries.items()
+                if (source is not None and source in e.scope_key.sources)
+                or (
+                    db_name is not None
+                    and e.scope_key.scope in ("sql", "all")
+                    and e.scope_key.db_name in (db_name, None)
+                )
+            ]
+            for i in stale:
+                self._drop(i)
+            return len(stale)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+            }
+
+
+semantic_cache = SemanticCache(
+    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+    max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+    ttl_sec=settings.SEMANTIC_CACHE_TTL_SEC,
+)
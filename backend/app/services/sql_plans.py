@@ -0,0 +1,170 @@
+"""Cache of generated SQL keyed by question, database and schema fingerprint."""
+
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from llama_index.core import Settings as LlamaSettings
+from llama_index.core.indices.struct_store.sql_retriever import NLSQLRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from .semantic_cache import ScopeKey, SemanticCache
+from ..core.cache import cache_key, get_cache
+from ..core.config import settings
+from ..core.logging import logger
+from ..core.metrics import stage
+
+
+def normalize_question(question: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r"\s+", " ", question).strip().rstrip("?.!; ").casefold()
+
+
+class SQLPlanCache:
+    """
+    Text-to-SQL results keyed by normalized question, database and the
+    fingerprint of its reflected schema, persisted in a local SQLite file
+    so they survive restarts. A schema change alters the fingerprint, so
+    plans generated against the old schema are never reused. With
+    `semantic=True` a question without an exact match may also reuse the
+    plan of a past question whose embedding is at least `threshold`
+    similar (off by default: "sales in 2023" and "sales in 2024" embed
+    almost identically).
+    """
+
+    def __init__(self, ttl_sec: float, semantic: bool, threshold: float, max_entries: int) -> None:
+        self._cache = get_cache("sql_plans", ttl_sec=ttl_sec, max_entries=max_entries, persist=True)
+        self._semantic: Optional[SemanticCache] = None
+        if semantic:
+            self._semantic = SemanticCache(threshold=threshold, max_entries=max_entries, ttl_sec=ttl_sec)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def lookup(self, db_name: str, fingerprint: str, question: str) -> Tuple[Optional[str], Optional[List[float]]]:
+        """Return `(sql, query_embedding)`; the embedding is reused by `store` on a miss."""
+        sql = self._cache.get(cache_key(db_name, fingerprint, normalize_question(question)))
+        if sql is not None:
+            self._count("hits")
+            return sql, None
+        embedding = None
+        if self._semantic is not None:
+            embedding = LlamaSettings.embed_model.get_query_embedding(question)
+            match = self._semantic.lookup(embedding, ScopeKey("sql_plan", (fingerprint,), db_name))
+            if match is not None:
+                self._count("semantic_hits")
+                return match[0]["sql"], embedding
+        self._count("misses")
+        return None, embedding
+
+    def store(
+        self, db_name: str, fingerprint: str, question: str, sql: str, embedding: Optional[List[float]] = None
+    ) -> None:
+        key = cache_key(db_name, fingerprint, normalize_question(question))
+        self._cache.set(key, sql, tags=(f"schema:{fingerprint}",))
+        if self._semantic is not None and embedding is not None:
+            self._semantic.store(question, embedding, ScopeKey("sql_plan", (fingerprint,), db_name), {"sql": sql})
+
+    def invalidate(self, fingerprint: str) -> None:
+        """Drop plans generated against a schema that no longer exists."""
+        self._cache.invalidate_tag(f"schema:{fingerprint}")
+        if self._semantic is not None:
+            self._semantic.invalidate(source=fingerprint)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits + self.semantic_hits) / lookups, 4) if lookups else None,
+                "cache": self._cache.stats(),
+                "semantic": self._semantic.stats() if self._semantic is not None else None,
+            }
+
+
+sql_plans = SQLPlanCache(
+    ttl_sec=settings.SQL_PLAN_CACHE_TTL_SEC,
+    semantic=settings.SQL_PLAN_SEMANTIC,
+    threshold=settings.SQL_PLAN_SEMANTIC_THRESHOLD,
+    max_entries=settings.SQL_PLAN_CACHE_MAX_ENTRIES,
+)
+
+
+class PlanCachingRetriever:
+    """
+    Wraps the NLSQLRetriever of a text-to-SQL engine. On a plan cache hit
+    the cached SQL is executed directly, skipping the LLM round trip; the
+    result carries the same `sql_query` metadata as a generated plan. Only
+    plans that executed successfully are cached. The whole step is timed as
+    the "sql_plan" stage; its LLM call and statement are also recorded as
+    "llm" (target sql_plan) and "sql_execute".
+    """
+
+    def __init__(self, inner: NLSQLRetriever, db_name: str, fingerprint: str) -> None:
+        self._inner = inner
+        self._db_name = db_name
+        self._fingerprint = fingerprint
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+    def generate_sql(self, question: str) -> str:
+        """Return the SQL for `question` (cached or generated) without executing it."""
+        with stage("sql_plan", self._db_name) as timing:
+            sql, _ = sql_plans.lookup(self._db_name, self._fingerprint, question)
+            if sql is not None:
+                timing.status = "cached"
+                return sql
+            inner, bundle = self._inner, QueryBundle(question)
+            response = inner._llm.predict(
+                inner._text_to_sql_prompt,
+                query_str=question,
+                schema=inner._get_table_context(bundle),
+                dialect=inner._sql_database.dialect,
+            )
+            return inner._sql_parser.parse_response_to_sql(response, bundle)
+
+    def _execute(self, sql: str) -> Tuple[List[NodeWithScore], Dict]:
+        nodes, metadata = self._inner._sql_retriever.retrieve_with_metadata(sql)
+        return nodes, {"sql_query": sql, **metadata}
+
+    def _remember(self, question: str, metadata: Dict, embedding: Optional[List[float]]) -> None:
+        sql = metadata.get("sql_query")
+        # Failed statements come back as an error node without a result
+        if sql and "result" in metadata:
+            sql_plans.store(self._db_name, self._fingerprint, question, sql, embedding)
+
+    def retrieve_with_metadata(self, str_or_query_bundle) -> Tuple[List[NodeWithScore], Dict]:
+        bundle = QueryBundle(str_or_query_bundle) if isinstance(str_or_query_bundle, str) else str_or_query_bundle
+        with stage("sql_plan", self._db_name) as timing:
+            sql, embedding = sql_plans.lookup(self._db_name, self._fingerprint, bundle.query_str)
+            if sql is not None:
+                try:
+                    timing.status = "cached"
+                    return self._execute(sql)
+                except Exception:
+                    timing.status = "ok"
+                    logger.warning("Cached SQL plan failed on %s; regenerating", self._db_name, exc_info=True)
+            nodes, metadata = self._inner.retrieve_with_metadata(bundle)
+        self._remember(bundle.query_str, metadata, embedding)
+        return nodes, metadata
+
+    async def aretrieve_with_metadata(self, str_or_query_bundle) -> Tuple[List[NodeWithScore], Dict]:
+        bundle = QueryBundle(str_or_query_bundle) if isinstance(str_or_query_bundle, str) else str_or_query_bundle
+        with stage("sql_plan", self._db_name) as timing:
+            sql, embedding = sql_plans.lookup(self._db_name, self._fingerprint, bundle.query_str)
+            if sql is not None:
+                try:
+                    timing.status = "cached"
+                    return self._execute(sql)
+                except Exception:
+                    timing.status = "ok"
+                    logger.warning("Cached SQL plan failed on %s; regenerating", self._db_name, exc_info=True)
+            nodes, metadata = await self._inner.aretrieve_with_metadata(bundle)
+        self._remember(bundle.query_str, metadata, embedding)
+        return nodes, metadata
@@ -0,0 +1,111 @@
+"""Cache of SQL query results stored as Parquet, invalidated per table."""
+
+import io
+import re
+from typing import Iterable, List, NamedTuple, Optional
+import pyarrow as pa
+import pyarrow.parquet as pq
+from ..core.cache import cache_key, get_cache
+from ..core.config import settings
+from ..core.logging import logger
+
+# Quoted literals and identifiers are kept verbatim by `canonical_sql`
+_QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+
+
+def canonical_sql(sql: str) -> str:
+    """Collapse whitespace, case-fold keywords and identifiers and drop the trailing semicolon."""
+    parts = _QUOTED.split(sql.strip().rstrip(";").strip())
+    return "".join(p if i % 2 else re.sub(r"\s+", " ", p).casefold() for i, p in enumerate(parts))
+
+
+def referenced_tables(sql: str, tables: Iterable[str]) -> List[str]:
+    """Names from `tables` that occur as identifiers in `sql`."""
+    lowered = sql.casefold()
+    return [t for t in tables if re.search(rf"(?<![\w$]){re.escape(t.casefold())}(?![\w$])", lowered)]
+
+
+def result_tags(db_name: str, sql: Optional[str], tables: Iterable[str]) -> List[str]:
+    """
+    Cache tags for anything derived from running `sql` on `db_name` (result
+    rows, answers): the database and every registered table the statement
+    mentions. Without the statement it may have read any table.
+    """
+    if sql is None:
+        return [f"db:{db_name}", f"table:{db_name}:*"]
+    return [f"db:{db_name}"] + [f"table:{db_name}:{t.casefold()}" for t in referenced_tables(sql, tables)]
+
+
+def invalidation_tags(db_name: str, table: Optional[str] = None) -> List[str]:
+    """
+    Tags to drop after `table` (or the whole database) changed, including
+    answers that do not know their tables or were not given a database.
+    """
+    if table is None:
+        return [f"db:{db_name}", "db:*"]
+    return [f"table:{db_name}:{table.casefold()}", f"table:{db_name}:*", "db:*"]
+
+
+class CachedResult(NamedTuple):
+    columns: List[str]
+    rows: List[tuple]
+    truncated: bool
+
+
+def _to_parquet(columns: List[str], rows: List[tuple]) -> bytes:
+    # Positional field names: result sets of joins may repeat column names
+    arrays = [pa.array([row[i] for row in rows]) for i in range(len(columns))]
+    buf = io.BytesIO()
+    table = pa.Table.from_arrays(arrays, names=[f"c{i}" for i in range(len(columns))])
+    pq.write_table(table, buf, compression="zstd")
+    return buf.getvalue()
+
+
+def _from_parquet(blob: bytes) -> List[tuple]:
+    table = pq.ParquetFile(io.BytesIO(blob)).read()
+    return list(zip(*(c.to_pylist() for c in table.columns)))
+
+
+class SQLResultCache:
+    """
+    Results of executed SQL keyed by database and canonicalized statement.
+    Rows are stored column-wise as zstd-compressed Parquet in a persistent
+    cache namespace (a SQLite file in CACHE_DIR) and expire after the TTL.
+    Entries carry the `result_tags` of their statement, so dropping the
+    `invalidation_tags` of a changed table removes exactly the results that
+    read it.
+    """
+
+    def __init__(self, enabled: bool, ttl_sec: float, max_bytes: int) -> None:
+        self.enabled = enabled
+        self._cache = get_cache("sql_results", ttl_sec=ttl_sec, max_bytes=max_bytes, persist=True)
+
+    def get(self, db_name: str, sql: str) -> Optional[CachedResult]:
+        if not self.enabled:
+            return None
+        entry = self._cache.get(cache_key(db_name, canonical_sql(sql)))
+        if entry is None:
+            return None
+        blob, columns, truncated = entry
+        return CachedResult(columns, _from_parquet(blob), truncated)
+
+    def set(
+        self, db_name: str, sql: str, tables: Iterable[str], columns: List[str], rows: List[tuple], truncated: bool
+    ) -> None:
+        if not self.enabled:
+            return
+        try:
+            blob = _to_parquet(columns, rows)
+        except (pa.ArrowException, ValueError, TypeError):
+            # Columns mixing incompatible Python types have no Arrow type
+            logger.debug("SQL result on %s not cacheable as Parquet", db_name, exc_info=True)
+            return
+        tags = result_tags(db_name, sql, tables)
+        self._cache.set(cache_key(db_name, canonical_sql(sql)), (blob, columns, truncated), tags=tags)
+
+
+sql_results = SQLResultCache(
+    enabled=settings.SQL_RESULT_CACHE_ENABLED,
+    ttl_sec=settings.SQL_RESULT_CACHE_TTL_SEC,
+    max_bytes=settings.SQL_RESULT_CACHE_MAX_BYTES,
+)
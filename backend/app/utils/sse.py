@@ -1,22 +1,43 @@
 """Utilities to generate server‑sent events for streaming responses."""
 
+import json
+from typing import Callable, Optional
 from fastapi.responses import StreamingResponse
 
 
-def sse_event(data: str) -> bytes:
-    """Format a single SSE data event."""
-    return f"data: {data}\n\n".encode("utf-8")
+def sse_event(data: str, event: Optional[str] = None) -> bytes:
+    """Format a single SSE data event, optionally with an event name."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {data}\n\n".encode("utf-8")
 
 
-def stream_tokens(generator):
+def stream_tokens(generator, trailer: Optional[Callable[[], dict]] = None):
     """
     Wrap a token generator into a StreamingResponse. Yields each token as
-    an SSE event and finally sends an [END] marker.
+    an SSE event and finally sends an [END] marker. Accepts both sync and
+    async generators; async ones are consumed on the event loop without
+    tying up a threadpool worker. If given, `trailer()` is sent as a JSON
+    `artifacts` event once the tokens are exhausted.
     """
 
+    def end():
+        if trailer is not None:
+            yield sse_event(json.dumps(trailer(), default=str), event="artifacts")
+        yield sse_event("[END]")
+
+    if hasattr(generator, "__aiter__"):
+
+        async def aiter_stream():
+            async for token in generator:
+                yield sse_event(token)
+            for event in end():
+                yield event
+
+        return StreamingResponse(aiter_stream(), media_type="text/event-stream")
+
     def iter_stream():
         for token in generator:
             yield sse_event(token)
-        yield sse_event("[END]")
+        yield from end()
 
-    return StreamingResponse(iter_stream(), media_type="text/event-stream")
\ No newline at end of file
+    return StreamingResponse(iter_stream(), media_type="text/event-stream")
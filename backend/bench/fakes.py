@@ -0,0 +1,208 @@
+"""Deterministic stand-ins for the LLM, embedding model and a document source."""
+
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import time
+from typing import Any, AsyncIterator, Iterator, List
+import numpy as np
+from llama_index.core import Document
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.llms import CompletionResponse, CompletionResponseGen, CustomLLM, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+from app.services.ingestion.base import BaseIngestor, set_stable_id
+
+_WORDS = (
+    "revenue customer order invoice region quarter product shipment contract policy "
+    "incident release roadmap budget forecast supplier warehouse margin churn onboarding"
+).split()
+
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+
+
+def _words(seed: int, n: int) -> List[str]:
+    rng = np.random.default_rng(seed)
+    return [_WORDS[i] for i in rng.integers(0, len(_WORDS), n)]
+
+
+def sample_questions(n: int) -> List[str]:
+    return [f"What about {' '.join(_words(_digest(str(i)), 5))}?" for i in range(n)]
+
+
+class FakeLLM(CustomLLM):
+    """
+    LLM whose reply is a function of the prompt. It answers text-to-SQL
+    prompts with a query over the first table in the schema and ReAct
+    prompts with one call of the first tool followed by a final answer;
+    anything else gets `answer_tokens` pseudo-random words. `latency_ms`
+    elapses before the first token and `token_latency_ms` between tokens.
+    """
+
+    latency_ms: float = 50.0
+    token_latency_ms: float = 0.0
+    answer_tokens: int = 64
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(context_window=128000, num_output=1024, model_name="fake-llm", is_chat_model=False)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "FakeLLM"
+
+    def _reply(self, prompt: str) -> str:
+        if prompt.rstrip().endswith("SQLQuery:"):
+            table = re.search(r"Table '([^']+)'", prompt)
+            return f"SELECT * FROM {table.group(1) if table else 'sqlite_master'} LIMIT 5"
+        react = "> Tool Name:" in prompt
+        # The ReAct header itself mentions "Observation:" once; more means a tool has answered
+        if react and prompt.count("Observation:") < 2:
+            tool = re.search(r"> Tool Name: (\S+)", prompt)
+            arg = re.search(r'Tool Args: \{"properties": \{"(\w+)"', prompt)
+            if tool and arg:
+                question = " ".join(_words(_digest(prompt), 6))
+                return (
+                    f"Thought: I need to use a tool to help me answer the question.\n"
+                    f"Action: {tool.group(1)}\nAction Input: {json.dumps({arg.group(1): question})}"
+                )
+        answer = " ".join(_words(_digest(prompt), self.answer_tokens))
+        if react:
+            return f"Thought: I can answer without using any more tools.\nAnswer: {answer}"
+        return answer
+
+    def _tokens(self, prompt: str) -> List[str]:
+        return re.findall(r"\S+\s*", self._reply(prompt))
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        tokens = self._tokens(prompt)
+        time.sleep((self.latency_ms + self.token_latency_ms * len(tokens)) / 1000)
+        return CompletionResponse(text="".join(tokens))
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        def gen() -> CompletionResponseGen:
+            time.sleep(self.latency_ms / 1000)
+            text = ""
+            for token in self._tokens(prompt):
+                time.sleep(self.token_latency_ms / 1000)
+                text += token
+                yield CompletionResponse(text=text, delta=token)
+
+        return gen()
+
+    @llm_completion_callback()
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        tokens = self._tokens(prompt)
+        await asyncio.sleep((self.latency_ms + self.token_latency_ms * len(tokens)) / 1000)
+        return CompletionResponse(text="".join(tokens))
+
+    @llm_completion_callback()
+    async def astream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+        async def gen() -> AsyncIterator[CompletionResponse]:
+            await asyncio.sleep(self.latency_ms / 1000)
+            text = ""
+            for token in self._tokens(prompt):
+                await asyncio.sleep(self.token_latency_ms / 1000)
+                text += token
+                yield CompletionResponse(text=text, delta=token)
+
+        return gen()
+
+
+class HashEmbedding(BaseEmbedding):
+    """Unit vectors seeded by the SHA-256 of the text, after `latency_ms` per call."""
+
+    dimension: int = 1536
+    latency_ms: float = 5.0
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "HashEmbedding"
+
+    def _vector(self, text: str) -> Embedding:
+        v = np.random.default_rng(_digest(text)).standard_normal(self.dimension)
+        return (v / np.linalg.norm(v)).astype(np.float32).tolist()
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        time.sleep(self.latency_ms / 1000)
+        return self._vector(query)
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        time.sleep(self.latency_ms / 1000)
+        return [self._vector(t) for t in texts]
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return self._vector(query)
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return self._vector(text)
+
+
+class WordEncoding:
+    """Whitespace tokenizer standing in for tiktoken, whose encodings are downloaded on first use."""
+
+    def encode(self, text: str, disallowed_special=()) -> List[str]:
+        return text.split()
+
+
+class SyntheticIngestor(BaseIngestor):
+    """
+    Source of `docs` generated documents of about `words` words each. The
+    `scope` config puts benchmark jobs on separate crawl scopes, so the job
+    queue runs them concurrently instead of one after another.
+    """
+
+    def scope(self, scope: str = "default", **kwargs) -> str:
+        return scope
+
+    def iter_documents(self, scope: str = "default", docs: int = 100, words: int = 300, **kwargs) -> Iterator[Document]:
+        for i in range(docs):
+            text = " ".join(_words(_digest(f"{scope}:{i}"), words))
+            doc = Document(text=text, metadata={"source": "bench", "path": f"{scope}/doc-{i}.txt"})
+            yield set_stable_id(doc, "bench", f"{scope}:{i}", version="1")
+
+
+def create_sample_database(path: str, rows: int) -> None:
+    """Write a small orders/customers/products SQLite database with `rows` orders."""
+    rng = np.random.default_rng(0)
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(
+            """
+            DROP TABLE IF EXISTS customers;
+            DROP TABLE IF EXISTS products;
+            DROP TABLE IF EXISTS orders;
+            CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT, region TEXT);
+            CREATE TABLE products (id INTEGER PRIMARY KEY, name TEXT, price REAL);
+            CREATE TABLE orders (
+                id INTEGER PRIMARY KEY, customer_id INTEGER, product_id INTEGER, quantity INTEGER, ordered_at TEXT
+            );
+            """
+        )
+        regions = ["north", "south", "east", "west"]
+        conn.executemany(
+            "INSERT INTO customers VALUES (?, ?, ?)", [(i, f"customer {i}", regions[i % 4]) for i in range(100)]
+        )
+        conn.executemany(
+            "INSERT INTO products VALUES (?, ?, ?)", [(i, f"product {i}", round(5 + i * 1.5, 2)) for i in range(50)]
+        )
+        conn.executemany(
+            "INSERT INTO orders VALUES (?, ?, ?, ?, ?)",
+            [
+                (i, int(rng.integers(100)), int(rng.integers(50)), int(rng.integers(1, 10)), f"2024-{i % 12 + 1:02d}-01")
+                for i in range(rows)
+            ],
+        )
+        conn.commit()
+    finally:
+        conn.close()
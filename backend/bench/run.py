@@ -0,0 +1,362 @@
+"""
+Offline benchmark of the API: no OpenAI, Postgres or Neo4j required.
+
+The app is driven in-process over ASGI with a deterministic fake LLM and
+hash-based embedder (both with configurable latency), the embedded mmap
+vector backend, a local SQLite database registered through `sql_registry`
+and SQLite state and caches, all in a temporary directory. Each workload sends
+`--requests` requests with at most `--concurrency` in flight and reports
+p50/p95/p99 latency, requests per second and peak RSS. The JSON report can
+be compared with an earlier one:
+
+    cd backend
+    python -m bench.run --output bench.json
+    python -m bench.run --compare bench.json --max-regression 20
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+WORKLOADS = ("search", "sql", "chat", "indexing")
+API_KEY = "bench-token"
+
+
+def _configure_environment(workdir: str) -> None:
+    """Point settings at local files before the app is imported (settings are read at import)."""
+    os.environ.update(
+        {
+            "APP_API_KEY": API_KEY,
+            "OPENAI_API_KEY": "offline",
+            "STATE_DB_URI": f"sqlite:///{os.path.join(workdir, 'state.db')}",
+            "CACHE_DIR": os.path.join(workdir, "cache"),
+            "EXPORT_DIR": os.path.join(workdir, "exports"),
+            "ENABLE_KG": "false",
+            "VECTOR_BACKEND": "mmap",
+            "VECTOR_MMAP_DIR": os.path.join(workdir, "vectors"),
+            "SQL_READ_ONLY": "true",
+        }
+    )
+
+
+def _install_fakes(args: argparse.Namespace) -> None:
+    from llama_index.core import Settings as LlamaSettings
+    from app.core import llm  # noqa: F401 configures the real models on import; replaced below
+    from app.core.config import settings
+    from app.core.embedding_scheduler import embedding_scheduler
+    from app.core.embeddings import CachedEmbedding
+    from app.services.jobs import INGESTORS
+    from .fakes import FakeLLM, HashEmbedding, SyntheticIngestor, WordEncoding
+
+    LlamaSettings.llm = FakeLLM(
+        latency_ms=args.llm_latency_ms, token_latency_ms=args.token_latency_ms, answer_tokens=args.answer_tokens
+    )
+    LlamaSettings.embed_model = CachedEmbedding(
+        HashEmbedding(dimension=settings.OPENAI_EMBED_DIM, latency_ms=args.embed_latency_ms),
+        dimension=settings.OPENAI_EMBED_DIM,
+    )
+    embedding_scheduler._encoding = WordEncoding()
+    INGESTORS["bench"] = SyntheticIngestor()
+
+
+class ASGIClient:
+    """Minimal in-process HTTP client for an ASGI app (JSON in, body bytes out)."""
+
+    def __init__(self, app, headers: Dict[str, str]) -> None:
+        self._app = app
+        self._headers = [(k.lower().encode(), v.encode()) for k, v in headers.items()]
+
+    async def request(self, method: str, path: str, body: Any = None) -> Tuple[int, bytes]:
+        payload = json.dumps(body).encode() if body is not None else b""
+        path, _, query = path.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": self._headers + [(b"content-type", b"application/json"), (b"host", b"bench")],
+            "client": ("127.0.0.1", 0),
+            "server": ("bench", 80),
+        }
+        sent = False
+        status, chunks = 0, []
+        done = asyncio.Event()
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": payload, "more_body": False}
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body"):
+                    done.set()
+
+        await self._app(scope, receive, send)
+        done.set()
+        return status, b"".join(chunks)
+
+
+def _percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    # Nearest-rank percentile
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+async def _drive(name: str, total: int, concurrency: int, call) -> dict:
+    """Run `call(i)` for i in range(total) with at most `concurrency` in flight."""
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                status, body = await call(i)
+            except Exception as ex:
+                status, body = 0, f"{type(ex).__name__}: {ex}".encode()
+            latencies.append((time.perf_counter() - started) * 1000)
+            if status != 200:
+                key = f"{status}: {body[:120].decode(errors='replace')}"
+                errors[key] = errors.get(key, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    result = {
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": sum(errors.values()),
+        "error_samples": dict(list(errors.items())[:5]),
+        "seconds": round(elapsed, 3),
+        "rps": round(total / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else None,
+            "p50": _round(_percentile(latencies, 50)),
+            "p95": _round(_percentile(latencies, 95)),
+            "p99": _round(_percentile(latencies, 99)),
+            "max": _round(latencies[-1] if latencies else None),
+        },
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    print(
+        f"{name:>9}: {result['rps']} req/s  p50 {result['latency_ms']['p50']} ms  "
+        f"p95 {result['latency_ms']['p95']} ms  p99 {result['latency_ms']['p99']} ms  errors {result['errors']}",
+        file=sys.stderr,
+    )
+    return result
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 2) if value is not None else None
+
+
+async def _run(args: argparse.Namespace) -> dict:
+    from app.main import app
+    from app.core.metrics import stage_seconds
+    from app.services.indexing import sync_source
+    from app.services.ingestion.database import sql_registry
+    from app.services.jobs import INGESTORS, index_jobs
+    from .fakes import create_sample_database, sample_questions
+
+    client = ASGIClient(app, {"X-API-Key": API_KEY})
+    questions = sample_questions(args.distinct_queries)
+    results: Dict[str, dict] = {}
+    setup: Dict[str, float] = {}
+
+    if {"search", "chat"} & set(args.workloads):
+        started = time.perf_counter()
+        await asyncio.to_thread(sync_source, "bench", INGESTORS["bench"], {"scope": "corpus", "docs": args.docs})
+        setup["corpus_index_seconds"] = round(time.perf_counter() - started, 3)
+    if {"sql", "chat"} & set(args.workloads):
+        path = os.path.join(args.workdir, "bench.sqlite")
+        create_sample_database(path, args.sql_rows)
+        started = time.perf_counter()
+        await asyncio.to_thread(sql_registry.register, "bench", f"sqlite:///{path}")
+        setup["sql_register_seconds"] = round(time.perf_counter() - started, 3)
+
+    # Stage timings are attributed to the workload that recorded them
+    before = stage_seconds.snapshot()
+    for workload in args.workloads:
+        if workload == "search":
+
+            async def call(i: int):
+                body = {"query": questions[i % len(questions)], "sources": ["bench"], "scope": "vector"}
+                return await client.request("POST", "/api/v1/search", {**body, "use_hybrid": False})
+
+        elif workload == "sql":
+
+            async def call(i: int):
+                body = {"query": questions[i % len(questions)], "scope": "sql", "db_name": "bench"}
+                return await client.request("POST", "/api/v1/sql/ask", body)
+
+        elif workload == "chat":
+
+            async def call(i: int):
+                body = {
+                    "query": questions[i % len(questions)],
+                    "sources": ["bench"],
+                    "scope": "vector",
+                    "use_hybrid": False,
+                    "session_id": f"bench-{i % args.concurrency}",
+                }
+                return await client.request("POST", "/api/v1/chat", body)
+
+        else:
+            index_jobs.start()
+
+            async def call(i: int):
+                config = {"scope": f"job-{i}", "docs": args.docs_per_job}
+                status, body = await client.request("POST", "/api/v1/indexing/bench", {"source": "bench", "config": config})
+                if status != 202:
+                    return status, body
+                job_id = json.loads(body)["job"]["id"]
+                # Latency is submission to completion of the indexing job
+                while True:
+                    await asyncio.sleep(0.05)
+                    status, body = await client.request("GET", f"/api/v1/indexing/jobs/{job_id}")
+                    job = json.loads(body) if status == 200 else {}
+                    if job.get("status") == "succeeded":
+                        return 200, body
+                    if status != 200 or job.get("status") == "failed":
+                        return status if status != 200 else 500, body
+
+        results[workload] = await _drive(workload, args.requests, args.concurrency, call)
+        results[workload]["stages"] = _stage_summary(before)
+        before = stage_seconds.snapshot()
+
+    return {"setup": setup, "workloads": results}
+
+
+def _stage_summary(before: List[dict]) -> Dict[str, dict]:
+    """Calls and mean latency per stage recorded since the `before` snapshot."""
+    from app.core.metrics import stage_seconds
+
+    previous = {(s["stage"], s["target"], s["status"]): s for s in before}
+    totals: Dict[str, List[float]] = {}
+    for s in stage_seconds.snapshot():
+        prior = previous.get((s["stage"], s["target"], s["status"]), {"count": 0, "sum": 0.0})
+        entry = totals.setdefault(s["stage"], [0, 0.0])
+        entry[0] += s["count"] - prior["count"]
+        entry[1] += s["sum"] - prior["sum"]
+    return {
+        name: {"calls": calls, "mean_ms": round(total / calls * 1000, 2)}
+        for name, (calls, total) in sorted(totals.items())
+        if calls
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, cwd=os.path.dirname(__file__)
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: dict, baseline: dict, max_regression_pct: float) -> List[str]:
+    """Workloads whose p95 latency rose or throughput fell by more than `max_regression_pct`."""
+    regressions = []
+    for name, current in report["workloads"].items():
+        before = baseline.get("workloads", {}).get(name)
+        if not before:
+            continue
+        p95_now, p95_before = current["latency_ms"]["p95"], before["latency_ms"]["p95"]
+        if p95_now and p95_before and p95_now > p95_before * (1 + max_regression_pct / 100):
+            regressions.append(f"{name}: p95 {p95_before} -> {p95_now} ms")
+        if current["rps"] and before["rps"] and current["rps"] < before["rps"] * (1 - max_regression_pct / 100):
+            regressions.append(f"{name}: {before['rps']} -> {current['rps']} req/s")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workloads", default=",".join(WORKLOADS), help="comma-separated subset of %(default)s")
+    parser.add_argument("--requests", type=int, default=200, help="requests per workload")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--distinct-queries", type=int, default=50, help="repeated questions hit the caches")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0, help="fake LLM delay before the first token")
+    parser.add_argument("--token-latency-ms", type=float, default=0.0, help="fake LLM delay per output token")
+    parser.add_argument("--answer-tokens", type=int, default=64)
+    parser.add_argument("--embed-latency-ms", type=float, default=5.0, help="fake embedding delay per call")
+    parser.add_argument("--docs", type=int, default=200, help="documents in the search corpus")
+    parser.add_argument("--docs-per-job", type=int, default=20, help="documents per indexing request")
+    parser.add_argument("--sql-rows", type=int, default=10000)
+    parser.add_argument("--log-level", default="WARNING", help="log level of the app while benchmarking")
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="allowed p95/RPS regression in percent")
+    args = parser.parse_args(argv)
+    args.workloads = [w for w in args.workloads.split(",") if w]
+    unknown = set(args.workloads) - set(WORKLOADS)
+    if unknown:
+        parser.error(f"unknown workloads: {', '.join(sorted(unknown))}")
+
+    with tempfile.TemporaryDirectory(prefix="talk2db-bench-") as workdir:
+        args.workdir = workdir
+        _configure_environment(workdir)
+        _install_fakes(args)
+        logging.getLogger().setLevel(args.log_level.upper())
+        measured = asyncio.run(_run(args))
+
+    config = {k: v for k, v in vars(args).items() if k not in ("output", "compare", "workdir", "log_level")}
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        **measured,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            regressions = compare(report, json.load(fh), args.max_regression)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,15 @@
+"""Point settings at local files before the app is imported (settings are read at import)."""
+
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="talk2db-tests-")
+os.environ.update(
+    {
+        "OPENAI_API_KEY": "test",
+        "STATE_DB_URI": f"sqlite:///{os.path.join(_tmp, 'state.db')}",
+        "CACHE_DIR": os.path.join(_tmp, "cache"),
+        "EXPORT_DIR": os.path.join(_tmp, "exports"),
+        "ENABLE_KG": "false",
+    }
+)
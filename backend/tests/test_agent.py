@@ -0,0 +1,81 @@
+import asyncio
+
+from llama_index.core.agent.workflow import ReActAgent
+from llama_index.core.memory import ChatMemoryBuffer
+
+from app.services import agent as agent_module
+from bench.fakes import FakeLLM
+
+
+class _RepeatingLLM(FakeLLM):
+    """Calls the first tool twice with the same arguments before answering."""
+
+    def _reply(self, prompt: str) -> str:
+        # The ReAct header mentions "Observation:" once; every tool result adds one
+        if "> Tool Name:" in prompt and prompt.count("Observation:") < 3:
+            return (
+                "Thought: I need to look this up.\n"
+                'Action: search_documents\nAction Input: {"query": "refund policy"}'
+            )
+        return super()._reply(prompt)
+
+
+def _search(query: str) -> dict:
+    return {"answer": f"found {query}", "citations": [{"text": "t", "source": "wiki", "path": "/p", "doc_id": "d1", "score": 0.5}]}
+
+
+def test_concurrent_turns_share_one_agent():
+    tool = agent_module._tool("search_documents", "Search the documents.", _search)
+    agent = ReActAgent(tools=[tool], llm=FakeLLM(latency_ms=1))
+
+    async def turn(session: str):
+        stats = agent_module.start_turn(session)
+        memory = ChatMemoryBuffer.from_defaults()
+        answer, citations = await agent_module.achat(agent, f"question from {session}", memory)
+        return answer, citations, stats.as_dict(), len(memory.get_all())
+
+    async def main():
+        return await asyncio.gather(*(turn(f"s{i}") for i in range(4)))
+
+    for answer, citations, stats, messages in asyncio.run(main()):
+        assert answer
+        assert citations == [{"source": "wiki", "path": "/p", "doc_id": "d1", "score": 0.5}]
+        assert stats["tool_calls"] == 1
+        assert messages >= 2  # the question and the answer, per session
+
+
+def test_stream_sends_only_the_final_answer():
+    agent = ReActAgent(tools=[agent_module._tool("search_documents", "Search.", _search)], llm=FakeLLM(latency_ms=1))
+
+    async def main():
+        chunks = [c async for c in agent_module.astream_chat(agent, "hello", ChatMemoryBuffer.from_defaults())]
+        return "".join(chunks)
+
+    text = asyncio.run(main())
+    assert text and "Thought:" not in text and "Action:" not in text
+
+
+def test_repeated_tool_calls_are_memoized_per_turn():
+    runs = []
+
+    def search(query: str) -> dict:
+        runs.append(query)
+        return _search(query)
+
+    tool = agent_module._tool("search_documents", "Search.", search)
+    agent = ReActAgent(tools=[tool], llm=_RepeatingLLM(latency_ms=1))
+
+    async def turn():
+        stats = agent_module.start_turn("s")
+        answer, _ = await agent_module.achat(agent, "what is the refund policy?", ChatMemoryBuffer.from_defaults())
+        return answer, stats.as_dict()
+
+    answer, stats = asyncio.run(turn())
+    assert answer
+    assert runs == ["refund policy"]
+    assert (stats["tool_calls"], stats["tool_cache_hits"]) == (2, 1)
+
+    # A new turn starts with an empty memo and runs the tool again
+    _, stats = asyncio.run(turn())
+    assert runs == ["refund policy", "refund policy"]
+    assert (stats["tool_calls"], stats["tool_cache_hits"]) == (2, 1)
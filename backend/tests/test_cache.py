@@ -0,0 +1,80 @@
+import pytest
+
+from app.core import cache as cache_module
+from app.core.cache import LRUCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    return now
+
+
+def test_evicts_least_recently_used_entry():
+    cache = LRUCache("t-lru", max_entries=2, ttl_sec=None)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_bounded_by_bytes():
+    cache = LRUCache("t-bytes", max_entries=100, max_bytes=300, ttl_sec=None)
+    for i in range(10):
+        cache.set(str(i), "x" * 100)
+    assert cache.stats()["bytes"] <= 300
+    assert cache.get("9") is not None and cache.get("0") is None
+    # A single value larger than the cache is not stored
+    cache.set("big", "x" * 1000)
+    assert cache.get("big") is None and cache.get("9") is not None
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = LRUCache("t-ttl", ttl_sec=10)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl_sec=100)
+    clock[0] += 11
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    clock[0] += 100
+    assert cache.sweep() == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_invalidate_tag_in_memory():
+    cache = LRUCache("t-tags", ttl_sec=None)
+    cache.set("a", 1, tags=("source:teams",))
+    cache.set("b", 2, tags=("source:teams", "db:sales"))
+    cache.set("c", 3, tags=("db:sales",))
+    assert cache.invalidate_tag("source:teams") == 2
+    assert cache.get("a") is None and cache.get("b") is None and cache.get("c") == 3
+
+
+def test_persistent_entries_survive_restart_and_tag_invalidation():
+    first = LRUCache("t-disk", ttl_sec=None, persist=True)
+    first.set("a", {"v": 1}, tags=("db:my_db",))
+    first.set("b", {"v": 2}, tags=("db:myxdb",))
+    first.set("c", {"v": 3}, tags=("db:my%db",))
+
+    restarted = LRUCache("t-disk", ttl_sec=None, persist=True)
+    assert restarted.get("a") == {"v": 1}
+    assert restarted.stats()["disk_hits"] == 1
+
+    # `_` and `%` are matched literally, not as wildcards
+    restarted.invalidate_tag("db:my_db")
+    again = LRUCache("t-disk", ttl_sec=None, persist=True)
+    assert again.get("a") is None
+    assert again.get("b") == {"v": 2}
+    assert again.get("c") == {"v": 3}
+
+
+def test_expired_disk_entries_are_not_served(clock):
+    cache = LRUCache("t-disk-ttl", ttl_sec=5, persist=True)
+    cache.set("a", 1, tags=("x",))
+    clock[0] += 6
+    restarted = LRUCache("t-disk-ttl", ttl_sec=5, persist=True)
+    assert restarted.get("a") is None
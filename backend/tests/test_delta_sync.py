@@ -0,0 +1,106 @@
+import pytest
+
+from app.services.ingestion import graph
+from app.services.ingestion.state import DocumentState, SyncState, sync_state
+
+
+def _file(item_id: str, ctag: str, name: str = "a.txt") -> dict:
+    return {
+        "id": item_id,
+        "name": name,
+        "cTag": ctag,
+        "file": {},
+        "parentReference": {"path": "/drive/root:/docs"},
+        "@microsoft.graph.downloadUrl": f"https://download/{item_id}",
+    }
+
+
+class _Response:
+    def __init__(self, content: bytes, status: int = 200) -> None:
+        self.content = content
+        self.status_code = status
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+@pytest.fixture
+def drive(monkeypatch):
+    """Serve `pages` from the delta query and file bodies from `files` (None = download fails)."""
+    fake = {"pages": [], "files": {}, "requested": []}
+
+    def iter_delta(url, token):
+        fake["requested"].append(url)
+        yield from fake["pages"]
+
+    def get(url, timeout=None):
+        body = fake["files"][url.rsplit("/", 1)[-1]]
+        return _Response(b"", 500) if body is None else _Response(body)
+
+    monkeypatch.setattr(graph, "iter_delta", iter_delta)
+    monkeypatch.setattr(graph._session, "get", get)
+    monkeypatch.setattr(graph, "parse_file", lambda name, data: data.decode())
+    return fake
+
+
+def _state(watermark=None, documents=None) -> SyncState:
+    return SyncState("onedrive", "drive", watermark or {}, documents or {})
+
+
+def test_initial_sync_lists_everything_and_stores_delta_link(drive):
+    drive["pages"] = [([_file("1", "c1")], None), ([_file("2", "c2")], "https://delta?token=1")]
+    drive["files"] = {"1": b"one", "2": b"two"}
+    result = graph.sync_drive("onedrive", "/me/drive", "t", _state())
+    docs = list(result.documents)
+    assert [(d.id_, d.text, d.metadata["version"]) for d in docs] == [
+        ("onedrive:1", "one", "c1"),
+        ("onedrive:2", "two", "c2"),
+    ]
+    assert drive["requested"] == ["/me/drive/root/delta"]
+    assert result.seen_ids == {"onedrive:1", "onedrive:2"}
+    assert result.watermark == {"delta_link": "https://delta?token=1"}
+    assert result.failed_ids == []
+
+
+def test_incremental_sync_skips_unchanged_and_reports_deletions(drive):
+    drive["pages"] = [([_file("1", "c1"), _file("2", "c3"), {"id": "3", "deleted": {}}], "https://delta?token=2")]
+    drive["files"] = {"2": b"two v2"}
+    state = _state(
+        {"delta_link": "https://delta?token=1"},
+        {"onedrive:1": DocumentState("c1", "h1"), "onedrive:2": DocumentState("c2", "h2")},
+    )
+    result = graph.sync_drive("onedrive", "/me/drive", "t", state)
+    assert [d.id_ for d in result.documents] == ["onedrive:2"]
+    assert drive["requested"] == ["https://delta?token=1"]
+    assert result.seen_ids is None
+    assert result.deleted_ids == ["onedrive:3"]
+    assert result.watermark == {"delta_link": "https://delta?token=2"}
+
+
+def test_failed_download_keeps_previous_delta_link(drive):
+    drive["pages"] = [([_file("1", "c1"), _file("2", "c2")], "https://delta?token=2")]
+    drive["files"] = {"1": b"one", "2": None}
+    state = _state({"delta_link": "https://delta?token=1"})
+    result = graph.sync_drive("onedrive", "/me/drive", "t", state)
+    assert [d.id_ for d in result.documents] == ["onedrive:1"]
+    assert result.failed_ids == ["onedrive:2"]
+    # The next sync starts from the old link and fetches the file again
+    assert result.watermark == {"delta_link": "https://delta?token=1"}
+
+
+def test_state_store_commits_watermark_with_documents():
+    sync_state.reset("teams", "chan")
+    sync_state.commit("teams", "chan", None, [("teams:1", "v1", "h1"), ("teams:2", "v1", "h2")])
+    state = sync_state.load("teams", "chan")
+    # Checkpoints record documents without moving the watermark
+    assert state.watermark == {}
+    assert set(state.documents) == {"teams:1", "teams:2"}
+
+    sync_state.commit("teams", "chan", {"delta_link": "l1"}, [("teams:2", "v2", "h3")], ["teams:1"])
+    state = sync_state.load("teams", "chan")
+    assert state.watermark == {"delta_link": "l1"}
+    assert state.documents == {"teams:2": DocumentState("v2", "h3")}
+
+    sync_state.reset("teams", "chan")
+    assert sync_state.load("teams", "chan").watermark == {}
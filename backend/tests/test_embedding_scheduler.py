@@ -0,0 +1,136 @@
+from typing import List
+
+import asyncio
+import time
+
+import pytest
+from llama_index.core.base.embeddings.base import BaseEmbedding
+
+from app.core import embedding_scheduler, embeddings
+from app.core.embedding_scheduler import EmbeddingScheduler
+
+
+class _RateLimited(Exception):
+    def __init__(self) -> None:
+        super().__init__("429")
+        self.status_code = 429
+        self.response = type("Response", (), {"status_code": 429, "headers": {"retry-after": "0.01"}})()
+
+
+class _Unavailable(Exception):
+    status_code = 503
+
+
+class _Model(BaseEmbedding):
+    """Rejects requests of more than `limit` texts with a 429."""
+
+    limit: int = 2
+    unavailable: int = 0
+    requests: List[int] = []
+
+    def _fail(self) -> None:
+        if self.unavailable:
+            self.unavailable -= 1
+            raise _Unavailable()
+
+    def _get_query_embedding(self, query: str):
+        self.requests.append(1)
+        self._fail()
+        return [1.0, 0.0]
+
+    async def _aget_query_embedding(self, query: str):
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str):  # pragma: no cover
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]):
+        self.requests.append(len(texts))
+        self._fail()
+        if len(texts) > self.limit:
+            raise _RateLimited()
+        return [[float(t), 0.0] for t in texts]
+
+
+class _Words:
+    def encode(self, text: str, disallowed_special=()) -> List[str]:
+        return text.split()
+
+
+@pytest.fixture(autouse=True)
+def _no_backoff(monkeypatch):
+    monkeypatch.setattr(embedding_scheduler, "_backoff", lambda attempt: 0.0)
+
+
+def _scheduler(max_batch_items: int = 8, max_retries: int = 3, query_retries: int = 1) -> EmbeddingScheduler:
+    scheduler = EmbeddingScheduler(
+        rpm=0,
+        tpm=0,
+        concurrency=1,
+        max_batch_tokens=1000,
+        max_batch_items=max_batch_items,
+        max_retries=max_retries,
+        query_retries=query_retries,
+    )
+    scheduler._encoding = _Words()
+    return scheduler
+
+
+def test_throttled_batch_is_resent_in_halves():
+    model = _Model(requests=[])
+    scheduler = _scheduler()
+    scheduler.batch_items = 4
+    vectors, tokens = scheduler.embed(model, [str(i) for i in range(4)])
+    assert [v[0] for v in vectors] == [0.0, 1.0, 2.0, 3.0]
+    assert tokens == 4
+    assert model.requests == [4, 2, 2]
+    assert scheduler.stats()["throttled"] == 1
+
+
+def test_gives_up_after_max_retries():
+    model = _Model(limit=0, requests=[])
+    scheduler = _scheduler(max_retries=1)
+    with pytest.raises(_RateLimited):
+        scheduler.embed(model, ["1"])
+    assert model.requests == [1, 1]
+    assert scheduler.stats()["failures"] == 1
+
+
+def test_server_errors_resend_the_same_batch():
+    model = _Model(unavailable=2, requests=[])
+    scheduler = _scheduler()
+    vectors, _ = scheduler.embed(model, ["1", "2"])
+    assert [v[0] for v in vectors] == [1.0, 2.0]
+    assert model.requests == [2, 2, 2]
+    assert scheduler.stats()["throttled"] == 0
+
+
+def test_query_embeddings_skip_ingestion_back_off(monkeypatch):
+    scheduler = _scheduler()
+    monkeypatch.setattr(embeddings, "embedding_scheduler", scheduler)
+    scheduler._paused_until = time.monotonic() + 60  # as after an ingestion 429
+    model = embeddings.CachedEmbedding(_Model(unavailable=1, requests=[]), dimension=2)
+    started = time.monotonic()
+    assert asyncio.run(model.aget_query_embedding("uncached async query")) == [1.0, 0.0]
+    assert model.get_query_embedding("uncached sync query") == [1.0, 0.0]
+    assert time.monotonic() - started < 5
+    assert model.inner.requests == [1, 1, 1]  # the first try hit a 503
+
+
+def test_query_embedding_retries_are_bounded(monkeypatch):
+    scheduler = _scheduler(query_retries=1)
+    model = _Model(unavailable=5, requests=[])
+    with pytest.raises(_Unavailable):
+        asyncio.run(scheduler.acall(lambda: model.aget_query_embedding("q"), 1))
+    assert model.requests == [1, 1]
+    assert scheduler.stats()["failures"] == 1
+
+
+def test_query_embedding_tokens_are_counted(monkeypatch):
+    scheduler = _scheduler()
+    monkeypatch.setattr(embeddings, "embedding_scheduler", scheduler)
+    model = embeddings.CachedEmbedding(_Model(requests=[]), dimension=2)
+    with embeddings.embedding_usage() as usage:
+        model.get_query_embedding("a query that is not cached yet")
+    assert usage.tokens == 7
+    assert usage.misses == 1
@@ -0,0 +1,44 @@
+import datetime
+from decimal import Decimal
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from app.services.export import write_export
+
+COLUMNS = ["id", "note", "amount", "ratio", "id"]
+
+
+def test_parquet_schema_is_fixed_and_later_batches_are_cast():
+    batches = [
+        (COLUMNS, [(1, None, Decimal("1.50"), 1.0, 7)]),
+        (COLUMNS, [(2**40, "late text", Decimal("123456789.25"), 2, 8)]),
+    ]
+    export = write_export(batches, "parquet")
+    table = pq.read_table(export.path)
+    assert table.schema == pa.schema(
+        [("id", pa.int64()), ("note", pa.string()), ("amount", pa.decimal128(38, 2)), ("ratio", pa.float64()), ("id_2", pa.int64())]
+    )
+    assert table.column("id").to_pylist() == [1, 2**40]
+    assert table.column("note").to_pylist() == [None, "late text"]
+    assert table.column("ratio").to_pylist() == [1.0, 2.0]
+    assert (export.rows, export.truncated) == (2, False)
+
+
+def test_parquet_null_column_keeps_later_values_as_text():
+    batches = [(["at"], [(None,)]), (["at"], [(datetime.date(2024, 1, 2),)])]
+    table = pq.read_table(write_export(batches, "parquet").path)
+    assert table.column("at").to_pylist() == [None, "2024-01-02"]
+
+
+def test_parquet_rejects_values_that_do_not_fit():
+    with pytest.raises(ValueError, match="Column n"):
+        write_export([(["n"], [(1,)]), (["n"], [("x",)])], "parquet")
+
+
+def test_row_limit_truncates():
+    export = write_export([(["n"], [(i,) for i in range(5)]), (["n"], [(5,)])], "csv", max_rows=3)
+    assert (export.rows, export.truncated) == (3, True)
+    with open(export.path) as fh:
+        assert fh.read().split() == ["n", "0", "1", "2"]
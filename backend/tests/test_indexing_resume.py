@@ -0,0 +1,108 @@
+from concurrent.futures import Future
+from typing import Iterator, List
+
+import pytest
+from llama_index.core import Document
+from llama_index.core.schema import NodeRelationship, TextNode
+
+from app.core.config import settings
+from app.services import indexing
+from app.services.ingestion.base import BaseIngestor
+from app.services.ingestion.state import sync_state
+
+
+class _Interrupted(Exception):
+    pass
+
+
+class _Index:
+    """Vector index stand-in that can fail the n-th insert like a worker dying mid-sync."""
+
+    def __init__(self) -> None:
+        self.nodes: List[TextNode] = []
+        self.fail_on_insert = None
+        self.inserts = 0
+
+    def insert_nodes(self, nodes) -> None:
+        self.inserts += 1
+        if self.inserts == self.fail_on_insert:
+            raise _Interrupted()
+        self.nodes.extend(nodes)
+
+    def delete_ref_doc(self, ref_doc_id: str) -> None:
+        self.nodes = [n for n in self.nodes if n.ref_doc_id != ref_doc_id]
+
+    def chunks(self) -> List[str]:
+        return sorted(n.text for n in self.nodes)
+
+
+class _Paragraphs(BaseIngestor):
+    def __init__(self, texts: dict) -> None:
+        self.texts = texts
+
+    def scope(self, **kwargs) -> str:
+        return "resume"
+
+    def iter_documents(self, **kwargs) -> Iterator[Document]:
+        for doc_id, text in self.texts.items():
+            yield Document(id_=doc_id, text=text)
+
+
+def _chunk_paragraphs(docs, profile):
+    return [
+        [
+            TextNode(
+                id_=f"{doc.id_}#{p}",
+                text=p,
+                relationships={NodeRelationship.SOURCE: doc.as_related_node_info()},
+            )
+            for p in doc.text.split("\n\n")
+        ]
+        for doc in docs
+    ]
+
+
+def _inline(fn, *args):
+    future = Future()
+    future.set_result(fn(*args))
+    return future
+
+
+@pytest.fixture
+def index(monkeypatch):
+    fake = _Index()
+    monkeypatch.setattr(indexing, "index_for_source", lambda source: fake)
+    monkeypatch.setattr(indexing, "submit_in_process", _inline)
+    monkeypatch.setattr(indexing, "chunk_documents", _chunk_paragraphs)
+    monkeypatch.setattr(indexing, "_embed", lambda chunks, stats: ([n] for nodes in chunks for n in nodes))
+    monkeypatch.setattr(settings, "INGEST_WRITE_BATCH_SIZE", 1)
+    monkeypatch.setattr(settings, "INGEST_CHECKPOINT_DOCS", 1)
+    return fake
+
+
+def test_resumed_sync_replaces_partly_written_document(index):
+    ingestor = _Paragraphs({"a": "a1\n\na2\n\na3", "b": "b1\n\nb2"})
+    index.fail_on_insert = 2  # dies after the first chunk of the new document "a"
+    with pytest.raises(_Interrupted):
+        indexing.sync_source("test", ingestor, {})
+    assert index.chunks() == ["a1"]
+    state = sync_state.load("test", "resume")
+    assert state.documents["a"].content_hash is None
+
+    index.fail_on_insert = None
+    result = indexing.sync_source("test", ingestor, {})
+    assert index.chunks() == ["a1", "a2", "a3", "b1", "b2"]
+    assert result["upserted"] == 2
+    assert sync_state.load("test", "resume").documents["a"].content_hash is not None
+
+
+def test_resumed_sync_skips_completed_documents(index):
+    ingestor = _Paragraphs({"a": "a1\n\na2", "b": "b1\n\nb2"})
+    index.fail_on_insert = 4  # "a" is complete, "b" is half written
+    with pytest.raises(_Interrupted):
+        indexing.sync_source("test-done", ingestor, {})
+
+    index.fail_on_insert = None
+    result = indexing.sync_source("test-done", ingestor, {})
+    assert index.chunks() == ["a1", "a2", "b1", "b2"]
+    assert (result["unchanged"], result["upserted"]) == (1, 1)
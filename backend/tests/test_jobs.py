@@ -0,0 +1,116 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.core.state import state_engine
+from app.services import jobs
+from app.services.ingestion.base import BaseIngestor
+
+
+class _Scoped(BaseIngestor):
+    def scope(self, scope: str = "default", **kwargs) -> str:
+        return scope
+
+
+class _Executor:
+    """Records dispatched jobs instead of running them, so they stay `running`."""
+
+    def __init__(self) -> None:
+        self.started = []
+
+    def submit(self, fn, job_id, *args) -> None:
+        self.started.append(job_id)
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    monkeypatch.setitem(jobs.INGESTORS, "a", _Scoped())
+    monkeypatch.setitem(jobs.INGESTORS, "b", _Scoped())
+    queue = jobs.IndexJobQueue(max_workers=3, per_source=2)
+    queue._executor = _Executor()
+    queue._ensure()
+    with state_engine.begin() as conn:
+        conn.execute(delete(jobs.jobs_table))
+    return queue
+
+
+def _status(queue, *jobs_):
+    return [queue.get(job["id"])["status"] for job in jobs_]
+
+
+def _finish(queue, job) -> None:
+    queue._update(job["id"], status="succeeded")
+    queue._dispatch()
+
+
+def test_jobs_of_one_scope_run_one_at_a_time(queue):
+    first = queue.submit("a", {"scope": "x"})
+    second = queue.submit("a", {"scope": "x"})
+    other = queue.submit("a", {"scope": "y"})
+    assert first["scope"] == "x"
+    assert _status(queue, first, second, other) == ["running", "queued", "running"]
+
+    _finish(queue, first)
+    assert _status(queue, second) == ["running"]
+    assert queue._executor.started == [first["id"], other["id"], second["id"]]
+
+
+def test_claim_refuses_a_scope_running_in_another_worker(queue):
+    running = queue.submit("a", {"scope": "x"})
+    waiting = queue.submit("a", {"scope": "x"})
+    with state_engine.connect() as conn:
+        row = conn.execute(select(jobs.jobs_table).where(jobs.jobs_table.c.id == waiting["id"])).first()
+    # As a worker whose snapshot predates the running job would try it
+    assert not queue._claim(row)
+    with pytest.raises(IntegrityError), state_engine.begin() as conn:
+        conn.execute(update(jobs.jobs_table).where(jobs.jobs_table.c.id == waiting["id"]).values(status="running"))
+    assert _status(queue, running, waiting) == ["running", "queued"]
+
+
+def test_per_source_and_global_limits(queue):
+    a = [queue.submit("a", {"scope": f"a{i}"}) for i in range(3)]
+    b = [queue.submit("b", {"scope": f"b{i}"}) for i in range(2)]
+    assert _status(queue, *a) == ["running", "running", "queued"]
+    assert _status(queue, *b) == ["running", "queued"]  # three workers in total
+
+    _finish(queue, a[0])
+    assert _status(queue, a[2], b[1]) == ["running", "queued"]
+    _finish(queue, b[0])
+    assert _status(queue, b[1]) == ["running"]
+
+
+def test_missing_config_is_rejected(queue):
+    with pytest.raises(ValueError, match="team_id"):
+        queue.submit("teams", {})
+
+
+def test_orphaned_jobs_are_requeued_and_resumed(queue):
+    job = queue.submit("a", {"scope": "x"})
+    waiting = queue.submit("a", {"scope": "x"})
+    stale = jobs._now() - timedelta(seconds=jobs.settings.INDEX_JOB_STALE_SEC + 1)
+    queue._update(job["id"], heartbeat_at=stale)
+
+    queue._dispatch()
+    resumed = queue.get(job["id"])
+    assert (resumed["status"], resumed["attempts"]) == ("running", 2)
+    assert _status(queue, waiting) == ["queued"]
+    assert queue._executor.started == [job["id"], job["id"]]
+
+
+def test_source_invalidation_reaches_other_workers(monkeypatch):
+    dropped = []
+    monkeypatch.setattr(jobs, "_drop_cached", dropped.append)
+    here, there = jobs.SourceInvalidations(), jobs.SourceInvalidations()
+    here.poll()
+    there.poll()
+
+    here.publish("confluence")
+    assert dropped == ["confluence"]
+    here.poll()
+    assert dropped == ["confluence"]  # already dropped when published
+    there.poll()
+    assert dropped == ["confluence", "confluence"]
+    there.poll()
+    assert dropped == ["confluence", "confluence"]
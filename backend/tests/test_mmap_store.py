@@ -0,0 +1,111 @@
+import os
+import time
+
+import numpy as np
+import pytest
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.core.vector_stores.types import (
+    MetadataFilter,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryMode,
+)
+
+from app.core.mmap_store import MmapCollection, MmapVectorStore
+
+DIM = 16
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(7).normal(size=(1500, DIM)).astype(np.float32)
+
+
+def _node(i: int, vector: np.ndarray, doc: str = None) -> TextNode:
+    node = TextNode(
+        id_=f"n{i}",
+        text=f"chunk {i} about {'apples' if i % 2 else 'pears'}",
+        metadata={"i": i, "kind": "odd" if i % 2 else "even"},
+        embedding=vector.tolist(),
+    )
+    node.relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(node_id=doc or f"d{i // 10}")
+    return node
+
+
+def _store(path, **kwargs) -> MmapVectorStore:
+    return MmapVectorStore(MmapCollection(str(path), DIM, poll_sec=0, **kwargs))
+
+
+def _nearest(store: MmapVectorStore, vector: np.ndarray, k: int = 1, **kwargs):
+    return store.query(VectorStoreQuery(query_embedding=vector.tolist(), similarity_top_k=k, **kwargs))
+
+
+def test_dense_round_trip(tmp_path, vectors):
+    store = _store(tmp_path)
+    store.add([_node(i, v) for i, v in enumerate(vectors)])
+    result = _nearest(store, vectors[5], k=3)
+    assert result.ids[0] == "n5"
+    assert result.similarities[0] == pytest.approx(1.0, abs=1e-5)
+    node = result.nodes[0]
+    assert (node.text, node.ref_doc_id, node.metadata) == ("chunk 5 about apples", "d0", {"i": 5, "kind": "odd"})
+
+    even = MetadataFilters(filters=[MetadataFilter(key="kind", value="even")])
+    assert all(int(i[1:]) % 2 == 0 for i in _nearest(store, vectors[5], k=5, filters=even).ids)
+
+
+def test_sparse_query(tmp_path, vectors):
+    store = _store(tmp_path)
+    store.add([_node(i, v) for i, v in enumerate(vectors[:20])])
+    result = store.query(
+        VectorStoreQuery(query_str="apples chunk 7", mode=VectorStoreQueryMode.SPARSE, similarity_top_k=3, sparse_top_k=3)
+    )
+    assert result.ids[0] == "n7"
+    assert all(int(i[1:]) % 2 for i in result.ids)
+
+
+def test_writes_reach_other_instances_and_survive_reopening(tmp_path, vectors):
+    writer, reader = _store(tmp_path), _store(tmp_path)
+    writer.add([_node(i, v) for i, v in enumerate(vectors[:100])])
+    assert _nearest(reader, vectors[42]).ids == ["n42"]
+    writer.add([_node(i, v) for i, v in enumerate(vectors[100:], start=100)])
+    assert _nearest(reader, vectors[300]).ids == ["n300"]
+    assert _nearest(_store(tmp_path), vectors[1499]).ids == ["n1499"]
+
+
+def test_delete_replace_and_compaction(tmp_path, vectors):
+    store, other = _store(tmp_path), _store(tmp_path)
+    store.add([_node(i, v) for i, v in enumerate(vectors)])
+    store.delete("d0")
+    assert "n5" not in _nearest(store, vectors[5], k=3).ids
+    assert store.get_nodes(node_ids=["n5", "n15"])[0].node_id == "n15"
+
+    # Re-adding an id replaces its row instead of duplicating it
+    store.add([_node(15, vectors[21], doc="dx")])
+    assert _nearest(store, vectors[21], k=2).ids == ["n21", "n15"]
+    assert len(store.get_nodes(node_ids=["n15"])) == 1
+
+    # Enough tombstones outnumbering the live rows rewrite the file into a new generation
+    before = sorted(f for f in os.listdir(tmp_path) if f.endswith(".bin"))
+    store.delete_nodes(filters=MetadataFilters(filters=[MetadataFilter(key="i", value=1300, operator="<")]))
+    after = sorted(f for f in os.listdir(tmp_path) if f.endswith(".bin"))
+    assert after != before
+    assert _nearest(store, vectors[1350]).ids == ["n1350"]
+    assert sorted(_nearest(other, vectors[1350], k=400).ids) == sorted(f"n{i}" for i in range(1300, 1500))
+
+
+def test_float16_and_ivf(tmp_path):
+    rng = np.random.default_rng(3)
+    data = rng.normal(size=(2000, DIM)).astype(np.float32)
+    store = _store(tmp_path, dtype="float16", ivf_lists=8, ivf_probes=8)
+    store.add([TextNode(id_=f"x{i}", text="t", embedding=v.tolist()) for i, v in enumerate(data)])
+    collection = store.client
+    deadline = time.monotonic() + 10
+    while collection._ivf is None and time.monotonic() < deadline:
+        time.sleep(0.05)
+        _nearest(store, data[0])
+    assert collection._ivf is not None
+    # Probing every list is exact up to float16 rounding
+    assert _nearest(store, data[123]).ids == ["x123"]
+
+    store.clear()
+    assert _nearest(store, data[123]).ids == []
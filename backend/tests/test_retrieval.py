@@ -0,0 +1,57 @@
+import threading
+import time
+from typing import List
+
+import pytest
+from llama_index.core import QueryBundle
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from app.services import retrieval
+
+
+class _Slow(BaseRetriever):
+    def __init__(self, name: str, delay: float = 0.0, gate: threading.Event = None) -> None:
+        super().__init__()
+        self.name = name
+        self.delay = delay
+        self.gate = gate
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        if self.gate is not None:
+            self.gate.wait(5)
+        time.sleep(self.delay)
+        return [NodeWithScore(node=TextNode(id_=self.name, text=self.name), score=1.0)]
+
+
+@pytest.fixture
+def one_worker(monkeypatch):
+    monkeypatch.setattr(retrieval.settings, "RETRIEVAL_WORKERS_PER_SOURCE", 1)
+    monkeypatch.setattr(retrieval, "_pools", {})
+
+
+def _retrieve(retrievers, query: str):
+    with retrieval.retrieval_report() as report:
+        nodes = retrieval.FanOutRetriever(retrievers, top_k=5).retrieve(query)
+    return sorted(n.node.node_id for n in nodes), report.as_dict()
+
+
+def test_busy_source_queues_lookups_until_its_deadline(one_worker):
+    retrievers = [("wiki", "sparse", _Slow("a", 0.05)), ("wiki", "sparse2", _Slow("b", 0.05))]
+    ids, report = _retrieve(retrievers, "queued lookups")
+    assert ids == ["a", "b"]
+    assert report["dropped"] == []
+
+
+def test_lookup_still_queued_at_the_deadline_is_reported_saturated(one_worker, monkeypatch):
+    monkeypatch.setitem(retrieval._source_timeouts, "drive", 0.2)
+    gate = threading.Event()
+    retrievers = [("drive", "sparse", _Slow("a", gate=gate)), ("drive", "sparse2", _Slow("b"))]
+    try:
+        ids, report = _retrieve(retrievers, "saturated lookups")
+    finally:
+        gate.set()
+    assert ids == []
+    entry = report["sources"]["drive"]
+    assert entry["timed_out"] and entry["saturated"]
+    assert report["dropped"] == ["drive"]
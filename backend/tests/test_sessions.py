@@ -0,0 +1,58 @@
+import asyncio
+
+from llama_index.core.base.llms.types import ChatMessage, MessageRole
+
+from app.core.memory import SessionChatStore, SessionMemory, SessionStore
+
+
+class _Words:
+    def __call__(self, text: str):
+        return text.split()
+
+
+def _store(**kwargs) -> SessionStore:
+    options = {"max_sessions": 10, "max_tokens": 1000, "idle_sec": 3600, "max_messages": 0, "retention_sec": 0}
+    store = SessionStore(**{**options, **kwargs})
+    store._tokenizer = _Words()
+    return store
+
+
+def _message(words: int, role: MessageRole = MessageRole.USER) -> ChatMessage:
+    return ChatMessage(role=role, content=" ".join(["word"] * words))
+
+
+def test_cache_is_bounded_by_message_tokens():
+    store = _store(max_tokens=10)
+    store.append("tokens-a", _message(4))
+    store.session("tokens-a")
+    store.append("tokens-b", _message(5))
+    store.session("tokens-b")
+    assert store.stats()["cached_tokens"] == 9
+    store.append("tokens-c", _message(3))
+    store.session("tokens-c")
+    stats = store.stats()
+    assert stats["cached_tokens"] == 8 and stats["cached_sessions"] == 2
+    assert stats["evictions"] == 1
+    assert [m.content for m in store.session("tokens-a").messages] == ["word word word word"]
+
+
+def test_messages_per_session_are_capped():
+    store = _store(max_messages=3)
+    for i in range(5):
+        store.append("capped", ChatMessage(role=MessageRole.USER, content=f"m{i}"))
+    assert [m.content for m in store.session("capped").messages] == ["m2", "m3", "m4"]
+
+
+def test_memory_window_uses_stored_token_counts_async():
+    store = _store()
+    memory = SessionMemory.from_defaults(chat_store=SessionChatStore(store), chat_store_key="window", token_limit=7)
+
+    async def turn():
+        await memory.aput(_message(3))
+        await memory.aput(_message(3, MessageRole.ASSISTANT))
+        await memory.aput(_message(2))
+        await memory.aput(_message(2, MessageRole.ASSISTANT))
+        return await memory.aget()
+
+    window = asyncio.run(turn())
+    assert [len(m.content.split()) for m in window] == [2, 2]
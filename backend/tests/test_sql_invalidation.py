@@ -0,0 +1,41 @@
+from app.api.routers import admin
+from app.core.cache import answer_cache, cache_key, sql_cache
+from app.services.sql_results import result_tags, sql_results
+
+TABLES = ["orders", "Customers", "order_items"]
+
+
+def test_result_tags_name_the_tables_read():
+    assert result_tags("shop", "SELECT * FROM customers c JOIN orders o ON o.cid = c.id", TABLES) == [
+        "db:shop",
+        "table:shop:orders",
+        "table:shop:customers",
+    ]
+    assert result_tags("shop", None, TABLES) == ["db:shop", "table:shop:*"]
+
+
+def test_table_invalidation_drops_dependent_answers_only():
+    orders_sql = "SELECT count(*) FROM orders"
+    items_sql = "SELECT sum(qty) FROM order_items"
+    sql_results.set("shop", orders_sql, TABLES, ["count"], [(3,)], False)
+    sql_results.set("shop", items_sql, TABLES, ["sum"], [(7,)], False)
+    sql_cache.set(cache_key("sql_ask", "shop", "orders?"), {"answer": "3"}, tags=result_tags("shop", orders_sql, TABLES))
+    sql_cache.set(cache_key("sql_ask", "shop", "items?"), {"answer": "7"}, tags=result_tags("shop", items_sql, TABLES))
+    answer_cache.set("unknown-sql", {"answer": "?"}, tags=result_tags("shop", None, TABLES))
+    answer_cache.set("no-db", {"answer": "?"}, tags=["db:*"])
+    answer_cache.set("other-db", {"answer": "!"}, tags=result_tags("crm", orders_sql, TABLES))
+
+    result = admin.invalidate_sql_results("shop", "ORDERS")
+    assert result["invalidated"] == 4
+    assert sql_results.get("shop", orders_sql) is None
+    assert sql_cache.get(cache_key("sql_ask", "shop", "orders?")) is None
+    assert answer_cache.get("unknown-sql") is None
+    assert answer_cache.get("no-db") is None
+    assert sql_results.get("shop", items_sql).rows == [(7,)]
+    assert sql_cache.get(cache_key("sql_ask", "shop", "items?")) == {"answer": "7"}
+    assert answer_cache.get("other-db") == {"answer": "!"}
+
+    admin.invalidate_sql_results("shop")
+    assert sql_results.get("shop", items_sql) is None
+    assert sql_cache.get(cache_key("sql_ask", "shop", "items?")) is None
+    assert answer_cache.get("other-db") == {"answer": "!"}
@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.services.ingestion.database import CachedSQLDatabase, ExecutionLimits, _session_setup, create_sql_engine
+
+
+@pytest.fixture
+def dsn(tmp_path):
+    url = f"sqlite:///{tmp_path / 'shop.db'}"
+    with create_engine(url).begin() as conn:
+        conn.execute(text("CREATE TABLE orders (id INTEGER PRIMARY KEY, total REAL)"))
+        conn.execute(text("INSERT INTO orders (id, total) VALUES " + ", ".join(f"({i}, {i}.5)" for i in range(10))))
+    return url
+
+
+def _database(dsn: str, name: str, **options) -> CachedSQLDatabase:
+    limits = ExecutionLimits.from_options(options)
+    return CachedSQLDatabase(create_sql_engine(dsn, limits), name, limits)
+
+
+def test_rows_are_capped_and_flagged(dsn):
+    db = _database(dsn, "capped", max_rows=3)
+    _, meta = db.run_sql("SELECT id FROM orders ORDER BY id")
+    assert meta["result"] == [(0,), (1,), (2,)]
+    assert meta["truncated"] is True
+    assert db.limits.stats()["truncated"] == 1
+
+    _, meta = db.run_sql("SELECT id FROM orders ORDER BY id")
+    assert meta["cached"] and meta["truncated"]
+
+
+def test_exports_stream_past_the_row_cap(dsn):
+    db = _database(dsn, "export", max_rows=3)
+    batches = list(db.stream_sql("SELECT id FROM orders ORDER BY id", batch_size=4))
+    assert [len(rows) for _, rows in batches] == [4, 4, 2]
+    assert batches[0][0] == ["id"]
+
+
+def test_read_only_sessions_reject_writes(dsn):
+    db = _database(dsn, "readonly", read_only=True)
+    with pytest.raises(NotImplementedError, match="readonly"):
+        db.run_sql("DELETE FROM orders")
+    _, meta = _database(dsn, "readonly-check").run_sql("SELECT count(*) FROM orders")
+    assert meta["result"] == [(10,)]
+
+
+def test_queries_over_the_concurrency_cap_time_out(dsn):
+    db = _database(dsn, "busy", max_concurrency=1, pool_timeout_sec=0.05)
+    held, release = threading.Event(), threading.Event()
+
+    def hold() -> None:
+        with db.limits.slot("busy"):
+            held.set()
+            release.wait(5)
+
+    worker = threading.Thread(target=hold)
+    worker.start()
+    held.wait(5)
+    try:
+        with pytest.raises(TimeoutError):
+            db.run_sql("SELECT 1")
+    finally:
+        release.set()
+        worker.join()
+    assert db.limits.stats()["rejected"] == 1
+    assert db.run_sql("SELECT 2")[1]["result"] == [(2,)]
+
+
+def test_session_setup_per_dialect():
+    limits = ExecutionLimits.from_options({"statement_timeout_sec": 1.5, "read_only": True})
+    assert _session_setup("postgresql", limits) == [
+        "SET statement_timeout = 1500",
+        "SET default_transaction_read_only = on",
+    ]
+    assert _session_setup("mysql", limits) == [
+        "SET SESSION max_execution_time = 1500",
+        "SET SESSION TRANSACTION READ ONLY",
+    ]
+    assert _session_setup("sqlite", limits) == ["PRAGMA query_only = ON"]
+    assert _session_setup("postgresql", ExecutionLimits.from_options({"statement_timeout_sec": 0, "read_only": False})) == []